@@ -0,0 +1,71 @@
+"""
+Стоимость аутентификации по api-key в зависимости от размера таблицы users.
+
+Запуск: python -m benchmarks.bench_auth_lookup
+"""
+
+import asyncio
+import secrets
+
+from sqlalchemy import insert
+
+from benchmarks.common import BenchSessionLocal, measure, reset_tables
+from main.database.db_utils import check_api_key_user
+from main.models import User
+from main.utils import api_key_digest
+
+TABLE_SIZES = [100, 1_000, 10_000, 100_000]
+ITERATIONS = 50
+CHUNK_SIZE = 5_000
+
+
+async def seed_users(count: int) -> str:
+    """
+    Заполнение таблицы users. Валидный bcrypt-хеш есть только у последнего
+    пользователя, ключ которого и возвращается для замеров.
+    """
+    async with BenchSessionLocal() as session:
+        rows = []
+        for index in range(count - 1):
+            rows.append(
+                {
+                    "login": f"bench_{index}",
+                    "api_key": f"bench-hash-{index}",
+                    "api_key_digest": api_key_digest(secrets.token_hex(16)),
+                    "name": "Bench",
+                    "surname": str(index),
+                }
+            )
+            if len(rows) == CHUNK_SIZE:
+                await session.execute(insert(User), rows)
+                rows = []
+        if rows:
+            await session.execute(insert(User), rows)
+
+        raw_key = secrets.token_hex(16)
+        user = User(login="bench_target", name="Bench", surname="Target")
+        user.set_api_key(raw_key)
+        session.add(user)
+        await session.commit()
+    return raw_key
+
+
+async def main() -> None:
+    print(f"{'users':>10} {'mean, ms':>10} {'p50, ms':>10} {'p99, ms':>10}")
+    for size in TABLE_SIZES:
+        await reset_tables()
+        raw_key = await seed_users(size)
+
+        async def lookup() -> None:
+            async with BenchSessionLocal() as session:
+                await check_api_key_user(session, raw_key)
+
+        stats = await measure(lookup, ITERATIONS)
+        print(
+            f"{size:>10} {stats['mean']:>10.2f} "
+            f"{stats['p50']:>10.2f} {stats['p99']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
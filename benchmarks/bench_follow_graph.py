@@ -0,0 +1,117 @@
+"""
+Граф подписок в памяти против запросов к subscribed_users: проверка
+подписки и список подписок пользователя, а также память графа
+в пересчете на миллион ребер.
+
+Запуск: python -m benchmarks.bench_follow_graph
+"""
+
+import asyncio
+import random
+import time
+
+from sqlalchemy import insert, select
+
+from benchmarks.common import BenchSessionLocal, measure, reset_tables, summarize
+from main.database import db_init
+from main.graph import FollowGraph
+from main.models import SubscribedUser, User
+
+USERS = 20_000
+EDGE_COUNTS = [10_000, 100_000, 1_000_000]
+ITERATIONS = 200
+GRAPH_ITERATIONS = 100_000
+CHUNK_SIZE = 10_000
+
+
+async def seed_graph(edges: int) -> None:
+    """Пользователи и случайные подписки без повторов"""
+    async with BenchSessionLocal() as session:
+        await session.execute(
+            insert(User),
+            [
+                {"login": f"bench_{index}", "name": "Bench", "surname": str(index)}
+                for index in range(USERS)
+            ],
+        )
+        pairs = set()
+        while len(pairs) < edges:
+            follower_id, author_id = random.sample(range(1, USERS + 1), 2)
+            pairs.add((follower_id, author_id))
+        rows = [
+            {"follower_user_id": follower_id, "subscribed_user_id": author_id}
+            for follower_id, author_id in pairs
+        ]
+        for start in range(0, len(rows), CHUNK_SIZE):
+            await session.execute(
+                insert(SubscribedUser), rows[start : start + CHUNK_SIZE]
+            )
+        await session.commit()
+
+
+def measure_sync(func, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+async def main() -> None:
+    db_init.AsyncSessionLocal = BenchSessionLocal
+    print(
+        f"{'edges':>10} {'load, s':>8} {'MB/1M':>8} "
+        f"{'check sql, ms':>14} {'check mem, ms':>14} "
+        f"{'list sql, ms':>14} {'list mem, ms':>14}"
+    )
+    for edges in EDGE_COUNTS:
+        await reset_tables()
+        await seed_graph(edges)
+        graph = FollowGraph(enabled=True, refresh_interval=0, batch_size=CHUNK_SIZE)
+        await graph.load()
+        stats = graph.stats()
+
+        def random_pair():
+            return random.randint(1, USERS), random.randint(1, USERS)
+
+        async def check_sql() -> None:
+            follower_id, author_id = random_pair()
+            async with BenchSessionLocal() as session:
+                await session.scalar(
+                    select(SubscribedUser.id).where(
+                        SubscribedUser.follower_user_id == follower_id,
+                        SubscribedUser.subscribed_user_id == author_id,
+                    )
+                )
+
+        async def list_sql() -> None:
+            async with BenchSessionLocal() as session:
+                result = await session.execute(
+                    select(SubscribedUser.subscribed_user_id).where(
+                        SubscribedUser.follower_user_id == random.randint(1, USERS)
+                    )
+                )
+                frozenset(result.scalars().all())
+
+        def check_memory() -> None:
+            graph.is_following(*random_pair())
+
+        def list_memory() -> None:
+            frozenset(graph.following_ids(random.randint(1, USERS)))
+
+        results = [
+            await measure(check_sql, ITERATIONS),
+            measure_sync(check_memory, GRAPH_ITERATIONS),
+            await measure(list_sql, ITERATIONS),
+            measure_sync(list_memory, GRAPH_ITERATIONS),
+        ]
+        print(
+            f"{edges:>10} {stats['last_load_seconds']:>8.2f} "
+            f"{stats['memory_mb_per_million_edges']:>8.1f} "
+            + " ".join(f"{result['mean']:>14.4f}" for result in results)
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
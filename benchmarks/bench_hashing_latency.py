@@ -0,0 +1,89 @@
+"""
+Хвостовые задержки постороннего эндпоинта (/api/metrics) при параллельной
+нагрузке проверками api-key: bcrypt в event loop против пула воркеров.
+
+Запуск: python -m benchmarks.bench_hashing_latency
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.common import summarize
+from main import app as main_app
+from main.app import app
+from main.hashing import check_api_key, hash_api_key, hashing_service
+
+AUTH_CONCURRENCY = 4
+PROBE_DURATION = 10.0
+PROBE_INTERVAL = 0.005
+METRICS_HEADERS = {"metrics-token": "bench_metrics_token"}
+main_app.METRICS_TOKEN = METRICS_HEADERS["metrics-token"]
+
+
+async def inline_verify(raw_key: str, hashed: str) -> bool:
+    """Синхронная проверка внутри корутины, как было раньше"""
+    return check_api_key(raw_key, hashed)
+
+
+async def auth_load(
+        verify: Callable[[str, str], Awaitable[bool]],
+        raw_key: str,
+        hashed: str,
+        stop: asyncio.Event,
+) -> None:
+    while not stop.is_set():
+        await verify(raw_key, hashed)
+        await asyncio.sleep(0)
+
+
+async def probe(client: AsyncClient) -> List[float]:
+    timings: List[float] = []
+    deadline = time.perf_counter() + PROBE_DURATION
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/metrics", headers=METRICS_HEADERS)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(PROBE_INTERVAL)
+    return timings
+
+
+async def run_mode(
+        name: str, verify: Callable[[str, str], Awaitable[bool]], hashed: str
+) -> None:
+    stop = asyncio.Event()
+    async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        load = [
+            asyncio.create_task(auth_load(verify, "bench_key", hashed, stop))
+            for _ in range(AUTH_CONCURRENCY)
+        ]
+        timings = await probe(client)
+        stop.set()
+        await asyncio.gather(*load)
+
+    stats = summarize(timings)
+    print(
+        f"{name:>8} {len(timings):>8} {stats['mean']:>10.2f} "
+        f"{stats['p50']:>10.2f} {stats['p99']:>10.2f}"
+    )
+
+
+async def main() -> None:
+    hashed = hash_api_key("bench_key")
+    print(
+        f"{'mode':>8} {'requests':>8} {'mean, ms':>10} "
+        f"{'p50, ms':>10} {'p99, ms':>10}"
+    )
+    await run_mode("inline", inline_verify, hashed)
+    await run_mode(hashing_service.pool, hashing_service.verify, hashed)
+    print(f"hashing pool stats: {hashing_service.stats()}")
+    hashing_service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Гибридный fan-out на степенном графе подписок: усиление записи
+(строк home_timeline на один твит) и задержка сборки страницы ленты
+для разных порогов числа подписчиков.
+
+Модель в памяти повторяет схему приложения: твиты авторов ниже порога
+раскладываются по лентам подписчиков при записи, твиты авторов выше
+порога подмешиваются из их последних твитов при чтении.
+
+Запуск: python -m benchmarks.bench_hybrid_fanout
+"""
+
+import heapq
+import random
+import time
+from collections import defaultdict
+from itertools import accumulate
+from typing import Dict, List, Set
+
+from benchmarks.common import summarize
+
+USERS = 20_000
+FOLLOWING_PER_USER = 40
+PARETO_ALPHA = 1.2
+TWEETS = 20_000
+READERS = 500
+PAGE_SIZE = 50
+THRESHOLDS = [None, 10_000, 1_000, 100, 10, 0]
+
+
+def build_graph(rng: random.Random) -> Dict[int, Set[int]]:
+    """Подписки: популярность авторов распределена по закону Парето"""
+    popularity = [rng.paretovariate(PARETO_ALPHA) for _ in range(USERS)]
+    cum_weights = list(accumulate(popularity))
+    following: Dict[int, Set[int]] = {}
+    for user_id in range(USERS):
+        followees = set(
+            rng.choices(range(USERS), cum_weights=cum_weights, k=FOLLOWING_PER_USER)
+        )
+        followees.discard(user_id)
+        following[user_id] = followees
+    return following
+
+
+def run_threshold(
+        threshold: float,
+        following: Dict[int, Set[int]],
+        followers: Dict[int, List[int]],
+        tweet_authors: List[int],
+        readers: List[int],
+) -> None:
+    timelines: Dict[int, List[int]] = defaultdict(list)
+    author_tweets: Dict[int, List[int]] = defaultdict(list)
+    rows_written = 0
+
+    for tweet_id, author_id in enumerate(tweet_authors, start=1):
+        author_tweets[author_id].append(tweet_id)
+        author_followers = followers.get(author_id, [])
+        if len(author_followers) < threshold:
+            for follower_id in author_followers:
+                timelines[follower_id].append(tweet_id)
+            rows_written += len(author_followers)
+
+    timings = []
+    for reader_id in readers:
+        start = time.perf_counter()
+        sources = [timelines.get(reader_id, [])[-PAGE_SIZE:]]
+        for author_id in following[reader_id]:
+            if len(followers.get(author_id, [])) >= threshold:
+                sources.append(author_tweets.get(author_id, [])[-PAGE_SIZE:])
+        heapq.nlargest(PAGE_SIZE, (t for source in sources for t in source))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    stats = summarize(timings)
+    label = "inf" if threshold == float("inf") else str(threshold)
+    print(
+        f"{label:>10} {rows_written / len(tweet_authors):>12.1f} {rows_written:>12} "
+        f"{stats['mean']:>9.3f} {stats['p50']:>9.3f} {stats['p99']:>9.3f}"
+    )
+
+
+def main() -> None:
+    rng = random.Random(42)
+    following = build_graph(rng)
+    followers: Dict[int, List[int]] = defaultdict(list)
+    for user_id, followees in following.items():
+        for followee_id in followees:
+            followers[followee_id].append(user_id)
+
+    counts = sorted((len(f) for f in followers.values()), reverse=True)
+    print(
+        f"users: {USERS}, edges: {sum(counts)}, "
+        f"max followers: {counts[0]}, median followers: {counts[len(counts) // 2]}"
+    )
+
+    tweet_authors = [rng.randrange(USERS) for _ in range(TWEETS)]
+    readers = rng.sample(range(USERS), READERS)
+
+    print(
+        f"{'threshold':>10} {'rows/tweet':>12} {'rows total':>12} "
+        f"{'read mean':>9} {'read p50':>9} {'read p99':>9}  (ms)"
+    )
+    for threshold in THRESHOLDS:
+        run_threshold(
+            float("inf") if threshold is None else threshold,
+            following,
+            followers,
+            tweet_authors,
+            readers,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Soak-тест SSE: память на простаивающее подключение и стоимость рассылки.
+
+Открывает CONNECTIONS потоков event_stream - тот же генератор, который
+отдает эндпоинт /api/events, - держит их без событий HOLD_SECONDS,
+затем рассылает всплеск лайков всем подключениям и измеряет время
+публикации и доставку с учетом слияния событий.
+БД не нужна: события публикуются напрямую в брокер.
+
+Запуск: python -m benchmarks.soak_sse_connections
+"""
+
+import asyncio
+import resource
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.common import summarize
+from main.events import event_broker, event_stream
+
+CONNECTIONS = 5_000
+HOLD_SECONDS = 5.0
+HEARTBEAT = 1.0
+BURST_TWEETS = 20
+BURST_LIKES_PER_TWEET = 50
+
+
+async def consume(user_id: int, received: List[int]) -> None:
+    async for chunk in event_stream(user_id, heartbeat=HEARTBEAT):
+        received[0] += chunk.count(b"event: ")
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main() -> None:
+    received = [0]
+    rss_before = rss_mb()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    tasks = [
+        asyncio.create_task(consume(user_id, received))
+        for user_id in range(CONNECTIONS)
+    ]
+    await asyncio.sleep(HOLD_SECONDS)  # несколько heartbeat-циклов без событий
+
+    current, _ = tracemalloc.get_traced_memory()
+    per_connection = (current - baseline) / CONNECTIONS
+    print(
+        f"connections: {event_broker.stats()['connections']}, "
+        f"traced memory per idle connection: {per_connection / 1024:.2f} KiB, "
+        f"max RSS growth: {rss_mb() - rss_before:.1f} MiB"
+    )
+    tracemalloc.stop()
+
+    publish_times = []
+    for tweet_id in range(BURST_TWEETS):
+        for likes_count in range(BURST_LIKES_PER_TWEET):
+            started = time.perf_counter()
+            event_broker.publish(
+                None, "likes_count", tweet_id, {"id": tweet_id, "likes_count": likes_count}
+            )
+            publish_times.append((time.perf_counter() - started) * 1000)
+    await asyncio.sleep(HEARTBEAT)
+
+    stats = summarize(publish_times)
+    print(
+        f"publish to all ({BURST_TWEETS * BURST_LIKES_PER_TWEET} events): "
+        f"mean {stats['mean']:.2f} ms, p50 {stats['p50']:.2f} ms, "
+        f"p99 {stats['p99']:.2f} ms"
+    )
+    broker_stats = event_broker.stats()
+    print(
+        f"delivered: {broker_stats['delivered']}, coalesced: {broker_stats['coalesced']}, "
+        f"events written to streams: {received[0]}"
+    )
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"connections after close: {event_broker.stats()['connections']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,9 @@
+import hmac
 import logging
 import os
 import uuid
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from aiofiles import open as aio_open
 from main.database.db_utils import (
@@ -14,11 +15,40 @@ from main.database.db_utils import (
     follow_user,
     put_or_delete_like_on_tweet,
     get_info_user,
+    get_follow_list,
+    get_follow_suggestions,
     get_tweets_by_user_api_key,
+    get_principal,
+    get_tweet_likes,
+    bulk_update_likes,
+    bulk_update_following,
 )
 
-from main.database.db_init import get_db, start_bd
-from fastapi import Depends, FastAPI, File, Header, HTTPException, Request, UploadFile
+from main.database.db_init import start_bd
+from main.cache import (
+    feed_cache,
+    principal_cache,
+    profile_cache,
+    tweet_fragment_cache,
+)
+from main.database.like_buffer import like_buffer
+from main.database.purge import tweet_purger
+from main.database.replicas import get_read_db, get_write_db, replica_router
+from main.database.suggestions import SUGGESTIONS_TOP_N
+from main.database.timeline import get_fanout_stats
+from main.events import event_broker, event_stream
+from main.graph import follow_graph
+from main.hashing import hashing_service
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
 from fastapi.responses import (
     HTMLResponse,
     JSONResponse,
@@ -26,9 +56,9 @@ from fastapi.responses import (
     FileResponse
 )
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from main.utils import allowed_file
+from main.utils import CURSOR_MAX, allowed_file, check_api_key_digest_secret
 from werkzeug.utils import secure_filename
 
 # Настройка логирования
@@ -55,6 +85,22 @@ UPLOAD_FOLDER_ABSOLUTE = os.path.join(root_dir, UPLOAD_FOLDER)
 TEMPLATES_FOLDER_ABSOLUTE = "/app/templates"
 # STATIC_FOLDER_ABSOLUTE = os.path.join(root_dir, STATIC_FOLDER)
 STATIC_FOLDER_ABSOLUTE = "/app/static"
+# Токен внутреннего эндпоинта /api/metrics (заголовок metrics-token),
+# пусто - эндпоинт выключен
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Размер страницы ленты по умолчанию и максимальный
+FEED_PAGE_SIZE = 50
+FEED_MAX_PAGE_SIZE = 200
+# Размер страницы списка лайкнувших по умолчанию и максимальный
+LIKES_PAGE_SIZE = 50
+LIKES_MAX_PAGE_SIZE = 200
+# Размер страницы списков подписчиков и подписок по умолчанию и максимальный
+FOLLOW_PAGE_SIZE = 50
+FOLLOW_MAX_PAGE_SIZE = 200
+# Количество рекомендаций подписок по умолчанию
+SUGGESTIONS_PAGE_SIZE = 10
+# Максимальное количество id в каждом списке пакетного запроса
+BULK_MAX_ITEMS = 500
 
 app = FastAPI()
 
@@ -92,6 +138,16 @@ class TweetCreate(BaseModel):
     tweet_media_ids: List[int] = []
 
 
+class BulkLikes(BaseModel):
+    like: List[int] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+    unlike: List[int] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+
+
+class BulkFollowing(BaseModel):
+    follow: List[int] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+    unfollow: List[int] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+
+
 # Хелперы
 def get_upload_file_path(filename: str) -> str:
     return os.path.join(UPLOAD_FOLDER_ABSOLUTE, filename)
@@ -130,7 +186,7 @@ async def read_root() -> str:
 async def create_tweet(
         tweet_data: TweetCreate,
         request: Request,
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -151,7 +207,7 @@ async def create_tweet(
 @app.post("/api/medias")
 async def upload_media(
         file: UploadFile = File(...),
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -196,7 +252,9 @@ async def upload_media(
     return await download_file(db, api_key, filepath)
 
 
-async def get_media(id: int, db: AsyncSession = Depends(get_db)) -> StreamingResponse:
+async def get_media(
+        id: int, db: AsyncSession = Depends(get_read_db)  # noqa: B008
+) -> StreamingResponse:
     """
     Get media
     """
@@ -245,7 +303,7 @@ async def get_media(id: int, db: AsyncSession = Depends(get_db)) -> StreamingRes
 
 @app.get("/{id}")
 async def get_media_endpoint(
-        id: int, db: AsyncSession = Depends(get_db)
+        id: int, db: AsyncSession = Depends(get_read_db)
 ) -> JSONResponse:  # noqa: B008
     """
     Get media file
@@ -269,7 +327,7 @@ async def get_media_endpoint(
 @app.delete("/api/tweets/{id}")
 async def delete_tweet(
         id: int,
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -280,33 +338,72 @@ async def delete_tweet(
 
 @app.get("/api/users/me")
 async def get_current_user(
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
+        if_none_match: Optional[str] = Header(None),
 ) -> JSONResponse:
     """
-    Get info about current user
+    Get info about current user with followers and following counts
     """
     logger.debug("get_current_user function was called!")
-    return await get_info_user(db, api_key=api_key)
+    return await get_info_user(db, api_key=api_key, if_none_match=if_none_match)
+
+
+@app.get("/api/users/me/suggestions")
+async def get_suggestions(
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        api_key: str = Header(..., alias="api-key"),
+        limit: int = Query(SUGGESTIONS_PAGE_SIZE, ge=1, le=SUGGESTIONS_TOP_N),
+) -> JSONResponse:
+    """
+    Get follow suggestions (friends of friends, refreshed by a batch job)
+    """
+    return await get_follow_suggestions(db, api_key, limit)
 
 
 @app.get("/api/tweets")
 async def get_user_tweets(
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
+        limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        since_id: Optional[int] = Query(None, ge=0, le=CURSOR_MAX),
+        max_id: Optional[int] = Query(None, ge=0, le=CURSOR_MAX),
+        include_likes: bool = False,
+        if_none_match: Optional[str] = Header(None),
 ) -> JSONResponse:
     """
-    Get tweets
+    Get tweets (paginated by opaque cursor or polled by since_id/max_id).
+    Tweets carry likes_count and liked_by_me, full liker id lists
+    are included only with include_likes=true.
+    If-None-Match is checked against the cached page; on a feed cache miss
+    the page is built in full before its ETag can be compared.
     """
     logger.debug("get_user_tweets function was called!")
 
-    return await get_tweets_by_user_api_key(db, api_key)
+    return await get_tweets_by_user_api_key(
+        db, api_key, limit, cursor, since_id, max_id, if_none_match, include_likes
+    )
+
+
+@app.get("/api/tweets/{id}/likes")
+async def get_likes(
+        id: int,
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        api_key: str = Header(..., alias="api-key"),
+        limit: int = Query(LIKES_PAGE_SIZE, ge=1, le=LIKES_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+) -> JSONResponse:
+    """
+    Get users who liked the tweet (paginated by opaque cursor)
+    """
+    return await get_tweet_likes(db, api_key, id, limit, cursor)
 
 
 @app.post("/api/tweets/{id}/likes")
 async def put_and_delete_like(
         id: int,
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -315,10 +412,34 @@ async def put_and_delete_like(
     return await put_or_delete_like_on_tweet(db, api_key, id)
 
 
+@app.post("/api/tweets/likes")
+async def bulk_likes(
+        bulk: BulkLikes,
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
+        api_key: str = Header(..., alias="api-key"),
+) -> JSONResponse:
+    """
+    Like and unlike many tweets in one transaction
+    """
+    return await bulk_update_likes(db, api_key, bulk.like, bulk.unlike)
+
+
+@app.post("/api/users/follow")
+async def bulk_follow(
+        bulk: BulkFollowing,
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
+        api_key: str = Header(..., alias="api-key"),
+) -> JSONResponse:
+    """
+    Follow and unfollow many users in one transaction
+    """
+    return await bulk_update_following(db, api_key, bulk.follow, bulk.unfollow)
+
+
 @app.post("/api/users/{id}/follow")
 async def post_follow_user(
         id: int,
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -330,7 +451,7 @@ async def post_follow_user(
 @app.delete("/api/users/{id}/follow")
 async def unfollow_user(
         id: int,
-        db: AsyncSession = Depends(get_db),  # noqa: B008
+        db: AsyncSession = Depends(get_write_db),  # noqa: B008
         api_key: str = Header(..., alias="api-key"),
 ) -> JSONResponse:
     """
@@ -339,15 +460,101 @@ async def unfollow_user(
     return await delete_following(db, api_key, id)
 
 
+@app.get("/api/events")
+async def stream_events(
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        api_key: str = Header(..., alias="api-key"),
+) -> StreamingResponse:
+    """
+    Server-Sent Events: new tweets, deleted tweets and likes count changes
+    """
+    user = await get_principal(db, api_key)
+    # Соединение с БД возвращается в пул до начала долгого потока
+    await db.close()
+    return StreamingResponse(
+        event_stream(user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def get_metrics(
+        metrics_token: Optional[str] = Header(None, alias="metrics-token"),
+) -> JSONResponse:
+    """
+    Get in-process metrics of caches and worker pools.
+    Internal endpoint: requires METRICS_TOKEN, disabled without it
+    """
+    if not METRICS_TOKEN or not hmac.compare_digest(
+            (metrics_token or "").encode(), METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "result": "false",
+                "error_type": "NotFound",
+                "error_message": "Not found",
+            },
+        )
+    metrics = {
+        "auth_cache": principal_cache.stats(),
+        "feed_cache": feed_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "tweet_fragment_cache": tweet_fragment_cache.stats(),
+        "hashing": hashing_service.stats(),
+        "fanout": get_fanout_stats(),
+        "events": event_broker.stats(),
+        "like_buffer": like_buffer.stats(),
+        "follow_graph": follow_graph.stats(),
+        "tweet_purge": tweet_purger.stats(),
+        "replicas": replica_router.stats(),
+    }
+    return JSONResponse(content={"result": "true", "metrics": metrics})
+
+
 @app.get("/api/users/{id}")
 @app.get("/profile/{id}")
 async def get_user_profile(
-        id: int, db: AsyncSession = Depends(get_db)
-) -> JSONResponse:  # noqa: B008
+        id: int,
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        api_key: Optional[str] = Header(None, alias="api-key"),
+        if_none_match: Optional[str] = Header(None),
+) -> JSONResponse:
     """
-    Get user profile
+    Get user profile with followers and following counts.
+    With api-key the profile also says whether the caller follows the user
     """
-    return await get_info_user(db, user_id=id)
+    viewer_id = (await get_principal(db, api_key)).id if api_key else None
+    return await get_info_user(
+        db, user_id=id, if_none_match=if_none_match, viewer_id=viewer_id
+    )
+
+
+@app.get("/api/users/{id}/followers")
+async def get_user_followers(
+        id: int,
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+) -> JSONResponse:
+    """
+    Get followers of user (paginated by opaque cursor)
+    """
+    return await get_follow_list(db, id, "followers", limit, cursor)
+
+
+@app.get("/api/users/{id}/following")
+async def get_user_following(
+        id: int,
+        db: AsyncSession = Depends(get_read_db),  # noqa: B008
+        limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+) -> JSONResponse:
+    """
+    Get users followed by user (paginated by opaque cursor)
+    """
+    return await get_follow_list(db, id, "following", limit, cursor)
 
 
 @app.on_event("startup")
@@ -355,8 +562,26 @@ async def startup_event():
     """
     Start BD
     """
+    # Без секрета дайджеста приложение не запускается
+    check_api_key_digest_secret()
     try:
         logger.debug("Start sratup_event function")
         await start_bd(UPLOAD_FOLDER_ABSOLUTE)
     except Exception as e:
         logger.error(f"Error during function startup_event: {e}")
+    like_buffer.start()
+    follow_graph.start()
+    tweet_purger.start()
+    replica_router.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Flush buffered likes and stop worker pools
+    """
+    follow_graph.stop()
+    tweet_purger.stop()
+    await replica_router.stop()
+    await like_buffer.stop()
+    hashing_service.shutdown()
@@ -0,0 +1,280 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from main.models import User
+from main.utils import api_key_digest
+
+load_dotenv()
+
+# Время жизни (в секундах) и максимальный размер кеша аутентификации
+AUTH_CACHE_TTL = float(getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAXSIZE = int(getenv("AUTH_CACHE_MAXSIZE", "10000"))
+# Время жизни (в секундах) и максимальный размер кеша страниц ленты
+FEED_CACHE_TTL = float(getenv("FEED_CACHE_TTL", "30"))
+FEED_CACHE_MAXSIZE = int(getenv("FEED_CACHE_MAXSIZE", "10000"))
+# Время жизни (в секундах) и максимальный размер кеша профилей пользователей
+PROFILE_CACHE_TTL = float(getenv("PROFILE_CACHE_TTL", "60"))
+PROFILE_CACHE_MAXSIZE = int(getenv("PROFILE_CACHE_MAXSIZE", "10000"))
+# Время жизни (в секундах) и максимальный размер кеша JSON-фрагментов твитов
+FRAGMENT_CACHE_TTL = float(getenv("FRAGMENT_CACHE_TTL", "3600"))
+FRAGMENT_CACHE_MAXSIZE = int(getenv("FRAGMENT_CACHE_MAXSIZE", "100000"))
+
+
+class TTLCache:
+    """Ограниченный LRU-кеш с временем жизни записей и счетчиками обращений"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        if key in self._data:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        for key in list(self._data):
+            self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        value, _ = self._data.pop(key)
+        self._on_remove(key, value)
+
+    def _on_remove(self, key: Hashable, value: Any) -> None:
+        """Хук для подклассов, вызывается при удалении записи из кеша"""
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Аутентифицированный пользователь"""
+
+    id: int
+    name: str
+
+
+# Отметка в кеше аутентификации для ключа, который не прошел проверку:
+# повтор того же ключа отклоняется без запросов к БД и bcrypt
+REJECTED_API_KEY = Principal(id=0, name="")
+
+
+class PrincipalCache(TTLCache):
+    """
+    Кеш аутентификации: дайджест api-key -> Principal или REJECTED_API_KEY.
+    Хранит обратный индекс по id пользователя для инвалидации
+    при смене ключа или удалении пользователя.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        self._digests_by_user: Dict[int, Set[str]] = {}
+
+    def set(self, key: str, value: Principal) -> None:
+        super().set(key, value)
+        if value is not REJECTED_API_KEY:
+            self._digests_by_user.setdefault(value.id, set()).add(key)
+
+    def invalidate_api_key(self, raw_key: str) -> None:
+        """Инвалидация по api-key, например, при его ротации"""
+        self.invalidate(api_key_digest(raw_key))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Инвалидация всех ключей пользователя, например, при его удалении"""
+        for digest in list(self._digests_by_user.get(user_id, ())):
+            self.invalidate(digest)
+
+    def _on_remove(self, key: str, value: Principal) -> None:
+        if value is REJECTED_API_KEY:
+            return
+        digests = self._digests_by_user.get(value.id)
+        if digests is not None:
+            digests.discard(key)
+            if not digests:
+                del self._digests_by_user[value.id]
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    """Отрендеренное тело ответа и его ETag"""
+
+    body: bytes
+    etag: str
+
+
+@dataclass(frozen=True, slots=True)
+class FeedPage:
+    """Отрендеренная страница ленты и то, от чего она зависит"""
+
+    body: bytes
+    etag: str
+    followed_ids: FrozenSet[int]
+    tweet_ids: FrozenSet[int]
+
+
+class FeedCache(TTLCache):
+    """
+    Кеш отрендеренных страниц ленты: (user_id, limit, cursor) -> FeedPage.
+    Обратные индексы автор -> читатели и твит -> читатели позволяют
+    сбрасывать только ленты, затронутые событием. Для каждого читателя
+    индекс хранит число его страниц, зависящих от автора или твита.
+    Кеш локален для процесса, события из других воркеров видны после
+    истечения FEED_CACHE_TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        self._keys_by_viewer: Dict[int, Set[Tuple]] = {}
+        self._viewers_by_author: Dict[int, Dict[int, int]] = {}
+        self._viewers_by_tweet: Dict[int, Dict[int, int]] = {}
+        self.invalidation_events = 0
+        self._started_at = time.monotonic()
+
+    def set(self, key: Tuple, value: FeedPage) -> None:
+        super().set(key, value)
+        viewer_id = key[0]
+        self._keys_by_viewer.setdefault(viewer_id, set()).add(key)
+        # Собственные твиты пользователя тоже есть в его ленте
+        for author_id in value.followed_ids | {viewer_id}:
+            self._add_viewer(self._viewers_by_author, author_id, viewer_id)
+        for tweet_id in value.tweet_ids:
+            self._add_viewer(self._viewers_by_tweet, tweet_id, viewer_id)
+
+    def invalidate_viewer(self, viewer_id: int) -> None:
+        """Подписка или отписка пользователя меняет его ленту"""
+        self.invalidation_events += 1
+        self._invalidate_viewers([viewer_id])
+
+    def invalidate_author(self, author_id: int) -> None:
+        """Новый или удаленный твит автора меняет ленты его подписчиков"""
+        self.invalidation_events += 1
+        self._invalidate_viewers(list(self._viewers_by_author.get(author_id, ())))
+
+    def invalidate_tweet(self, tweet_id: int) -> None:
+        """Лайк или удаление твита меняет ленты, в которых он показан"""
+        self.invalidation_events += 1
+        self._invalidate_viewers(list(self._viewers_by_tweet.get(tweet_id, ())))
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self._started_at
+        return dict(
+            super().stats(),
+            invalidation_events=self.invalidation_events,
+            invalidation_rate=self.invalidations / uptime if uptime else 0.0,
+        )
+
+    def _invalidate_viewers(self, viewer_ids: Iterable[int]) -> None:
+        for viewer_id in viewer_ids:
+            for key in list(self._keys_by_viewer.get(viewer_id, ())):
+                self.invalidate(key)
+
+    def _on_remove(self, key: Tuple, value: FeedPage) -> None:
+        viewer_id = key[0]
+        keys = self._keys_by_viewer.get(viewer_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_viewer[viewer_id]
+        for author_id in value.followed_ids | {viewer_id}:
+            self._discard_viewer(self._viewers_by_author, author_id, viewer_id)
+        for tweet_id in value.tweet_ids:
+            self._discard_viewer(self._viewers_by_tweet, tweet_id, viewer_id)
+
+    @staticmethod
+    def _add_viewer(
+            index: Dict[int, Dict[int, int]], item_id: int, viewer_id: int
+    ) -> None:
+        viewers = index.setdefault(item_id, {})
+        viewers[viewer_id] = viewers.get(viewer_id, 0) + 1
+
+    @staticmethod
+    def _discard_viewer(
+            index: Dict[int, Dict[int, int]], item_id: int, viewer_id: int
+    ) -> None:
+        viewers = index.get(item_id)
+        if viewers is None or viewer_id not in viewers:
+            return
+        # Читатель остается в индексе, пока от item_id зависит хоть одна
+        # из его страниц
+        viewers[viewer_id] -= 1
+        if not viewers[viewer_id]:
+            del viewers[viewer_id]
+            if not viewers:
+                del index[item_id]
+
+
+principal_cache = PrincipalCache(maxsize=AUTH_CACHE_MAXSIZE, ttl=AUTH_CACHE_TTL)
+feed_cache = FeedCache(maxsize=FEED_CACHE_MAXSIZE, ttl=FEED_CACHE_TTL)
+# user_id -> CachedResponse профиля, сбрасывается при подписке и отписке
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_MAXSIZE, ttl=PROFILE_CACHE_TTL)
+# (tweet_id, version) -> JSON твита без полей конкретного читателя.
+# Устаревшие версии не инвалидируются, а вытесняются по LRU
+tweet_fragment_cache = TTLCache(maxsize=FRAGMENT_CACHE_MAXSIZE, ttl=FRAGMENT_CACHE_TTL)
+
+
+@event.listens_for(User._api_key_hash, "set")
+def _invalidate_on_api_key_change(target: User, value, oldvalue, initiator) -> None:
+    """Смена api-key пользователя делает закешированные ключи недействительными"""
+    if target.id is not None:
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User.api_key_digest, "set")
+def _invalidate_rejected_key(target: User, value, oldvalue, initiator) -> None:
+    """Новый ключ пользователя мог быть недавно отклонен как неизвестный"""
+    if value is not None:
+        principal_cache.invalidate(value)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_delete(mapper, connection, target: User) -> None:
+    """Удаленный пользователь не должен проходить аутентификацию из кеша"""
+    principal_cache.invalidate_user(target.id)
+    profile_cache.invalidate(target.id)
@@ -8,13 +8,21 @@ from dotenv import load_dotenv
 from typing import AsyncGenerator, List
 
 import asyncpg
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from main.models import Base, LikeTweet, Media, SubscribedUser, Tweet, User
+from main.models import (
+    Base,
+    HomeTimeline,
+    LikeTweet,
+    Media,
+    SubscribedUser,
+    Tweet,
+    User,
+)
 
 load_dotenv()
 
@@ -47,6 +55,11 @@ console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
 
+def background_session() -> AsyncSession:
+    """Сессия для фоновых задач, выполняемых после ответа на запрос"""
+    return AsyncSessionLocal()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency for getting async session"""
     async with AsyncSessionLocal() as session:
@@ -67,14 +80,17 @@ async def insert_users(session: AsyncSession) -> None:
         with open(users_file_path, newline="", encoding="UTF-8") as csvfile:
             reader = csv.DictReader(csvfile)
             users_to_insert = []
+            hashing_tasks = []
             for row in reader:
                 user = User(
                     login=row["login"],
                     name=row["name"],
                     surname=row["surname"],
                 )
-                user.set_api_key(row["api_key"])
+                hashing_tasks.append(user.set_api_key_async(row["api_key"]))
                 users_to_insert.append(user)
+            # Хешируем ключи параллельно в пуле воркеров
+            await asyncio.gather(*hashing_tasks)
             session.add_all(users_to_insert)
             await session.commit()
             logger.info("Users inserted successfully")
@@ -110,6 +126,30 @@ async def insert_following(session: AsyncSession) -> None:
                     subscribes_to_insert.append(subscribe_obj)
 
             session.add_all(subscribes_to_insert)
+            await session.flush()
+
+            # Заполняем домашние ленты подписчиков
+            await session.execute(
+                insert(HomeTimeline)
+                .from_select(
+                    ["user_id", "tweet_id"],
+                    select(SubscribedUser.follower_user_id, Tweet.id).join(
+                        Tweet, Tweet.user_id == SubscribedUser.subscribed_user_id
+                    ),
+                )
+                .on_conflict_do_nothing()
+            )
+            # Заполняем денормализованные счетчики подписчиков и подписок
+            await session.execute(
+                update(User).values(
+                    followers_count=select(func.count(SubscribedUser.id))
+                    .where(SubscribedUser.subscribed_user_id == User.id)
+                    .scalar_subquery(),
+                    following_count=select(func.count(SubscribedUser.id))
+                    .where(SubscribedUser.follower_user_id == User.id)
+                    .scalar_subquery(),
+                )
+            )
             await session.commit()
             logger.info("Subscribs inserted successfully")
 
@@ -175,9 +215,8 @@ async def insert_tweets(
 
 async def insert_likes(session: AsyncSession, data: dict) -> None:
     """Вставка лайков в базу данных"""
-    result = await session.execute(select(Tweet))
-    saved_tweets = result.scalars().all()
-    tweet_id_map = {t.content: t.id for t in saved_tweets}
+    result = await session.execute(select(Tweet.content, Tweet.id))
+    tweet_id_map = dict(result.all())
     logger.info(f"Tweet ID map: {tweet_id_map}")
 
     likes_to_insert = []
@@ -199,6 +238,14 @@ async def insert_likes(session: AsyncSession, data: dict) -> None:
     stmt = stmt.on_conflict_do_nothing(index_elements=["user_id", "tweet_id"])
     try:
         await session.execute(stmt)
+        # Заполняем денормализованные счетчики лайков
+        await session.execute(
+            update(Tweet).values(
+                likes_count=select(func.count(LikeTweet.id))
+                .where(LikeTweet.tweet_id == Tweet.id)
+                .scalar_subquery()
+            )
+        )
         await session.commit()
         logger.info("Likes inserted successfully")
     except SQLAlchemyError as e:
@@ -314,8 +361,7 @@ async def start_bd(UPLOAD_FOLDER_ABSOLUTE) -> None:
             logger.info("Tables created successfully")
 
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(User))
-            users = result.scalars().all()
+            users = await session.scalar(select(User.id).limit(1))
 
             if not users:
                 logger.info("Table users is not exists. Start creating")
@@ -323,16 +369,14 @@ async def start_bd(UPLOAD_FOLDER_ABSOLUTE) -> None:
             else:
                 logger.info("Table users is exists in database")
 
-            result = await session.execute(select(Tweet))
-            tweets = result.scalars().all()
+            tweets = await session.scalar(select(Tweet.id).limit(1))
             if not tweets:
                 logger.info("Table tweets is not exists. Start creating")
                 await insert_tweets_and_likes(session, UPLOAD_FOLDER_ABSOLUTE)
             else:
                 logger.info("Table tweets is exists in database")
 
-            result = await session.execute(select(SubscribedUser))
-            subscribes = result.scalars().all()
+            subscribes = await session.scalar(select(SubscribedUser.id).limit(1))
             if not subscribes:
                 logger.info("Table subscribes is not exists. Start creating")
                 await insert_following(session)
@@ -1,13 +1,86 @@
+import json
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException, status
-from fastapi.responses import JSONResponse
-from sqlalchemy import select
+from fastapi.responses import JSONResponse, Response
+from starlette.background import BackgroundTask, BackgroundTasks
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Select,
+    Subquery,
+    and_,
+    case,
+    column,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from main.models import LikeTweet, Media, SubscribedUser, Tweet, User
+from main.cache import (
+    REJECTED_API_KEY,
+    CachedResponse,
+    FeedPage,
+    Principal,
+    feed_cache,
+    principal_cache,
+    profile_cache,
+    tweet_fragment_cache,
+)
+from main.database import db_init
+from main.database.timeline import (
+    backfill_follow,
+    FANOUT_FOLLOWER_THRESHOLD,
+    fanout_tweet,
+    prune_follow,
+)
+from main.database.like_buffer import build_likes_delta_update, like_buffer
+from main.database.purge import tweet_purger
+from main.database.read_models import (
+    FeedTweet,
+    UserCredentials,
+    fetch_credentials_by_digest,
+    fetch_credentials_without_digest,
+    fetch_follow_list,
+    fetch_follow_suggestions,
+    fetch_following_ids,
+    fetch_tweet_likers,
+    fetch_user_profile,
+    tweet_exists,
+    user_exists,
+)
+from main.events import publish_new_tweet, publish_tweet_events
+from main.graph import follow_graph
+from main.models import (
+    HomeTimeline,
+    LikeTweet,
+    Media,
+    SubscribedUser,
+    Tweet,
+    TweetMedia,
+    User,
+)
+from main.utils import (
+    API_KEY_LEGACY_SCAN_LIMIT,
+    api_key_digest,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    make_etag,
+    previous_api_key_digest,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -21,72 +94,485 @@ console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
 
-async def check_api_key_user(db: AsyncSession, api_key: str) -> User:
-    """Проверка существования пользователя с указанным api-key"""
-    users = await db.execute(select(User))
-    for user in users.scalars():
-        if user.verify_api_key(api_key):
+async def check_api_key_user(db: AsyncSession, api_key: str) -> UserCredentials:
+    """
+    Проверка существования пользователя с указанным api-key.
+    Пользователь ищется по индексу дайджеста ключа, bcrypt-проверка
+    выполняется не более одного раза.
+    """
+    digest = api_key_digest(api_key)
+    user = await fetch_credentials_by_digest(db, digest)
+    if user is not None:
+        # Дайджест найден: ключ проверяется только у этого пользователя
+        if await user.verify(api_key):
+            return user
+        raise HTTPException(status_code=404, detail="Invalid API key")
+
+    # Во время ротации секрета дайджест мог быть вычислен с предыдущим
+    # секретом: пересчитываем его по текущему при первом успешном входе
+    previous_digest = previous_api_key_digest(api_key)
+    if previous_digest is not None:
+        user = await fetch_credentials_by_digest(db, previous_digest)
+        if user is not None and await user.verify(api_key):
+            await _store_api_key_digest(db, user.id, digest)
             return user
+
+    # Пользователи, созданные до появления дайджеста: ищем перебором
+    # не больше API_KEY_LEGACY_SCAN_LIMIT строк и заполняем дайджест
+    # при первом успешном входе
+    if API_KEY_LEGACY_SCAN_LIMIT > 0:
+        legacy = await fetch_credentials_without_digest(db, API_KEY_LEGACY_SCAN_LIMIT)
+        for user in legacy:
+            if await user.verify(api_key):
+                await _store_api_key_digest(db, user.id, digest)
+                return user
     raise HTTPException(status_code=404, detail="Invalid API key")
 
 
-async def get_tweets_by_user_api_key(db: AsyncSession, api_key: str) -> JSONResponse:
+async def _store_api_key_digest(db: AsyncSession, user_id: int, digest: str) -> None:
     """
-    Асинхронный поиск твитов пользователей, на которых подписан
-    пользователь по его api-key
+    Запись дайджеста ключа пользователя при входе. Сессия реплики только
+    читает, поэтому для нее дайджест пишется через сессию основной БД.
+    """
+    statement = update(User).where(User.id == user_id).values(api_key_digest=digest)
+    if "replica" in db.info:
+        async with db_init.AsyncSessionLocal() as primary:
+            await primary.execute(statement)
+            await primary.commit()
+    else:
+        await db.execute(statement)
+        await db.commit()
+    logger.info(f"Api-key digest stored for user {user_id}")
+
+
+async def get_principal(db: AsyncSession, api_key: str) -> Principal:
+    """
+    Аутентификация пользователя по api-key через кеш.
+    При попадании в кеш запрос к базе данных не выполняется,
+    в том числе для недавно отклоненного ключа.
     """
+    digest = api_key_digest(api_key)
+    principal = principal_cache.get(digest)
+    if principal is REJECTED_API_KEY:
+        raise HTTPException(status_code=404, detail="Invalid API key")
+    if principal is not None:
+        return principal
+
     try:
         user = await check_api_key_user(db, api_key)
+    except HTTPException:
+        principal_cache.set(digest, REJECTED_API_KEY)
+        raise
+    principal = Principal(id=user.id, name=f"{user.name} {user.surname}")
+    principal_cache.set(digest, principal)
+    return principal
 
-        # Получаем пользователей, на которых подписан наш пользователь
-        result = await db.execute(
-            select(SubscribedUser).filter_by(follower_user_id=user.id)
+
+def build_feed_query(
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[int, int, int]] = None,
+        include_likes: bool = False,
+) -> Select:
+    """
+    Запрос страницы ленты: сначала твиты авторов, на которых подписан
+    пользователь (из его home_timeline и твиты популярных авторов,
+    подмешиваемые при чтении), затем остальные твиты,
+    внутри каждой группы по убыванию лайков и id. after - ключ сортировки
+    последнего твита предыдущей страницы (keyset-пагинация).
+    Одним запросом возвращает твиты страницы с авторами, количеством
+    лайков, версией твита и признаком лайка пользователя, а с include_likes
+    еще и списком id лайкнувших пользователей. Сначала по индексам
+    выбираются id твитов страницы, данные собираются только для них -
+    без группировки лайков и подписок по всем таблицам.
+    """
+    in_timeline = and_(
+        HomeTimeline.user_id == user_id, HomeTimeline.tweet_id == Tweet.id
+    )
+    followed_celebrities = _followed_celebrities(user_id)
+    not_deleted = Tweet.deleted_at.is_(None)
+    tweet_id = Tweet.id.label("id")
+    likes_count = Tweet.likes_count.label("likes_count")
+    subscribed_flag = literal_column("1", Integer).label("is_subscribed")
+    others_flag = literal_column("0", Integer).label("is_subscribed")
+
+    by_likes = (Tweet.likes_count.desc(), Tweet.id.desc())
+
+    # Твиты подписок из домашней ленты пользователя
+    timeline = (
+        select(tweet_id, subscribed_flag, likes_count)
+        .join(HomeTimeline, in_timeline)
+        .where(not_deleted)
+    )
+    # Твиты популярных авторов, которых еще нет в домашней ленте:
+    # для каждого автора не больше limit твитов по индексу
+    # (user_id, likes_count, id), а не все его твиты
+    celebrity = followed_celebrities.subquery("celebrity")
+    celebrity_tweets = select(tweet_id, subscribed_flag, likes_count).where(
+        Tweet.user_id == celebrity.c.subscribed_user_id,
+        ~exists().where(in_timeline),
+        not_deleted,
+    )
+    # Остальные твиты - по индексу (likes_count, id)
+    others = select(tweet_id, others_flag, likes_count).where(
+        ~exists().where(in_timeline),
+        Tweet.user_id.not_in(followed_celebrities),
+        not_deleted,
+    )
+
+    subscribed = True
+    if after is not None:
+        after_subscribed, after_likes, after_id = after
+        after_key = tuple_(Tweet.likes_count, Tweet.id) < tuple_(after_likes, after_id)
+        if after_subscribed:
+            timeline = timeline.where(after_key)
+            celebrity_tweets = celebrity_tweets.where(after_key)
+        else:
+            subscribed = False
+            others = others.where(after_key)
+
+    # Каждый сегмент отдает не больше limit записей
+    segments = [others.order_by(*by_likes).limit(limit)]
+    if subscribed:
+        per_author = (
+            celebrity_tweets.order_by(*by_likes).limit(limit).lateral("per_author")
+        )
+        celebrities = (
+            select(per_author)
+            .select_from(celebrity)
+            .join(per_author, true())
+            .order_by(per_author.c.likes_count.desc(), per_author.c.id.desc())
+            .limit(limit)
         )
-        subscribed_users = result.scalars().all()
+        segments = [timeline.order_by(*by_likes).limit(limit), celebrities, *segments]
+    ranked = union_all(*segments).subquery("ranked")
+    page = (
+        select(ranked.c.id, ranked.c.is_subscribed, ranked.c.likes_count)
+        .order_by(
+            ranked.c.is_subscribed.desc(),
+            ranked.c.likes_count.desc(),
+            ranked.c.id.desc(),
+        )
+        .limit(limit)
+        .subquery("page")
+    )
+
+    return _feed_page_details(
+        page,
+        user_id,
+        include_likes,
+        page.c.is_subscribed.desc(),
+        page.c.likes_count.desc(),
+        page.c.id.desc(),
+    )
+
+
+def build_feed_since_query(
+        user_id: int,
+        limit: int,
+        since_id: Optional[int],
+        max_id: Optional[int],
+        include_likes: bool = False,
+) -> Select:
+    """
+    Запрос новых твитов ленты для инкрементального опроса: твиты с id
+    больше since_id и не больше max_id по убыванию id. Если новых твитов
+    нет, запрос сводится к одной проверке по первичному ключу.
+    """
+    in_timeline = and_(
+        HomeTimeline.user_id == user_id, HomeTimeline.tweet_id == Tweet.id
+    )
+    is_subscribed = case(
+        (
+            or_(
+                exists().where(in_timeline),
+                Tweet.user_id.in_(_followed_celebrities(user_id)),
+            ),
+            literal_column("1", Integer),
+        ),
+        else_=literal_column("0", Integer),
+    )
+    recent = select(
+        Tweet.id.label("id"),
+        is_subscribed.label("is_subscribed"),
+        Tweet.likes_count.label("likes_count"),
+    ).where(Tweet.deleted_at.is_(None))
+    if since_id is not None:
+        recent = recent.where(Tweet.id > since_id)
+    if max_id is not None:
+        recent = recent.where(Tweet.id <= max_id)
+    page = recent.order_by(Tweet.id.desc()).limit(limit).subquery("page")
+    return _feed_page_details(page, user_id, include_likes, page.c.id.desc())
+
+
+def _followed_celebrities(user_id: int) -> Select:
+    """
+    Популярные авторы, на которых подписан пользователь: их твиты
+    не рассылаются по лентам и подмешиваются при чтении
+    """
+    return (
+        select(SubscribedUser.subscribed_user_id)
+        .join(User, User.id == SubscribedUser.subscribed_user_id)
+        .where(
+            SubscribedUser.follower_user_id == user_id,
+            User.followers_count >= FANOUT_FOLLOWER_THRESHOLD,
+        )
+    )
+
+
+def _feed_page_details(
+        page: Subquery, viewer_id: int, include_likes: bool, *order_by: ColumnElement
+) -> Select:
+    """
+    Данные твитов страницы ленты: автор, версия твита, id медиа по порядку
+    вложения и признак лайка читателя, с include_likes - еще и id всех
+    лайкнувших пользователей. page - подзапрос с колонками id,
+    is_subscribed, likes_count.
+    """
+    # Проверка лайка читателя - одна точечная проверка по индексу на твит
+    liked_by_me = exists().where(
+        LikeTweet.tweet_id == page.c.id, LikeTweet.user_id == viewer_id
+    )
+    # Медиа всех твитов страницы - тем же запросом по индексу tweet_media
+    attachments = func.array(
+        select(TweetMedia.media_id)
+        .where(TweetMedia.tweet_id == page.c.id)
+        .order_by(TweetMedia.position)
+        .scalar_subquery(),
+        type_=ARRAY(Integer),
+    )
+    columns = [
+        page.c.id,
+        page.c.is_subscribed,
+        page.c.likes_count,
+        liked_by_me.label("liked_by_me"),
+        Tweet.version,
+        Tweet.created_at,
+        Tweet.content,
+        attachments.label("attachments"),
+        User.id.label("author_id"),
+        User.name.label("author_name"),
+        User.surname.label("author_surname"),
+    ]
+    if include_likes:
+        # id лайкнувших собираются в массив только для твитов страницы
+        likes = func.array(
+            select(LikeTweet.user_id)
+            .where(LikeTweet.tweet_id == page.c.id)
+            .order_by(LikeTweet.id)
+            .scalar_subquery(),
+            type_=ARRAY(Integer),
+        )
+        columns.append(likes.label("likes"))
+    return (
+        select(*columns)
+        .join(Tweet, Tweet.id == page.c.id)
+        .join(User, User.id == Tweet.user_id)
+        .order_by(*order_by)
+    )
 
-        # Получаем id пользователей, на которых подписан наш пользователь
-        subscribed_user_ids = [su.subscribed_user_id for su in subscribed_users]
 
-        # Если пользователь не подписан ни на кого, то возвращаем пустой список
-        if not subscribed_user_ids:
-            subscribed_user_ids = []
+def dump_json(content: Any) -> bytes:
+    """Сериализация JSON с теми же параметрами, что и в JSONResponse"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
 
-        # Получаем все твиты из базы данных
-        result = await db.execute(
-            select(Tweet).options(
-                selectinload(Tweet.user), selectinload(Tweet.liked_by)
-            )
+
+def render_tweet_fragment(
+        row: Any, likes: Optional[List[int]], likes_count: int
+) -> bytes:
+    """
+    JSON-фрагмент твита из строки запроса ленты. Фрагмент заканчивается
+    запятой: поля liked_by_me и is_subscribed, зависящие от читателя,
+    дописываются при сборке ответа. Список id лайкнувших likes
+    попадает во фрагмент, только если он передан.
+    """
+    content = {
+        "id": row.id,
+        "content": row.content,
+        "attachments": row.attachments,
+        "author": {
+            "id": row.author_id,
+            "name": f"{row.author_name} {row.author_surname}",
+        },
+        "likes_count": likes_count,
+        "created_at": row.created_at.isoformat(),
+    }
+    if likes is not None:
+        content["likes"] = likes
+    return dump_json(content)[:-1] + b","
+
+
+def tweet_fragment(row: Any, include_likes: bool = False) -> bytes:
+    """JSON-фрагмент твита, кешируется по (id, version, include_likes)"""
+    key = (row.id, row.version, include_likes)
+    fragment = tweet_fragment_cache.get(key)
+    if fragment is None:
+        likes = row.likes if include_likes else None
+        fragment = render_tweet_fragment(row, likes, row.likes_count)
+        tweet_fragment_cache.set(key, fragment)
+    return fragment
+
+
+def viewer_fields(liked_by_me: bool, is_subscribed: bool) -> bytes:
+    """Окончание фрагмента твита с полями конкретного читателя"""
+    return (
+        b'"liked_by_me":'
+        + (b"true" if liked_by_me else b"false")
+        + b',"is_subscribed":'
+        + (b"true}" if is_subscribed else b"false}")
+    )
+
+
+def viewer_tweet_json(row: Any, viewer_id: int, include_likes: bool) -> bytes:
+    """
+    JSON твита для читателя: несохраненное переключение лайка
+    из буфера отложенной записи видно тому, кто его сделал
+    """
+    liked = like_buffer.pending_state(viewer_id, row.id)
+    if liked is None or liked == row.liked_by_me:
+        fragment = tweet_fragment(row, include_likes)
+        return fragment + viewer_fields(row.liked_by_me, row.is_subscribed)
+    likes = None
+    if include_likes:
+        likes = [user_id for user_id in row.likes if user_id != viewer_id]
+        if liked:
+            likes.append(viewer_id)
+    likes_count = row.likes_count + (1 if liked else -1)
+    fragment = render_tweet_fragment(row, likes, likes_count)
+    return fragment + viewer_fields(liked, row.is_subscribed)
+
+
+def render_feed_page(
+        page: List[Any],
+        next_cursor: Optional[str],
+        viewer_id: int,
+        include_likes: bool = False,
+) -> bytes:
+    """Тело ответа ленты из готовых фрагментов твитов без повторной сериализации"""
+    return b"".join(
+        (
+            b'{"result":"true","tweets":[',
+            b",".join(viewer_tweet_json(row, viewer_id, include_likes) for row in page),
+            b'],"next_cursor":',
+            dump_json(next_cursor),
+            b"}",
         )
+    )
 
-        tweets = result.scalars().all()
 
-        # Подсчитываем количество лайков для каждого твита и формируем ответ
-        data_tweets = []
-        for tweet in tweets:
-            author = tweet.user
-            likes_count = len(tweet.liked_by)  # Количество лайков
-            likes_ids = [like.user_id for like in tweet.liked_by]
+def conditional_response(
+        body: bytes, etag: str, if_none_match: Optional[str] = None
+) -> Response:
+    """JSON-ответ с ETag или 304, если у клиента уже есть эта версия"""
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return Response(
+        content=body,
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
+
+
+async def get_tweets_by_user_api_key(
+        db: AsyncSession,
+        api_key: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        since_id: Optional[int] = None,
+        max_id: Optional[int] = None,
+        if_none_match: Optional[str] = None,
+        include_likes: bool = False,
+) -> Response:
+    """
+    Асинхронный поиск твитов пользователей, на которых подписан
+    пользователь по его api-key. Возвращает страницу ленты размером limit
+    и курсор следующей страницы. Страница отдается из кеша, если она
+    не была инвалидирована, - при этом сессия БД не используется.
+    С since_id/max_id возвращает только твиты из этого диапазона id
+    (инкрементальный опрос), такие ответы не кешируются.
+    Если ETag страницы совпадает с If-None-Match, возвращается 304.
+    ETag - хеш тела страницы, поэтому без страницы в кеше (промах,
+    инвалидация, другой воркер) лента сначала строится целиком и только
+    потом сравнивается с If-None-Match: 304 экономит трафик, но не БД.
+    Вместо списков лайкнувших твиты содержат likes_count и liked_by_me,
+    прежние списки likes возвращаются только с include_likes.
+    """
+    try:
+        user = await get_principal(db, api_key)
 
-            # Проверяем, подписан ли пользователь на автора твита
-            is_subscribed = author.id in subscribed_user_ids
+        incremental = since_id is not None or max_id is not None
+        if incremental and cursor:
+            logger.error("Feed cursor used together with since_id/max_id")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "result": "false",
+                    "error_type": "ValueError",
+                    "error_message": "cursor can not be used with since_id or max_id",
+                },
+            )
+        if incremental:
+            result = await db.execute(
+                build_feed_since_query(user.id, limit, since_id, max_id, include_likes)
+            )
+            page = [FeedTweet.from_row(row) for row in result]
+            body = render_feed_page(page, None, user.id, include_likes)
+            return conditional_response(body, make_etag(body), if_none_match)
+
+        cache_key = (user.id, limit, cursor, include_likes)
+        cached = feed_cache.get(cache_key)
+        if cached is not None:
+            return conditional_response(cached.body, cached.etag, if_none_match)
+
+        try:
+            after = decode_cursor(cursor, 3) if cursor else None
+        except ValueError as e:
+            logger.error(f"Invalid feed cursor {cursor}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "result": "false",
+                    "error_type": "ValueError",
+                    "error_message": "Invalid cursor",
+                },
+            )
 
-            data_tweet = {
-                "id": tweet.id,
-                "content": tweet.content,
-                "attachments": tweet.attachments,
-                "author": {"id": author.id, "name": f"{author.name} {author.surname}"},
-                "likes": likes_ids,
-                "likes_count": likes_count,
-                "is_subscribed": is_subscribed,
-            }
-            data_tweets.append(data_tweet)
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+        result = await db.execute(
+            build_feed_query(user.id, limit + 1, after, include_likes)
+        )
+        page = [FeedTweet.from_row(row) for row in result]
+        has_next = len(page) > limit
+        page = page[:limit]
+
+        next_cursor = None
+        if has_next:
+            last = page[-1]
+            next_cursor = encode_cursor(last.is_subscribed, last.likes_count, last.id)
 
-        # Сортируем твиты по количеству лайков в порядке убывания
-        # среди подписок
-        data_tweets.sort(key=lambda x: (not x["is_subscribed"], -x["likes_count"]))
+        body = render_feed_page(page, next_cursor, user.id, include_likes)
+        etag = make_etag(body)
 
-        content = {"result": "true", "tweets": data_tweets}
-        return JSONResponse(content=content, status_code=status.HTTP_200_OK)
+        # Подписки нужны кешу, чтобы сбросить страницу при новом твите автора
+        if follow_graph.loaded:
+            followed_ids = frozenset(follow_graph.following_ids(user.id))
+        else:
+            followed_ids = await fetch_following_ids(db, user.id)
+        feed_cache.set(
+            cache_key,
+            FeedPage(
+                body=body,
+                etag=etag,
+                followed_ids=followed_ids,
+                tweet_ids=frozenset(row.id for row in page),
+            ),
+        )
+        return conditional_response(body, etag, if_none_match)
     except HTTPException:
         raise
     except Exception as e:
@@ -101,16 +587,105 @@ async def get_tweets_by_user_api_key(db: AsyncSession, api_key: str) -> JSONResp
         )
 
 
+def build_like_toggle_statement(user_id: int, tweet_id: int) -> Select:
+    """
+    Переключение лайка одним атомарным запросом: удаляет лайк пользователя,
+    если он есть, иначе ставит его, и обновляет счетчик лайков твита.
+    Возвращает found (твит существует), liked (лайк стоит после запроса),
+    likes_count и author_id. При гонке двух одинаковых переключений
+    вставка второго пропускается через ON CONFLICT DO NOTHING вместо
+    ошибки уникальности, а счетчик меняется только на реально вставленные
+    и удаленные строки.
+    """
+    target = (
+        select(Tweet.id)
+        .where(Tweet.id == tweet_id, Tweet.deleted_at.is_(None))
+        .cte("target")
+    )
+    deleted = (
+        delete(LikeTweet)
+        .where(
+            LikeTweet.user_id == user_id,
+            LikeTweet.tweet_id.in_(select(target.c.id)),
+        )
+        .returning(LikeTweet.tweet_id)
+        .cte("deleted")
+    )
+    inserted = (
+        insert(LikeTweet)
+        .from_select(
+            ["user_id", "tweet_id"],
+            select(literal(user_id, Integer), target.c.id).where(
+                ~exists(select(deleted.c.tweet_id))
+            ),
+        )
+        .on_conflict_do_nothing(constraint="unique_like_user_tweet")
+        .returning(LikeTweet.tweet_id)
+        .cte("inserted")
+    )
+    likes_delta = (
+        select(func.count()).select_from(inserted).scalar_subquery()
+        - select(func.count()).select_from(deleted).scalar_subquery()
+    )
+    updated = (
+        update(Tweet)
+        .where(Tweet.id.in_(select(target.c.id)))
+        .values(likes_count=Tweet.likes_count + likes_delta, version=Tweet.version + 1)
+        .returning(Tweet.likes_count, Tweet.user_id)
+        .cte("updated")
+    )
+    return select(
+        exists(select(target.c.id)).label("found"),
+        ~exists(select(deleted.c.tweet_id)).label("liked"),
+        select(updated.c.likes_count).scalar_subquery().label("likes_count"),
+        select(updated.c.user_id).scalar_subquery().label("author_id"),
+    )
+
+
+async def buffer_like_toggle(
+        db: AsyncSession, user: Principal, tweet_id: int
+) -> JSONResponse:
+    """
+    Переключение лайка в режиме отложенной записи: изменение попадает
+    в буфер и записывается в БД при его сбросе. Ленты других читателей
+    и событие об изменении счетчика обновятся после сброса,
+    лента автора переключения - сразу.
+    """
+    toggle = await like_buffer.toggle(db, user.id, tweet_id)
+    if toggle is None:
+        logger.error(f"tweet with id {tweet_id} do not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "result": "false",
+                "error_type": "ValueError",
+                "error_message": "Tweet with provided id not found",
+            },
+        )
+    liked, likes_count = toggle
+    feed_cache.invalidate_viewer(user.id)
+    return JSONResponse(
+        content={"result": "true", "liked": liked, "likes_count": likes_count},
+        status_code=status.HTTP_200_OK,
+    )
+
+
 async def put_or_delete_like_on_tweet(
         db: AsyncSession, api_key: str, tweet_id: int
 ) -> JSONResponse:
-    """Пользователь с данным api-key ставит лайк на твит с tweet_id"""
+    """
+    Пользователь с данным api-key ставит лайк на твит с tweet_id
+    или снимает его, если лайк уже стоит
+    """
     try:
-        user = await check_api_key_user(db, api_key)
+        user = await get_principal(db, api_key)
+
+        if like_buffer.enabled and like_buffer.accepts(user.id, tweet_id):
+            return await buffer_like_toggle(db, user, tweet_id)
 
-        result = await db.execute(select(Tweet).filter_by(id=tweet_id).limit(1))
-        tweet = result.scalars().first()
-        if not tweet:
+        result = await db.execute(build_like_toggle_statement(user.id, tweet_id))
+        toggle = result.one()
+        if not toggle.found:
             logger.error(f"tweet with id {tweet_id} do not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -120,26 +695,27 @@ async def put_or_delete_like_on_tweet(
                     "error_message": "Tweet with provided id not found",
                 },
             )
-
-        # Пытаемся получить существующий лайк
-        result = await db.execute(
-            select(LikeTweet).filter_by(user_id=user.id, tweet_id=tweet_id)
-        )
-        like_tweet = result.scalars().first()
-        if like_tweet is None:  # лайк не существует, устанавливаем его
-            logger.info(f"Like do not exist for " f"user {user.id} on tweet {tweet_id}")
-            like_tweet = LikeTweet(tweet_id=tweet_id, user_id=user.id)
-            db.add(like_tweet)
-            logger.info(f"Like created for user {user.id} on tweet {tweet_id}")
-        else:  # лайк существует, удаляем его
-            logger.info(
-                f"Like already exists for user " f"{user.id} on tweet {tweet_id}"
-            )
-            await db.delete(like_tweet)
-            logger.info(f"Like deleted for user {user.id} on tweet {tweet_id}")
-
         await db.commit()
-        return JSONResponse(content={"result": "true"}, status_code=status.HTTP_200_OK)
+        logger.info(
+            f"Like {'created' if toggle.liked else 'deleted'} "
+            f"for user {user.id} on tweet {tweet_id}"
+        )
+
+        feed_cache.invalidate_tweet(tweet_id)
+        data = {"id": tweet_id, "likes_count": toggle.likes_count}
+        return JSONResponse(
+            content={
+                "result": "true",
+                "liked": toggle.liked,
+                "likes_count": toggle.likes_count,
+            },
+            status_code=status.HTTP_200_OK,
+            background=BackgroundTask(
+                publish_tweet_events,
+                "likes_count",
+                [(tweet_id, toggle.author_id, data)],
+            ),
+        )
 
     except HTTPException as e:
         raise e
@@ -156,11 +732,205 @@ async def put_or_delete_like_on_tweet(
         )
 
 
+async def get_tweet_likes(
+        db: AsyncSession, api_key: str, tweet_id: int, limit: int, cursor: Optional[str]
+) -> JSONResponse:
+    """
+    Страница пользователей, лайкнувших твит, от новых лайков к старым.
+    Пагинация по id лайка (keyset) по индексу (tweet_id, id).
+    Лайки из буфера отложенной записи видны после его сброса.
+    """
+    try:
+        await get_principal(db, api_key)
+
+        try:
+            after = decode_cursor(cursor, 1)[0] if cursor else None
+        except ValueError as e:
+            logger.error(f"Invalid likes cursor {cursor}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "result": "false",
+                    "error_type": "ValueError",
+                    "error_message": "Invalid cursor",
+                },
+            )
+
+        page = await fetch_tweet_likers(db, tweet_id, limit + 1, after)
+
+        # Существование твита проверяется, только если лайков нет
+        if not page and not await tweet_exists(db, tweet_id):
+            logger.error(f"tweet with id {tweet_id} do not found")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "result": "false",
+                    "error_type": "ValueError",
+                    "error_message": "Tweet with provided id not found",
+                },
+            )
+
+        next_cursor = None
+        if len(page) > limit:
+            next_cursor = encode_cursor(page[limit - 1].cursor_id)
+        return JSONResponse(
+            content={
+                "result": "true",
+                "likes": [
+                    {"user_id": item.id, "name": item.full_name}
+                    for item in page[:limit]
+                ],
+                "next_cursor": next_cursor,
+            },
+            status_code=status.HTTP_200_OK,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during get likes of tweet: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "result": "false",
+                "error_type": "InternalServerError",
+                "error_message": f"Error during get likes of tweet: {e}",
+            },
+        )
+
+
+def _validate_bulk_lists(add_ids: List[int], remove_ids: List[int]) -> None:
+    """Один и тот же id не может быть одновременно в обоих списках"""
+    conflicting = set(add_ids) & set(remove_ids)
+    if conflicting:
+        logger.error(f"Ids in both lists of bulk request: {sorted(conflicting)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "result": "false",
+                "error_type": "ValueError",
+                "error_message": f"Ids in both lists: {sorted(conflicting)}",
+            },
+        )
+
+
+async def bulk_update_likes(
+        db: AsyncSession, api_key: str, like_ids: List[int], unlike_ids: List[int]
+) -> JSONResponse:
+    """
+    Пакетная установка и снятие лайков пользователя в одной транзакции
+    фиксированным числом запросов. В отличие от переключения, задает
+    итоговое состояние, поэтому повтор запроса ничего не меняет.
+    Для каждого твита возвращает liked, unliked, unchanged или not_found.
+    """
+    try:
+        user = await get_principal(db, api_key)
+        _validate_bulk_lists(like_ids, unlike_ids)
+        if like_buffer.enabled:
+            await like_buffer.flush()  # буфер не должен перезаписать результат
+
+        result = await db.execute(
+            select(Tweet.id).where(
+                Tweet.id.in_([*like_ids, *unlike_ids]), Tweet.deleted_at.is_(None)
+            )
+        )
+        found = set(result.scalars().all())
+
+        liked, unliked = set(), set()
+        to_like = [
+            tweet_id for tweet_id in dict.fromkeys(like_ids) if tweet_id in found
+        ]
+        if to_like:
+            result = await db.execute(
+                insert(LikeTweet)
+                .values(
+                    [{"user_id": user.id, "tweet_id": tweet_id} for tweet_id in to_like]
+                )
+                .on_conflict_do_nothing(constraint="unique_like_user_tweet")
+                .returning(LikeTweet.tweet_id)
+            )
+            liked = set(result.scalars().all())
+        if unlike_ids:
+            result = await db.execute(
+                delete(LikeTweet)
+                .where(LikeTweet.user_id == user.id, LikeTweet.tweet_id.in_(unlike_ids))
+                .returning(LikeTweet.tweet_id)
+            )
+            unliked = set(result.scalars().all())
+
+        counts = []
+        deltas = {tweet_id: 1 for tweet_id in liked}
+        deltas.update({tweet_id: -1 for tweet_id in unliked})
+        if deltas:
+            result = await db.execute(build_likes_delta_update(deltas))
+            counts = result.all()
+        await db.commit()
+
+        for tweet_id, _, _ in counts:
+            feed_cache.invalidate_tweet(tweet_id)
+        events = [
+            (tweet_id, author_id, {"id": tweet_id, "likes_count": likes_count})
+            for tweet_id, author_id, likes_count in counts
+        ]
+
+        def item_status(tweet_id: int, changed: set, done: str) -> Dict[str, Any]:
+            if tweet_id not in found:
+                return {"id": tweet_id, "status": "not_found"}
+            return {
+                "id": tweet_id,
+                "status": done if tweet_id in changed else "unchanged",
+            }
+
+        results = [item_status(tweet_id, liked, "liked") for tweet_id in like_ids]
+        results += [
+            item_status(tweet_id, unliked, "unliked") for tweet_id in unlike_ids
+        ]
+        logger.info(
+            f"Bulk likes of user {user.id}: liked {len(liked)}, unliked {len(unliked)}"
+        )
+        return JSONResponse(
+            content={"result": "true", "results": results},
+            status_code=status.HTTP_200_OK,
+            background=BackgroundTask(publish_tweet_events, "likes_count", events),
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error during bulk likes update: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "result": "false",
+                "error_type": "Error",
+                "error_message": f"Error during bulk likes update: {e}",
+            },
+        )
+
+
 async def write_new_tweet(
         db: AsyncSession, api_key: str, tweet_data: str, tweet_media_ids: List[int] = []
 ) -> JSONResponse:
     try:
-        user = await check_api_key_user(db, api_key)
+        user = await get_principal(db, api_key)
+
+        # Повторы id медиа отбрасываются, порядок вложений сохраняется
+        tweet_media_ids = list(dict.fromkeys(tweet_media_ids))
+        if tweet_media_ids:
+            result = await db.execute(
+                select(Media.id).where(Media.id.in_(tweet_media_ids))
+            )
+            missing = set(tweet_media_ids) - set(result.scalars().all())
+            if missing:
+                logger.error(f"Media with ids {sorted(missing)} not found")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail={
+                        "result": "false",
+                        "error_type": "ValueError",
+                        "error_message": f"Media not found: {sorted(missing)}",
+                    },
+                )
 
         tweet = Tweet(user_id=user.id, content=tweet_data, attachments=tweet_media_ids)
 
@@ -172,9 +942,18 @@ async def write_new_tweet(
         logger.info(f"create tweet with media: {tweet_media_ids}")
         tweet_id = tweet.id
         logger.info(f"Created new tweet with id: {tweet_id}")
+        feed_cache.invalidate_author(user.id)
 
         result = {"result": "true", "tweet_id": tweet_id}
-        return JSONResponse(content=result, status_code=status.HTTP_201_CREATED)
+        # Рассылка твита по лентам подписчиков и событие о нем - после ответа
+        background = BackgroundTasks()
+        background.add_task(fanout_tweet, tweet_id, user.id)
+        background.add_task(publish_new_tweet, tweet_id, user.id)
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_201_CREATED,
+            background=background,
+        )
 
     except HTTPException as e:
         raise e
@@ -194,7 +973,7 @@ async def write_new_tweet(
 async def download_file(db: AsyncSession, api_key: str, filepath: str) -> JSONResponse:
     try:
         logger.debug("download_file function was called")
-        user = await check_api_key_user(db, api_key)
+        user = await get_principal(db, api_key)
 
         media = Media(path=filepath)
 
@@ -261,11 +1040,22 @@ async def delete_tweet_by_user(
         db: AsyncSession, api_key: str, tweet_id: int
 ) -> JSONResponse:
     try:
-        user = await check_api_key_user(db, api_key)
-
-        result = await db.execute(select(Tweet).filter_by(id=tweet_id, user_id=user.id))
-        tweet = result.scalars().first()
-        if not tweet:
+        user = await get_principal(db, api_key)
+
+        # Мягкое удаление одним запросом: твит сразу скрыт из чтения,
+        # лайки и связи с медиа удаляются пачками после ответа
+        deleted_id = await db.scalar(
+            update(Tweet)
+            .where(
+                Tweet.id == tweet_id,
+                Tweet.user_id == user.id,
+                Tweet.deleted_at.is_(None),
+            )
+            .values(deleted_at=func.now(), version=Tweet.version + 1)
+            .returning(Tweet.id)
+        )
+        if deleted_id is None:
+            await db.rollback()
             logger.error(
                 f"tweet with id {tweet_id} " f"do not found for user {user.id}"
             )
@@ -279,10 +1069,23 @@ async def delete_tweet_by_user(
                 },
             )
 
-        await db.delete(tweet)
         await db.commit()
-
-        return JSONResponse(content={"result": "true"}, status_code=status.HTTP_200_OK)
+        feed_cache.invalidate_author(user.id)
+        feed_cache.invalidate_tweet(tweet_id)
+
+        # Событие для подписчиков автора и дочистка - после ответа
+        background = BackgroundTasks()
+        background.add_task(
+            publish_tweet_events,
+            "tweet_deleted",
+            [(tweet_id, user.id, {"id": tweet_id})],
+        )
+        background.add_task(tweet_purger.purge_tweet, tweet_id)
+        return JSONResponse(
+            content={"result": "true"},
+            status_code=status.HTTP_200_OK,
+            background=background,
+        )
 
     except HTTPException:
         raise
@@ -304,12 +1107,10 @@ async def follow_user(
 ) -> JSONResponse:
     try:
         # Получаем пользователя, который подписывается, по его API-ключу
-        follower_user = await check_api_key_user(db, api_key)
+        follower_user = await get_principal(db, api_key)
 
-        # Получаем пользователя, на которого подписываются, по его ID
-        result = await db.execute(select(User).filter_by(id=user_id_to_follow))
-        subscribed_user = result.scalars().first()
-        if not subscribed_user:
+        # Проверяем, что пользователь, на которого подписываются, существует
+        if not await user_exists(db, user_id_to_follow):
             logger.error(f"Пользователь с id {user_id_to_follow} не найден")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -320,37 +1121,52 @@ async def follow_user(
                 },
             )
 
-        # Проверяем, не подписан ли уже пользователь
+        # Создаем подписку, повторная подписка пропускается тем же запросом
         result = await db.execute(
-            select(SubscribedUser).filter_by(
-                follower_user_id=follower_user.id, subscribed_user_id=subscribed_user.id
+            insert(SubscribedUser)
+            .values(
+                follower_user_id=follower_user.id, subscribed_user_id=user_id_to_follow
             )
+            .on_conflict_do_nothing(constraint="unique_user_subscribed")
+            .returning(SubscribedUser.id)
         )
-        existing_subscription = result.scalars().first()
-        if existing_subscription:
+        if result.scalar_one_or_none() is None:
             logger.info(
                 f"Пользователь {follower_user.id} уже подписан "
-                f"на пользователя {subscribed_user.id}"
+                f"на пользователя {user_id_to_follow}"
             )
 
             return JSONResponse(
                 content={"result": "true"}, status_code=status.HTTP_200_OK
             )
 
-        # Создаем новую подписку
-        new_subscription = SubscribedUser(
-            follower_user_id=follower_user.id, subscribed_user_id=subscribed_user.id
+        await db.execute(
+            update(User)
+            .where(User.id == user_id_to_follow)
+            .values(followers_count=User.followers_count + 1)
+        )
+        await db.execute(
+            update(User)
+            .where(User.id == follower_user.id)
+            .values(following_count=User.following_count + 1)
         )
-        db.add(new_subscription)
         await db.commit()
+        follow_graph.add(follower_user.id, user_id_to_follow)
+        feed_cache.invalidate_viewer(follower_user.id)
+        profile_cache.invalidate(follower_user.id)
+        profile_cache.invalidate(user_id_to_follow)
 
         logger.info(
             f"Пользователь {follower_user.id} успешно "
-            f"подписался на пользователя {subscribed_user.id}"
+            f"подписался на пользователя {user_id_to_follow}"
         )
 
         return JSONResponse(
-            content={"result": "true"}, status_code=status.HTTP_201_CREATED
+            content={"result": "true"},
+            status_code=status.HTTP_201_CREATED,
+            background=BackgroundTask(
+                backfill_follow, follower_user.id, user_id_to_follow
+            ),
         )
 
     except HTTPException:
@@ -373,7 +1189,7 @@ async def delete_following(
 ) -> JSONResponse:
     try:
         # Получаем пользователя, который отписывается, по его API-ключу
-        follower_user = await check_api_key_user(db, api_key)
+        follower_user = await get_principal(db, api_key)
 
         if not follower_user:
             logger.error(f"Пользователь с api-key не найден")
@@ -386,10 +1202,8 @@ async def delete_following(
                 },
             )
 
-        # Получаем пользователя, от которого отписываются, по его ID
-        result = await db.execute(select(User).filter_by(id=user_id_to_unfollow))
-        subscribed_user = result.scalars().first()
-        if not subscribed_user:
+        # Проверяем, что пользователь, от которого отписываются, существует
+        if not await user_exists(db, user_id_to_unfollow):
             logger.error(f"Пользователь с id {user_id_to_unfollow} не найден")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -400,32 +1214,52 @@ async def delete_following(
                 },
             )
 
-        # Пытаемся найти подписку между этими пользователями
+        # Удаляем подписку, если она есть, одним запросом
         result = await db.execute(
-            select(SubscribedUser).filter_by(
-                follower_user_id=follower_user.id, subscribed_user_id=subscribed_user.id
+            delete(SubscribedUser)
+            .where(
+                SubscribedUser.follower_user_id == follower_user.id,
+                SubscribedUser.subscribed_user_id == user_id_to_unfollow,
             )
+            .returning(SubscribedUser.id)
         )
-        existing_subscription = result.scalars().first()
-        if not existing_subscription:
+        if result.scalar_one_or_none() is None:
             logger.info(
                 f"Пользователь {follower_user.id} не подписан "
-                f"на пользователя {subscribed_user.id}"
+                f"на пользователя {user_id_to_unfollow}"
             )
             return JSONResponse(
                 content={"result": "true"}, status_code=status.HTTP_200_OK
             )
 
-        # Удаляем подписку
-        await db.delete(existing_subscription)
+        await db.execute(
+            update(User)
+            .where(User.id == user_id_to_unfollow)
+            .values(followers_count=User.followers_count - 1)
+        )
+        await db.execute(
+            update(User)
+            .where(User.id == follower_user.id)
+            .values(following_count=User.following_count - 1)
+        )
         await db.commit()
+        follow_graph.remove(follower_user.id, user_id_to_unfollow)
+        feed_cache.invalidate_viewer(follower_user.id)
+        profile_cache.invalidate(follower_user.id)
+        profile_cache.invalidate(user_id_to_unfollow)
 
         logger.info(
             f"Пользователь {follower_user.id} успешно "
-            f"отписался от пользователя {subscribed_user.id}"
+            f"отписался от пользователя {user_id_to_unfollow}"
         )
 
-        return JSONResponse(content={"result": "true"}, status_code=status.HTTP_200_OK)
+        return JSONResponse(
+            content={"result": "true"},
+            status_code=status.HTTP_200_OK,
+            background=BackgroundTask(
+                prune_follow, follower_user.id, user_id_to_unfollow
+            ),
+        )
 
     except HTTPException:
         raise
@@ -442,9 +1276,145 @@ async def delete_following(
         )
 
 
-async def get_info_user(
-        db: AsyncSession, user_id: int = 0, api_key: str = ""
+async def bulk_update_following(
+        db: AsyncSession, api_key: str, follow_ids: List[int], unfollow_ids: List[int]
 ) -> JSONResponse:
+    """
+    Пакетная подписка и отписка пользователя в одной транзакции
+    фиксированным числом запросов. Для каждого пользователя возвращает
+    followed, unfollowed, unchanged или not_found. Ленты обновляются
+    в фоне после ответа, как и при одиночной подписке.
+    """
+    try:
+        follower_user = await get_principal(db, api_key)
+        _validate_bulk_lists(follow_ids, unfollow_ids)
+
+        result = await db.execute(
+            select(User.id).where(User.id.in_([*follow_ids, *unfollow_ids]))
+        )
+        found = set(result.scalars().all())
+
+        followed, unfollowed = set(), set()
+        to_follow = [
+            user_id for user_id in dict.fromkeys(follow_ids) if user_id in found
+        ]
+        if to_follow:
+            result = await db.execute(
+                insert(SubscribedUser)
+                .values(
+                    [
+                        {
+                            "follower_user_id": follower_user.id,
+                            "subscribed_user_id": user_id,
+                        }
+                        for user_id in to_follow
+                    ]
+                )
+                .on_conflict_do_nothing(constraint="unique_user_subscribed")
+                .returning(SubscribedUser.subscribed_user_id)
+            )
+            followed = set(result.scalars().all())
+        if unfollow_ids:
+            result = await db.execute(
+                delete(SubscribedUser)
+                .where(
+                    SubscribedUser.follower_user_id == follower_user.id,
+                    SubscribedUser.subscribed_user_id.in_(unfollow_ids),
+                )
+                .returning(SubscribedUser.subscribed_user_id)
+            )
+            unfollowed = set(result.scalars().all())
+
+        # Счетчики подписчиков всех затронутых пользователей одним запросом
+        deltas = [(user_id, 1) for user_id in followed]
+        deltas += [(user_id, -1) for user_id in unfollowed]
+        if deltas:
+            delta_rows = values(
+                column("user_id", Integer), column("delta", Integer), name="deltas"
+            ).data(deltas)
+            await db.execute(
+                update(User)
+                .where(User.id == delta_rows.c.user_id)
+                .values(followers_count=User.followers_count + delta_rows.c.delta)
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(
+                update(User)
+                .where(User.id == follower_user.id)
+                .values(
+                    following_count=User.following_count
+                    + len(followed)
+                    - len(unfollowed)
+                )
+            )
+        await db.commit()
+
+        background = BackgroundTasks()
+        if followed or unfollowed:
+            feed_cache.invalidate_viewer(follower_user.id)
+            profile_cache.invalidate(follower_user.id)
+        for user_id in followed:
+            follow_graph.add(follower_user.id, user_id)
+            profile_cache.invalidate(user_id)
+            background.add_task(backfill_follow, follower_user.id, user_id)
+        for user_id in unfollowed:
+            follow_graph.remove(follower_user.id, user_id)
+            profile_cache.invalidate(user_id)
+            background.add_task(prune_follow, follower_user.id, user_id)
+
+        def item_status(user_id: int, changed: set, done: str) -> Dict[str, Any]:
+            if user_id not in found:
+                return {"id": user_id, "status": "not_found"}
+            return {
+                "id": user_id,
+                "status": done if user_id in changed else "unchanged",
+            }
+
+        results = [item_status(user_id, followed, "followed") for user_id in follow_ids]
+        results += [
+            item_status(user_id, unfollowed, "unfollowed") for user_id in unfollow_ids
+        ]
+        logger.info(
+            f"Пользователь {follower_user.id} подписался на {len(followed)} "
+            f"и отписался от {len(unfollowed)} пользователей"
+        )
+        return JSONResponse(
+            content={"result": "true", "results": results},
+            status_code=status.HTTP_200_OK,
+            background=background,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Ошибка при пакетной подписке: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "result": "false",
+                "error_type": "InternalServerError",
+                "error_message": f"Ошибка при пакетной подписке: {e}",
+            },
+        )
+
+
+async def get_info_user(
+        db: AsyncSession,
+        user_id: int = 0,
+        api_key: str = "",
+        if_none_match: Optional[str] = None,
+        viewer_id: Optional[int] = None,
+) -> Response:
+    """
+    Информация о пользователе по id или api-key: имя и денормализованные
+    количества подписчиков и подписок, поэтому время ответа не зависит
+    от их числа. Сами списки отдаются постранично get_follow_list.
+    Для читателя viewer_id в профиль добавляется is_following - подписан
+    ли он на пользователя (одна проверка по уникальному индексу подписок).
+    Профиль отдается из кеша, пока его не сбросит подписка или отписка,
+    а при совпадении ETag с If-None-Match возвращается 304.
+    """
     try:
 
         if user_id == 0 and api_key == "":
@@ -461,66 +1431,184 @@ async def get_info_user(
                 },
             )
         # Получаем пользователя по его ID или api-key
-        if user_id != 0:
-            result = await db.execute(select(User).filter_by(id=user_id))
-            user = result.scalars().first()
+        if user_id == 0:
+            user_id = (await get_principal(db, api_key)).id
+        cached = profile_cache.get(user_id)
+        if cached is None:
+            cached = await load_profile(db, user_id)
+        if viewer_id is None or viewer_id == user_id:
+            return conditional_response(cached.body, cached.etag, if_none_match)
+
+        if follow_graph.loaded:
+            is_following = follow_graph.is_following(viewer_id, user_id)
         else:
-            user = await check_api_key_user(db, api_key)
+            is_following = await db.scalar(
+                select(
+                    exists().where(
+                        SubscribedUser.follower_user_id == viewer_id,
+                        SubscribedUser.subscribed_user_id == user_id,
+                    )
+                )
+            )
+        # Поле читателя дописывается в конец объекта user закешированного тела
+        body = (
+            cached.body[:-2]
+            + b',"is_following":'
+            + (b"true}}" if is_following else b"false}}")
+        )
+        return conditional_response(body, make_etag(body), if_none_match)
 
-        if not user:
-            logger.error(
-                f"Пользователь с id {user_id} и " f"api-key не найден"
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Ошибка при получении информации о пользователе: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "result": "false",
+                "error_type": "InternalServerError",
+                "error_message": f"Error during get info user: {str(e)}",
+            },
+        )
+
+
+async def load_profile(db: AsyncSession, user_id: int) -> CachedResponse:
+    """
+    Тело профиля без полей читателя одним запросом по первичному ключу,
+    результат сохраняется в кеш профилей
+    """
+    user = await fetch_user_profile(db, user_id)
+
+    if not user:
+        logger.error(f"Пользователь с id {user_id} и " f"api-key не найден")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "result": "false",
+                "error_type": "ValueError",
+                "error_message": "User with api_key or id not found",
+            },
+        )
+
+    # Формируем информацию о пользователе
+    user_info = {
+        "id": user.id,
+        "name": user.full_name,
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+    }
+    logger.info(
+        f"Информация о пользователе с id {user_id} и " f"api-key успешно получена"
+    )
+
+    body = dump_json({"result": "true", "user": user_info})
+    profile = CachedResponse(body=body, etag=make_etag(body))
+    profile_cache.set(user.id, profile)
+    return profile
+
+
+async def get_follow_list(
+        db: AsyncSession,
+        user_id: int,
+        direction: str,
+        limit: int,
+        cursor: Optional[str],
+) -> JSONResponse:
+    """
+    Страница подписчиков (followers) или подписок (following) пользователя
+    от новых подписок к старым. Пагинация по id подписки (keyset)
+    по индексам (subscribed_user_id, id) и (follower_user_id, id).
+    """
+    try:
+        try:
+            after = decode_cursor(cursor, 1)[0] if cursor else None
+        except ValueError as e:
+            logger.error(f"Invalid {direction} cursor {cursor}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "result": "false",
+                    "error_type": "ValueError",
+                    "error_message": "Invalid cursor",
+                },
             )
+
+        page = await fetch_follow_list(db, user_id, direction, limit + 1, after)
+
+        # Существование пользователя проверяется, только если список пуст
+        if not page and not await user_exists(db, user_id):
+            logger.error(f"Пользователь с id {user_id} не найден")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={
                     "result": "false",
                     "error_type": "ValueError",
-                    "error_message": "User with api_key or id not found",
+                    "error_message": "User with id not found",
                 },
             )
 
-        # Получаем список подписчиков пользователя
-        result = await db.execute(
-            select(SubscribedUser).filter_by(subscribed_user_id=user.id)
+        next_cursor = None
+        if len(page) > limit:
+            next_cursor = encode_cursor(page[limit - 1].cursor_id)
+        return JSONResponse(
+            content={
+                "result": "true",
+                "users": [
+                    {"id": item.id, "name": item.full_name} for item in page[:limit]
+                ],
+                "next_cursor": next_cursor,
+            },
+            status_code=status.HTTP_200_OK,
         )
-        followers = result.scalars().all()
-        followers_ids = [follower.follower_user_id for follower in followers]
-
-        # Получаем список подписок пользователя
-        result = await db.execute(
-            select(SubscribedUser).filter_by(follower_user_id=user.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка {direction} пользователя: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "result": "false",
+                "error_type": "InternalServerError",
+                "error_message": f"Error during get {direction} of user: {e}",
+            },
         )
-        following = result.scalars().all()
-        following_ids = [follow.subscribed_user_id for follow in following]
 
-        # Формируем информацию о пользователе
-        user_info = {
-            "id": user.id,
-            "name": f"{user.name} {user.surname}",
-            "followers": followers_ids,
-            "following": following_ids,
-        }
 
-        logger.info(
-            f"Информация о пользователе с id {user_id} и "
-            f"api-key успешно получена"
-        )
+async def get_follow_suggestions(
+        db: AsyncSession, api_key: str, limit: int
+) -> JSONResponse:
+    """
+    Рекомендации подписок пользователя одним индексным запросом
+    к результатам пакетного пересчета. Пользователи, на которых он
+    подписался после пересчета, пропускаются.
+    """
+    try:
+        user = await get_principal(db, api_key)
 
+        suggestions = await fetch_follow_suggestions(db, user.id, limit)
         return JSONResponse(
-            content={"result": "true", "user": user_info},
+            content={
+                "result": "true",
+                "users": [
+                    {
+                        "id": suggestion.id,
+                        "name": suggestion.full_name,
+                        "shared_count": suggestion.shared_count,
+                    }
+                    for suggestion in suggestions
+                ],
+            },
             status_code=status.HTTP_200_OK,
         )
-
-    except HTTPException as e:
-        raise e
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Ошибка при получении информации о пользователе: {e}")
+        logger.error(f"Ошибка при получении рекомендаций подписок: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={
                 "result": "false",
                 "error_type": "InternalServerError",
-                "error_message": f"Error during get info user: {str(e)}",
+                "error_message": f"Error during get follow suggestions: {e}",
             },
         )
@@ -0,0 +1,345 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from os import getenv
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import (
+    Integer,
+    Update,
+    column,
+    delete,
+    exists,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.cache import feed_cache
+from main.database.db_init import background_session
+from main.events import publish_tweet_events
+from main.models import LikeTweet, Tweet
+
+load_dotenv()
+
+# Отложенная запись лайков включается явно: до сброса буфера
+# переключения, сделанные в этом процессе, хранятся только в памяти
+LIKE_WRITE_BEHIND = getenv("LIKE_WRITE_BEHIND", "0") == "1"
+# Максимальный интервал (в секундах) между сбросами буфера - окно возможной
+# потери переключений при аварийном завершении процесса
+LIKE_FLUSH_INTERVAL = float(getenv("LIKE_FLUSH_INTERVAL", "0.5"))
+# Количество переключений, при котором буфер сбрасывается досрочно,
+# и размер пачки строк в одном запросе сброса
+LIKE_FLUSH_BATCH_SIZE = int(getenv("LIKE_FLUSH_BATCH_SIZE", "1000"))
+# Максимальное число переключений в буфере: при недоступной БД несохраненные
+# изменения не копятся без ограничений, новые переключения пишутся сразу
+LIKE_BUFFER_MAX_PENDING = int(getenv("LIKE_BUFFER_MAX_PENDING", "100000"))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+def build_likes_delta_update(deltas: Dict[int, int]) -> Update:
+    """
+    Изменение счетчиков и версий нескольких твитов одним запросом
+    по списку значений (tweet_id, delta). Версия меняется и при нулевой
+    разнице: список лайкнувших мог измениться.
+    """
+    delta_rows = values(
+        column("tweet_id", Integer), column("delta", Integer), name="deltas"
+    ).data(list(deltas.items()))
+    return (
+        update(Tweet)
+        .where(Tweet.id == delta_rows.c.tweet_id)
+        .values(
+            likes_count=Tweet.likes_count + delta_rows.c.delta,
+            version=Tweet.version + 1,
+        )
+        .returning(Tweet.id, Tweet.user_id, Tweet.likes_count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@dataclass(slots=True)
+class PendingLike:
+    """Состояние лайка в БД и состояние после переключений из буфера"""
+
+    stored: bool
+    liked: bool
+
+
+class LikeBuffer:
+    """
+    Буфер отложенной записи лайков. Переключения одного пользователя
+    на одном твите схлопываются в итоговое состояние, в БД пишется только
+    разница пачками многострочных запросов: раз в flush_interval секунд
+    или при накоплении batch_size переключений, а также при остановке.
+    Переключения не ждут сброса: сброс забирает накопленное целиком,
+    пишет его и при ошибке возвращает в буфер.
+    """
+
+    def __init__(
+            self,
+            enabled: bool,
+            flush_interval: float,
+            batch_size: int,
+            max_pending: int,
+    ) -> None:
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int], PendingLike] = {}
+        # Переключения, которые записывает текущий сброс
+        self._flushing: Dict[Tuple[int, int], PendingLike] = {}
+        # Сбросы выполняются по очереди, чтобы записи одного лайка
+        # не применились в обратном порядке
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+        self.toggles = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.overflows = 0
+
+    def accepts(self, user_id: int, tweet_id: int) -> bool:
+        """
+        Можно ли отложить переключение: в буфере есть место или лайк
+        уже в нем. Иначе переключение нужно записать в БД сразу.
+        """
+        key = (user_id, tweet_id)
+        if (
+                len(self._pending) < self.max_pending
+                or key in self._pending
+                or key in self._flushing
+        ):
+            return True
+        self.overflows += 1
+        return False
+
+    async def toggle(
+            self, db: AsyncSession, user_id: int, tweet_id: int
+    ) -> Optional[Tuple[bool, int]]:
+        """
+        Переключение лайка в буфере. Возвращает состояние лайка
+        и количество лайков с учетом буфера или None, если твита нет.
+        Буфер меняется после запроса без переключения задач,
+        поэтому блокировка не нужна.
+        """
+        result = await db.execute(
+            select(
+                Tweet.likes_count,
+                exists()
+                .where(LikeTweet.user_id == user_id, LikeTweet.tweet_id == tweet_id)
+                .label("liked"),
+            ).where(Tweet.id == tweet_id, Tweet.deleted_at.is_(None))
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        key = (user_id, tweet_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            # Переключение, которое сейчас записывается, считается сохраненным
+            flushing = self._flushing.get(key)
+            stored = row.liked if flushing is None else flushing.liked
+            pending = self._pending[key] = PendingLike(stored, stored)
+        pending.liked = not pending.liked
+        self.toggles += 1
+        likes_count = row.likes_count + self._tweet_delta(tweet_id)
+
+        if len(self._pending) >= self.batch_size and self._early_flush is None:
+            self._early_flush = asyncio.create_task(self._flush_early())
+        return pending.liked, likes_count
+
+    def pending_state(self, user_id: int, tweet_id: int) -> Optional[bool]:
+        """
+        Состояние лайка пользователя с учетом буфера для чтения своих записей
+        или None, если переключений не было
+        """
+        key = (user_id, tweet_id)
+        pending = self._pending.get(key) or self._flushing.get(key)
+        return None if pending is None else pending.liked
+
+    async def flush(self) -> int:
+        """Запись накопленных изменений в БД, возвращает число измененных строк"""
+        async with self._flush_lock:
+            self._flushing, self._pending = self._pending, {}
+            changes = [
+                (key, pending)
+                for key, pending in self._flushing.items()
+                if pending.liked != pending.stored
+            ]
+            try:
+                written = 0
+                counts: Dict[int, Tuple[int, int]] = {}
+                if changes:
+                    async with background_session() as session:
+                        for start in range(0, len(changes), self.batch_size):
+                            written += await self._write_batch(
+                                session,
+                                changes[start : start + self.batch_size],
+                                counts,
+                            )
+                        await session.commit()
+            except Exception as e:
+                # Изменения возвращаются в буфер, следующий сброс повторит запись
+                self.failures += 1
+                logger.error(f"Error during likes buffer flush: {e}")
+                self._merge_back()
+                return 0
+            self._flushing = {}
+            if not changes:
+                return 0
+
+        self.flushes += 1
+        self.rows_written += written
+        for tweet_id in {tweet_id for (_, tweet_id), _ in changes}:
+            feed_cache.invalidate_tweet(tweet_id)
+        # Читатели получают записанные в БД счетчики, а не счетчики буфера
+        await publish_tweet_events(
+            "likes_count",
+            [
+                (tweet_id, author_id, {"id": tweet_id, "likes_count": likes_count})
+                for tweet_id, (author_id, likes_count) in counts.items()
+            ],
+        )
+        logger.debug(f"Likes buffer flushed, changes: {len(changes)}, rows: {written}")
+        return written
+
+    async def _write_batch(
+            self,
+            session: AsyncSession,
+            changes: List[Tuple[Tuple[int, int], PendingLike]],
+            counts: Dict[int, Tuple[int, int]],
+    ) -> int:
+        """
+        Запись пачки изменений, возвращает число измененных строк.
+        В counts для каждого измененного твита - (id автора, количество лайков).
+        """
+        to_insert = [key for key, pending in changes if pending.liked]
+        to_delete = [key for key, pending in changes if not pending.liked]
+        deltas: Counter = Counter()
+        rows = 0
+
+        if to_insert:
+            # Лайки твитов, удаленных после переключения, не записываются
+            like_rows = values(
+                column("user_id", Integer), column("tweet_id", Integer), name="likes"
+            ).data(to_insert)
+            result = await session.execute(
+                insert(LikeTweet)
+                .from_select(
+                    ["user_id", "tweet_id"],
+                    select(like_rows.c.user_id, like_rows.c.tweet_id)
+                    .join(Tweet, Tweet.id == like_rows.c.tweet_id)
+                    .where(Tweet.deleted_at.is_(None)),
+                )
+                .on_conflict_do_nothing(constraint="unique_like_user_tweet")
+                .returning(LikeTweet.tweet_id)
+            )
+            inserted = result.scalars().all()
+            deltas.update(inserted)
+            rows += len(inserted)
+        if to_delete:
+            result = await session.execute(
+                delete(LikeTweet)
+                .where(tuple_(LikeTweet.user_id, LikeTweet.tweet_id).in_(to_delete))
+                .returning(LikeTweet.tweet_id)
+            )
+            deleted = result.scalars().all()
+            deltas.subtract(deleted)
+            rows += len(deleted)
+
+        if deltas:
+            result = await session.execute(build_likes_delta_update(deltas))
+            for tweet_id, author_id, likes_count in result.all():
+                counts[tweet_id] = (author_id, likes_count)
+        return rows
+
+    def _merge_back(self) -> None:
+        """
+        Возврат незаписанных изменений в буфер. У переключений, сделанных
+        во время сброса, сохраненным снова считается состояние в БД.
+        """
+        for key, flushed in self._flushing.items():
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = flushed
+            else:
+                pending.stored = flushed.stored
+        self._flushing = {}
+
+    def _tweet_delta(self, tweet_id: int) -> int:
+        return sum(
+            pending.liked - pending.stored
+            for entries in (self._flushing, self._pending)
+            for (_, pending_tweet_id), pending in entries.items()
+            if pending_tweet_id == tweet_id
+        )
+
+    async def _flush_early(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            self._early_flush = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Запуск периодического сброса, если отложенная запись включена"""
+        if self.enabled and self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+            logger.info(
+                f"Likes write-behind enabled, flush interval {self.flush_interval}s"
+            )
+
+    async def stop(self) -> None:
+        """Остановка периодического сброса и запись остатка буфера"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._early_flush is not None:
+            await asyncio.gather(self._early_flush, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "flushing": len(self._flushing),
+            "toggles": self.toggles,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+            "overflows": self.overflows,
+            "flush_interval": self.flush_interval,
+            "batch_size": self.batch_size,
+            "max_pending": self.max_pending,
+        }
+
+
+like_buffer = LikeBuffer(
+    enabled=LIKE_WRITE_BEHIND,
+    flush_interval=LIKE_FLUSH_INTERVAL,
+    batch_size=LIKE_FLUSH_BATCH_SIZE,
+    max_pending=LIKE_BUFFER_MAX_PENDING,
+)
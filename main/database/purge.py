@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from os import getenv
+from typing import Any, Dict, List, Optional, Type
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from main.database.db_init import background_session
+from main.database.timeline import remove_tweet
+from main.models import Base, LikeTweet, Tweet, TweetMedia
+
+load_dotenv()
+
+# Размер пачки строк liking_tweets и tweet_media, удаляемых одной транзакцией
+TWEET_PURGE_BATCH_SIZE = int(getenv("TWEET_PURGE_BATCH_SIZE", "1000"))
+# Интервал (в секундах) поиска удаленных твитов, которые не дочистила
+# фоновая задача запроса (например, из-за перезапуска процесса)
+TWEET_PURGE_INTERVAL = float(getenv("TWEET_PURGE_INTERVAL", "300"))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+class TweetPurger:
+    """
+    Дочистка мягко удаленных твитов: твит с deleted_at скрыт из чтения
+    сразу, а его лайки, связи с медиа и записи лент удаляются в фоне
+    пачками ограниченного размера, после чего удаляется сам твит.
+    """
+
+    def __init__(self, batch_size: int, interval: float) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self._sweeper: Optional[asyncio.Task] = None
+        self.tweets_purged = 0
+        self.rows_deleted = 0
+        self.failures = 0
+
+    async def _delete_batches(
+            self,
+            session: AsyncSession,
+            model: Type[Base],
+            key: InstrumentedAttribute,
+            tweet_id: int,
+    ) -> None:
+        """
+        Удаление строк model твита пачками по batch_size, каждая пачка -
+        отдельная транзакция. key - колонка, по которой выбирается пачка.
+        """
+        while True:
+            batch = (
+                select(key).where(model.tweet_id == tweet_id).limit(self.batch_size)
+            )
+            result = await session.execute(
+                delete(model)
+                .where(model.tweet_id == tweet_id, key.in_(batch.scalar_subquery()))
+                .returning(key)
+            )
+            deleted = len(result.all())
+            await session.commit()
+            self.rows_deleted += deleted
+            if deleted < self.batch_size:
+                break
+
+    async def purge_tweet(self, tweet_id: int) -> bool:
+        """
+        Удаление мягко удаленного твита и всего, что на него ссылается.
+        Возвращает False, если твит не удален мягко или дочистка не удалась.
+        """
+        try:
+            async with background_session() as session:
+                deleted_at = await session.scalar(
+                    select(Tweet.deleted_at).where(Tweet.id == tweet_id)
+                )
+                if deleted_at is None:
+                    return False
+                await self._delete_batches(session, LikeTweet, LikeTweet.id, tweet_id)
+                await self._delete_batches(
+                    session, TweetMedia, TweetMedia.media_id, tweet_id
+                )
+                await remove_tweet(tweet_id)
+                # Лайки, записанные после последней пачки, удаляются вместе
+                # с твитом, чтобы внешний ключ не помешал удалению
+                await session.execute(
+                    delete(LikeTweet).where(LikeTweet.tweet_id == tweet_id)
+                )
+                await session.execute(
+                    delete(Tweet).where(
+                        Tweet.id == tweet_id, Tweet.deleted_at.is_not(None)
+                    )
+                )
+                await session.commit()
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error during purge of tweet {tweet_id}: {e}")
+            return False
+        self.tweets_purged += 1
+        logger.info(f"Tweet {tweet_id} purged")
+        return True
+
+    async def purge_deleted(self, limit: int = 100) -> int:
+        """Дочистка до limit мягко удаленных твитов, возвращает их число"""
+        try:
+            async with background_session() as session:
+                result = await session.execute(
+                    select(Tweet.id)
+                    .where(Tweet.deleted_at.is_not(None))
+                    .order_by(Tweet.deleted_at)
+                    .limit(limit)
+                )
+                tweet_ids: List[int] = list(result.scalars().all())
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error during search of deleted tweets: {e}")
+            return 0
+        purged = 0
+        for tweet_id in tweet_ids:
+            purged += await self.purge_tweet(tweet_id)
+        return purged
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.purge_deleted()
+
+    def start(self) -> None:
+        """Запуск периодической дочистки, интервал 0 - только задачи запросов"""
+        if self.interval > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tweets_purged": self.tweets_purged,
+            "rows_deleted": self.rows_deleted,
+            "failures": self.failures,
+            "batch_size": self.batch_size,
+            "interval": self.interval,
+        }
+
+
+tweet_purger = TweetPurger(
+    batch_size=TWEET_PURGE_BATCH_SIZE,
+    interval=TWEET_PURGE_INTERVAL,
+)
@@ -0,0 +1,228 @@
+"""
+Модели чтения: неизменяемые проекции со слотами и запросы, выбирающие
+только нужные колонки. ORM-сущности со связями на путях чтения
+не загружаются.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, FrozenSet, List, Optional
+
+from sqlalchemy import Select, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.hashing import hashing_service
+from main.models import FollowSuggestion, LikeTweet, SubscribedUser, Tweet, User
+
+
+@dataclass(frozen=True, slots=True)
+class UserCredentials:
+    """Данные пользователя для проверки api-key"""
+
+    id: int
+    name: str
+    surname: str
+    api_key_hash: Optional[str]
+
+    async def verify(self, raw_key: str) -> bool:
+        """Проверка ключа без блокировки event loop"""
+        if not self.api_key_hash:
+            return False
+        return await hashing_service.verify(raw_key, self.api_key_hash)
+
+
+@dataclass(frozen=True, slots=True)
+class UserProfile:
+    """Профиль пользователя с денормализованными счетчиками"""
+
+    id: int
+    name: str
+    surname: str
+    followers_count: int
+    following_count: int
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.name} {self.surname}"
+
+
+@dataclass(frozen=True, slots=True)
+class UserListItem:
+    """Пользователь в постраничном списке, cursor_id - ключ пагинации"""
+
+    cursor_id: int
+    id: int
+    name: str
+    surname: str
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.name} {self.surname}"
+
+
+@dataclass(frozen=True, slots=True)
+class SuggestedUser:
+    """Рекомендация подписки с числом общих связей"""
+
+    id: int
+    name: str
+    surname: str
+    shared_count: int
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.name} {self.surname}"
+
+
+@dataclass(frozen=True, slots=True)
+class FeedTweet:
+    """Твит страницы ленты с автором и полями читателя"""
+
+    id: int
+    is_subscribed: int
+    likes_count: int
+    liked_by_me: bool
+    version: int
+    created_at: datetime
+    content: str
+    attachments: List[int]
+    author_id: int
+    author_name: str
+    author_surname: str
+    likes: Optional[List[int]] = None
+
+    @classmethod
+    def from_row(cls, row: Any) -> "FeedTweet":
+        return cls(**row._mapping)
+
+
+def _credentials_query() -> Select:
+    return select(User.id, User.name, User.surname, User._api_key_hash)
+
+
+async def fetch_credentials_by_digest(
+        db: AsyncSession, digest: str
+) -> Optional[UserCredentials]:
+    result = await db.execute(_credentials_query().where(User.api_key_digest == digest))
+    row = result.first()
+    return UserCredentials(*row) if row else None
+
+
+async def fetch_credentials_without_digest(
+        db: AsyncSession, limit: int
+) -> List[UserCredentials]:
+    """Не больше limit пользователей, созданных до появления дайджеста api-key"""
+    result = await db.execute(
+        _credentials_query()
+        .where(User.api_key_digest.is_(None))
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return [UserCredentials(*row) for row in result.all()]
+
+
+async def fetch_user_profile(db: AsyncSession, user_id: int) -> Optional[UserProfile]:
+    result = await db.execute(
+        select(
+            User.id,
+            User.name,
+            User.surname,
+            User.followers_count,
+            User.following_count,
+        ).where(User.id == user_id)
+    )
+    row = result.first()
+    return UserProfile(*row) if row else None
+
+
+async def user_exists(db: AsyncSession, user_id: int) -> bool:
+    return bool(await db.scalar(select(exists().where(User.id == user_id))))
+
+
+async def tweet_exists(db: AsyncSession, tweet_id: int) -> bool:
+    """Твит существует и не удален"""
+    live_tweet = exists().where(Tweet.id == tweet_id, Tweet.deleted_at.is_(None))
+    return bool(await db.scalar(select(live_tweet)))
+
+
+async def fetch_following_ids(db: AsyncSession, user_id: int) -> FrozenSet[int]:
+    result = await db.execute(
+        select(SubscribedUser.subscribed_user_id).where(
+            SubscribedUser.follower_user_id == user_id
+        )
+    )
+    return frozenset(result.scalars().all())
+
+
+async def fetch_tweet_likers(
+        db: AsyncSession, tweet_id: int, limit: int, after: Optional[int]
+) -> List[UserListItem]:
+    """
+    Лайкнувшие твит по убыванию id лайка, после лайка с id after.
+    У мягко удаленного твита список пуст, даже если лайки еще не дочищены.
+    """
+    query = (
+        select(LikeTweet.id, User.id, User.name, User.surname)
+        .join(User, User.id == LikeTweet.user_id)
+        .join(Tweet, Tweet.id == LikeTweet.tweet_id)
+        .where(LikeTweet.tweet_id == tweet_id, Tweet.deleted_at.is_(None))
+        .order_by(LikeTweet.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(LikeTweet.id < after)
+    result = await db.execute(query)
+    return [UserListItem(*row) for row in result.all()]
+
+
+# Направление списка -> (колонка владельца списка, колонка пользователей списка)
+FOLLOW_LISTS = {
+    "followers": (
+        SubscribedUser.subscribed_user_id,
+        SubscribedUser.follower_user_id,
+    ),
+    "following": (
+        SubscribedUser.follower_user_id,
+        SubscribedUser.subscribed_user_id,
+    ),
+}
+
+
+async def fetch_follow_list(
+        db: AsyncSession,
+        user_id: int,
+        direction: str,
+        limit: int,
+        after: Optional[int],
+) -> List[UserListItem]:
+    """Подписчики или подписки по убыванию id подписки, после подписки after"""
+    owner_column, item_column = FOLLOW_LISTS[direction]
+    query = (
+        select(SubscribedUser.id, User.id, User.name, User.surname)
+        .join(User, User.id == item_column)
+        .where(owner_column == user_id)
+        .order_by(SubscribedUser.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(SubscribedUser.id < after)
+    result = await db.execute(query)
+    return [UserListItem(*row) for row in result.all()]
+
+
+async def fetch_follow_suggestions(
+        db: AsyncSession, user_id: int, limit: int
+) -> List[SuggestedUser]:
+    """Рекомендации пакетного пересчета без уже оформленных подписок"""
+    already_followed = exists().where(
+        SubscribedUser.follower_user_id == user_id,
+        SubscribedUser.subscribed_user_id == FollowSuggestion.suggested_user_id,
+    )
+    result = await db.execute(
+        select(User.id, User.name, User.surname, FollowSuggestion.score)
+        .join(User, User.id == FollowSuggestion.suggested_user_id)
+        .where(FollowSuggestion.user_id == user_id, ~already_followed)
+        .order_by(FollowSuggestion.score.desc(), FollowSuggestion.suggested_user_id)
+        .limit(limit)
+    )
+    return [SuggestedUser(*row) for row in result.all()]
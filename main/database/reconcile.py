@@ -0,0 +1,106 @@
+"""
+Сверка денормализованного счетчика tweets.likes_count с таблицей liking_tweets.
+
+Запуск: python -m main.database.reconcile [--batch-size N] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.database.db_init import AsyncSessionLocal
+from main.models import LikeTweet, Tweet
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+async def reconcile_likes_count(
+        session: AsyncSession, batch_size: int = 1000, dry_run: bool = False
+) -> int:
+    """
+    Поиск и исправление расхождений likes_count пачками по id твитов.
+    Каждая пачка исправляется в отдельной транзакции.
+    Возвращает количество твитов с расхождением.
+    """
+    drifted_total = 0
+    last_id = 0
+    while True:
+        # Границы очередной пачки твитов
+        result = await session.execute(
+            select(Tweet.id).where(Tweet.id > last_id).order_by(Tweet.id).limit(batch_size)
+        )
+        batch_ids = result.scalars().all()
+        if not batch_ids:
+            break
+        first_id, last_id = batch_ids[0], batch_ids[-1]
+
+        actual = (
+            select(LikeTweet.tweet_id, func.count(LikeTweet.id).label("likes_count"))
+            .where(LikeTweet.tweet_id.between(first_id, last_id))
+            .group_by(LikeTweet.tweet_id)
+            .subquery("actual")
+        )
+        actual_count = func.coalesce(actual.c.likes_count, 0)
+        result = await session.execute(
+            select(Tweet.id, Tweet.likes_count, actual_count.label("actual_count"))
+            .outerjoin(actual, actual.c.tweet_id == Tweet.id)
+            .where(
+                and_(
+                    Tweet.id.between(first_id, last_id),
+                    Tweet.likes_count != actual_count,
+                )
+            )
+        )
+        drifted = result.all()
+        for row in drifted:
+            logger.warning(
+                f"Tweet {row.id}: likes_count {row.likes_count}, "
+                f"actual {row.actual_count}"
+            )
+        drifted_total += len(drifted)
+
+        if drifted and not dry_run:
+            await session.execute(
+                update(Tweet)
+                .where(Tweet.id.in_([row.id for row in drifted]))
+                .values(
+                    likes_count=select(func.count(LikeTweet.id))
+                    .where(LikeTweet.tweet_id == Tweet.id)
+                    .scalar_subquery(),
+                    version=Tweet.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await session.commit()
+
+    logger.info(
+        f"Likes count reconciliation finished, drifted tweets: {drifted_total}"
+        + (" (dry run)" if dry_run else "")
+    )
+    return drifted_total
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile tweets.likes_count")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as session:
+        await reconcile_likes_count(session, args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
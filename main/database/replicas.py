@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from os import getenv
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, Header
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from main.cache import TTLCache
+from main.database import db_init
+from main.database.db_init import get_db
+from main.utils import api_key_digest
+
+load_dotenv()
+
+# URL реплик для чтения через запятую, пусто - все чтение идет в основную БД
+DB_REPLICA_URLS = [
+    url.strip() for url in getenv("DB_REPLICA_URLS", "").split(",") if url.strip()
+]
+# Интервал (в секундах) проверки доступности и отставания реплик
+DB_REPLICA_HEALTH_INTERVAL = float(getenv("DB_REPLICA_HEALTH_INTERVAL", "5"))
+# Время ожидания ответа реплики при проверке
+DB_REPLICA_HEALTH_TIMEOUT = float(getenv("DB_REPLICA_HEALTH_TIMEOUT", "2"))
+# Реплика, отставшая больше чем на столько секунд, не получает чтение
+DB_REPLICA_MAX_LAG = float(getenv("DB_REPLICA_MAX_LAG", "10"))
+# Окно (в секундах) после записи, в течение которого чтение пользователя
+# идет в основную БД и видит его собственные изменения
+DB_READ_YOUR_WRITES_WINDOW = float(getenv("DB_READ_YOUR_WRITES_WINDOW", "5"))
+
+# Отставание реплики в секундах: 0, если все полученные изменения
+# применены, и 0 на основной БД, где функции репликации возвращают NULL
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+class Replica:
+    """Реплика для чтения: движок, фабрика сессий и результат проверки"""
+
+    def __init__(self, url: str) -> None:
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_async_engine(url, pool_pre_ping=True)
+        self.session_factory = sessionmaker(
+            self.engine, expire_on_commit=False, class_=AsyncSession
+        )
+        # До первой проверки чтение идет в основную БД
+        self.healthy = False
+        self.lag = 0.0
+        self.reads = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтения: по кругу между исправными репликами, в основную
+    БД - если исправных реплик нет или пользователь недавно писал.
+    Отметки о записи хранятся в памяти процесса, поэтому окно
+    read-your-writes гарантировано только в пределах воркера; отставание
+    чтения из других воркеров ограничено DB_REPLICA_MAX_LAG.
+    """
+
+    def __init__(
+            self,
+            urls: List[str],
+            health_interval: float,
+            health_timeout: float,
+            max_lag: float,
+            sticky_window: float,
+    ) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_lag = max_lag
+        self.sticky_window = sticky_window
+        # Дайджест api-key пользователя -> отметка о недавней записи
+        self._recent_writers = TTLCache(maxsize=100_000, ttl=sticky_window)
+        self._turn = 0
+        self._checker: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def mark_write(self, writer: str) -> None:
+        """Чтение пользователя идет в основную БД в течение окна после записи"""
+        if self.replicas:
+            self._recent_writers.set(writer, True)
+
+    def choose(self, reader: Optional[str] = None) -> Optional[Replica]:
+        """Реплика для чтения или None, если читать нужно из основной БД"""
+        if not self.replicas:
+            return None
+        if reader is not None and self._recent_writers.get(reader):
+            self.sticky_reads += 1
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        replica = healthy[self._turn % len(healthy)]
+        self._turn += 1
+        return replica
+
+    def session(self, reader: Optional[str] = None) -> AsyncSession:
+        """Сессия для чтения, на реплике в session.info["replica"] ее имя"""
+        replica = self.choose(reader)
+        if replica is None:
+            self.primary_reads += 1
+            return db_init.AsyncSessionLocal()
+        replica.reads += 1
+        session = replica.session_factory()
+        session.info["replica"] = replica.name
+        return session
+
+    @staticmethod
+    async def _lag(replica: Replica) -> Any:
+        async with replica.engine.connect() as connection:
+            return await connection.scalar(REPLICA_LAG_QUERY)
+
+    async def check(self, replica: Replica) -> None:
+        # Таймаут охватывает и подключение: недоступный хост не должен
+        # задерживать проверку на время TCP-таймаута
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), self.health_timeout)
+        except Exception as e:
+            replica.failures += 1
+            if replica.healthy:
+                logger.error(f"Replica {replica.name} is unavailable: {e}")
+            replica.healthy = False
+            return
+        replica.lag = float(lag or 0)
+        healthy = replica.lag <= self.max_lag
+        if healthy != replica.healthy:
+            logger.info(
+                f"Replica {replica.name} healthy: {healthy}, lag: {replica.lag:.1f}s"
+            )
+        replica.healthy = healthy
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.health_interval)
+
+    def start(self) -> None:
+        """Запуск периодической проверки реплик, если они заданы"""
+        if self.replicas and self._checker is None:
+            self._checker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [replica.stats() for replica in self.replicas],
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "recent_writers": len(self._recent_writers),
+            "max_lag": self.max_lag,
+            "sticky_window": self.sticky_window,
+        }
+
+
+replica_router = ReplicaRouter(
+    urls=DB_REPLICA_URLS,
+    health_interval=DB_REPLICA_HEALTH_INTERVAL,
+    health_timeout=DB_REPLICA_HEALTH_TIMEOUT,
+    max_lag=DB_REPLICA_MAX_LAG,
+    sticky_window=DB_READ_YOUR_WRITES_WINDOW,
+)
+
+
+def _api_key_writer(api_key: Optional[str]) -> Optional[str]:
+    return api_key_digest(api_key) if api_key else None
+
+
+async def get_read_db(
+        api_key: Optional[str] = Header(None, alias="api-key"),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for getting async session for read-only routes"""
+    async with replica_router.session(_api_key_writer(api_key)) as session:
+        yield session
+
+
+async def get_write_db(
+        db: AsyncSession = Depends(get_db),  # noqa: B008
+        api_key: Optional[str] = Header(None, alias="api-key"),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for getting async session for routes that write"""
+    # Отметка до и после записи: чтение, начатое во время записи
+    # или сразу после ответа, тоже идет в основную БД
+    writer = _api_key_writer(api_key)
+    if writer is not None:
+        replica_router.mark_write(writer)
+    try:
+        yield db
+    finally:
+        if writer is not None:
+            replica_router.mark_write(writer)
@@ -0,0 +1,154 @@
+"""
+Пакетный пересчет рекомендаций подписок "друзья друзей".
+
+Запуск: python -m main.database.suggestions [--top-n N] [--interval SECONDS]
+"""
+
+import argparse
+import asyncio
+import heapq
+import logging
+import random
+import time
+from collections import Counter
+from os import getenv
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.database.db_init import AsyncSessionLocal
+from main.graph import EMPTY, load_adjacency
+from main.models import FollowSuggestion
+
+load_dotenv()
+
+# Количество рекомендаций, сохраняемых для каждого пользователя
+SUGGESTIONS_TOP_N = int(getenv("SUGGESTIONS_TOP_N", "20"))
+# Сколько подписок каждого друга учитывается: ограничивает стоимость
+# пересчета для пользователей, подписанных на активных читателей. Из более
+# длинных списков берется случайная выборка, а не первые id: массивы
+# отсортированы, и срез отдавал бы предпочтение старым аккаунтам
+SUGGESTIONS_HOP_LIMIT = int(getenv("SUGGESTIONS_HOP_LIMIT", "1000"))
+# Размер пачки строк при записи рекомендаций
+SUGGESTIONS_BATCH_SIZE = int(getenv("SUGGESTIONS_BATCH_SIZE", "10000"))
+# Ключ advisory lock: пересчет одновременно выполняет только один процесс
+SUGGESTIONS_LOCK_ID = 7_320_020
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+def rank_candidates(
+        user_id: int,
+        following: Mapping[int, Sequence[int]],
+        top_n: int,
+        hop_limit: int = SUGGESTIONS_HOP_LIMIT,
+) -> List[Tuple[int, int]]:
+    """
+    Кандидаты на подписку в два шага по графу: подписки подписок
+    пользователя, кроме него самого и тех, на кого он уже подписан.
+    Возвращает до top_n пар (id кандидата, число общих связей)
+    по убыванию числа связей, при равенстве - по возрастанию id.
+    Подписки друга длиннее hop_limit заменяются случайной выборкой
+    с зерном user_id, чтобы пересчет был воспроизводимым.
+    """
+    followed = following.get(user_id, EMPTY)
+    counts: Counter = Counter()
+    rng = random.Random(user_id)
+    for friend_id in followed:
+        hop = following.get(friend_id, EMPTY)
+        if len(hop) > hop_limit:
+            hop = rng.sample(hop, hop_limit)
+        # Counter.update считает элементы массива в C без цикла в Python
+        counts.update(hop)
+    counts.pop(user_id, None)
+    for friend_id in followed:
+        counts.pop(friend_id, None)
+    return heapq.nlargest(top_n, counts.items(), key=lambda item: (item[1], -item[0]))
+
+
+async def refresh_follow_suggestions(
+        session: AsyncSession,
+        top_n: int = SUGGESTIONS_TOP_N,
+        hop_limit: int = SUGGESTIONS_HOP_LIMIT,
+        batch_size: int = SUGGESTIONS_BATCH_SIZE,
+) -> Optional[int]:
+    """
+    Пересчет рекомендаций всех пользователей в одной транзакции: до ее
+    фиксации читатели видят прежние рекомендации. Возвращает число
+    пользователей с рекомендациями или None, если пересчет уже выполняет
+    другой процесс.
+    """
+    started = time.perf_counter()
+    locked = await session.scalar(
+        select(func.pg_try_advisory_xact_lock(SUGGESTIONS_LOCK_ID))
+    )
+    if not locked:
+        await session.rollback()
+        logger.info("Follow suggestions are being refreshed by another process")
+        return None
+
+    following, _, edges = await load_adjacency(session, batch_size)
+    await session.execute(delete(FollowSuggestion))
+
+    users = 0
+    rows = []
+    for user_id in following:
+        ranked = rank_candidates(user_id, following, top_n, hop_limit)
+        if ranked:
+            users += 1
+        rows.extend(
+            {"user_id": user_id, "suggested_user_id": candidate_id, "score": score}
+            for candidate_id, score in ranked
+        )
+        if len(rows) >= batch_size:
+            await session.execute(insert(FollowSuggestion), rows)
+            rows = []
+    if rows:
+        await session.execute(insert(FollowSuggestion), rows)
+    await session.commit()
+
+    logger.info(
+        f"Follow suggestions refreshed, edges: {edges}, users: {users}, "
+        f"time: {time.perf_counter() - started:.2f}s"
+    )
+    return users
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh follow suggestions")
+    parser.add_argument("--top-n", type=int, default=SUGGESTIONS_TOP_N)
+    parser.add_argument("--hop-limit", type=int, default=SUGGESTIONS_HOP_LIMIT)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="repeat every INTERVAL seconds, run once if 0",
+    )
+    args = parser.parse_args()
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                await refresh_follow_suggestions(session, args.top_n, args.hop_limit)
+        except Exception as e:
+            logger.error(f"Error during refreshing follow suggestions: {e}")
+            if not args.interval:
+                raise
+        if not args.interval:
+            break
+        await asyncio.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
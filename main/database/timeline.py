@@ -0,0 +1,218 @@
+import logging
+from os import getenv
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.cache import feed_cache
+from main.database.db_init import background_session
+from main.models import HomeTimeline, SubscribedUser, Tweet, User
+
+load_dotenv()
+
+# Размер пачки строк home_timeline, записываемых в одной транзакции
+FANOUT_BATCH_SIZE = int(getenv("FANOUT_BATCH_SIZE", "1000"))
+# Твиты авторов с таким и большим числом подписчиков не рассылаются
+# по лентам, а подмешиваются в ленту при чтении
+FANOUT_FOLLOWER_THRESHOLD = int(getenv("FANOUT_FOLLOWER_THRESHOLD", "10000"))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+# Счетчики для метрик
+fanout_stats: Dict[str, int] = {
+    "tweets_fanned_out": 0,
+    "tweets_skipped": 0,
+    "rows_written": 0,
+    "rows_deleted": 0,
+    "failures": 0,
+}
+
+
+def get_fanout_stats() -> Dict[str, Any]:
+    return dict(
+        fanout_stats,
+        batch_size=FANOUT_BATCH_SIZE,
+        follower_threshold=FANOUT_FOLLOWER_THRESHOLD,
+    )
+
+
+async def is_fanout_author(session: AsyncSession, author_id: int) -> bool:
+    """Рассылаются ли твиты автора по лентам подписчиков"""
+    result = await session.execute(
+        select(User.followers_count).where(User.id == author_id)
+    )
+    followers_count = result.scalar_one_or_none() or 0
+    return followers_count < FANOUT_FOLLOWER_THRESHOLD
+
+
+async def _follower_ids_batch(
+        session: AsyncSession, author_id: int, after_id: int
+) -> List[int]:
+    result = await session.execute(
+        select(SubscribedUser.follower_user_id)
+        .where(
+            SubscribedUser.subscribed_user_id == author_id,
+            SubscribedUser.follower_user_id > after_id,
+        )
+        .order_by(SubscribedUser.follower_user_id)
+        .limit(FANOUT_BATCH_SIZE)
+    )
+    return list(result.scalars().all())
+
+
+async def fanout_tweet(tweet_id: int, author_id: int) -> None:
+    """Добавление нового твита в ленты всех подписчиков автора пачками"""
+    try:
+        async with background_session() as session:
+            if not await is_fanout_author(session, author_id):
+                fanout_stats["tweets_skipped"] += 1
+                logger.info(
+                    f"Tweet {tweet_id} of popular user {author_id} "
+                    f"will be merged into feeds on read"
+                )
+                return
+            last_follower_id = 0
+            while True:
+                follower_ids = await _follower_ids_batch(
+                    session, author_id, last_follower_id
+                )
+                if not follower_ids:
+                    break
+                await session.execute(
+                    insert(HomeTimeline)
+                    .values(
+                        [
+                            {"user_id": follower_id, "tweet_id": tweet_id}
+                            for follower_id in follower_ids
+                        ]
+                    )
+                    .on_conflict_do_nothing()
+                )
+                await session.commit()
+                fanout_stats["rows_written"] += len(follower_ids)
+                last_follower_id = follower_ids[-1]
+        fanout_stats["tweets_fanned_out"] += 1
+        # Ленты, закешированные до окончания рассылки, показывают твит
+        # вне подписок - сбрасываем их еще раз
+        feed_cache.invalidate_author(author_id)
+        logger.info(f"Tweet {tweet_id} fanned out to followers of user {author_id}")
+    except Exception as e:
+        fanout_stats["failures"] += 1
+        logger.error(f"Error during fan-out of tweet {tweet_id}: {e}")
+
+
+async def remove_tweet(tweet_id: int) -> None:
+    """Удаление твита из всех домашних лент пачками"""
+    try:
+        async with background_session() as session:
+            while True:
+                batch = (
+                    select(HomeTimeline.user_id)
+                    .where(HomeTimeline.tweet_id == tweet_id)
+                    .limit(FANOUT_BATCH_SIZE)
+                )
+                result = await session.execute(
+                    delete(HomeTimeline)
+                    .where(
+                        HomeTimeline.tweet_id == tweet_id,
+                        HomeTimeline.user_id.in_(batch.scalar_subquery()),
+                    )
+                    .returning(HomeTimeline.user_id)
+                )
+                deleted = len(result.all())
+                await session.commit()
+                fanout_stats["rows_deleted"] += deleted
+                if deleted < FANOUT_BATCH_SIZE:
+                    break
+        logger.info(f"Tweet {tweet_id} removed from home timelines")
+    except Exception as e:
+        fanout_stats["failures"] += 1
+        logger.error(f"Error during removing tweet {tweet_id} from timelines: {e}")
+
+
+async def backfill_follow(follower_id: int, author_id: int) -> None:
+    """Добавление твитов автора в ленту нового подписчика пачками"""
+    try:
+        async with background_session() as session:
+            if not await is_fanout_author(session, author_id):
+                return
+            last_tweet_id = 0
+            while True:
+                result = await session.execute(
+                    select(Tweet.id)
+                    .where(
+                        Tweet.user_id == author_id,
+                        Tweet.id > last_tweet_id,
+                        Tweet.deleted_at.is_(None),
+                    )
+                    .order_by(Tweet.id)
+                    .limit(FANOUT_BATCH_SIZE)
+                )
+                tweet_ids = result.scalars().all()
+                if not tweet_ids:
+                    break
+                await session.execute(
+                    insert(HomeTimeline)
+                    .values(
+                        [
+                            {"user_id": follower_id, "tweet_id": tweet_id}
+                            for tweet_id in tweet_ids
+                        ]
+                    )
+                    .on_conflict_do_nothing()
+                )
+                await session.commit()
+                fanout_stats["rows_written"] += len(tweet_ids)
+                last_tweet_id = tweet_ids[-1]
+        feed_cache.invalidate_viewer(follower_id)
+        logger.info(f"Timeline of user {follower_id} backfilled from user {author_id}")
+    except Exception as e:
+        fanout_stats["failures"] += 1
+        logger.error(
+            f"Error during backfill of user {follower_id} from user {author_id}: {e}"
+        )
+
+
+async def prune_follow(follower_id: int, author_id: int) -> None:
+    """Удаление твитов автора из ленты отписавшегося пользователя пачками"""
+    try:
+        async with background_session() as session:
+            while True:
+                batch = (
+                    select(HomeTimeline.tweet_id)
+                    .join(Tweet, Tweet.id == HomeTimeline.tweet_id)
+                    .where(HomeTimeline.user_id == follower_id, Tweet.user_id == author_id)
+                    .limit(FANOUT_BATCH_SIZE)
+                )
+                result = await session.execute(
+                    delete(HomeTimeline)
+                    .where(
+                        HomeTimeline.user_id == follower_id,
+                        HomeTimeline.tweet_id.in_(batch.scalar_subquery()),
+                    )
+                    .returning(HomeTimeline.tweet_id)
+                )
+                deleted = len(result.all())
+                await session.commit()
+                fanout_stats["rows_deleted"] += deleted
+                if deleted < FANOUT_BATCH_SIZE:
+                    break
+        feed_cache.invalidate_viewer(follower_id)
+        logger.info(f"Timeline of user {follower_id} pruned from user {author_id}")
+    except Exception as e:
+        fanout_stats["failures"] += 1
+        logger.error(
+            f"Error during prune of user {follower_id} from user {author_id}: {e}"
+        )
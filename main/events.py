@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from os import getenv
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from main.database.db_init import background_session
+from main.graph import follow_graph
+from main.models import SubscribedUser
+
+load_dotenv()
+
+# Максимальное число неотправленных событий одного подключения
+SSE_BUFFER_SIZE = int(getenv("SSE_BUFFER_SIZE", "64"))
+# Интервал (в секундах) между heartbeat-комментариями в пустом потоке
+SSE_HEARTBEAT_INTERVAL = float(getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+# Окно (в секундах), в течение которого всплеск событий собирается в одну пачку
+SSE_COALESCE_WINDOW = float(getenv("SSE_COALESCE_WINDOW", "0.2"))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+
+class Subscription:
+    """
+    Подписка одного SSE-подключения. Неотправленные события хранятся
+    в ограниченном буфере по ключу (тип события, id твита): повторное
+    событие о том же твите заменяет предыдущее. При переполнении буфер
+    сбрасывается и клиенту отправляется одно событие resync.
+    """
+
+    __slots__ = ("user_id", "maxsize", "overflowed", "_pending", "_ready")
+
+    def __init__(self, user_id: int, maxsize: int) -> None:
+        self.user_id = user_id
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._pending: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, event: str, tweet_id: int, data: Dict[str, Any]) -> str:
+        """Добавление события в буфер, возвращает queued, coalesced или overflow"""
+        self._ready.set()
+        if self.overflowed:
+            return "overflow"
+        key = (event, tweet_id)
+        if key in self._pending:
+            self._pending[key] = data
+            return "coalesced"
+        if len(self._pending) >= self.maxsize:
+            self._pending.clear()
+            self.overflowed = True
+            return "overflow"
+        self._pending[key] = data
+        return "queued"
+
+    async def next_batch(
+            self, timeout: float, window: float = SSE_COALESCE_WINDOW
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Ожидание событий не дольше timeout. Пустой список означает,
+        что событий не было и нужно отправить heartbeat.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if window:
+            await asyncio.sleep(window)  # собираем всплеск событий в одну пачку
+        self._ready.clear()
+        if self.overflowed:
+            self.overflowed = False
+            return [("resync", {})]
+        batch = [(event, data) for (event, _), data in self._pending.items()]
+        self._pending.clear()
+        return batch
+
+
+class EventBroker:
+    """
+    Рассылка событий SSE-подключениям текущего процесса.
+    Подключения к другим воркерам событий этого воркера не получают,
+    клиенты досинхронизируются через since_id после resync или переподключения.
+    """
+
+    def __init__(self, buffer_size: int) -> None:
+        self.buffer_size = buffer_size
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.buffer_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def connected_user_ids(self) -> List[int]:
+        return list(self._subscriptions)
+
+    def publish(
+            self,
+            user_ids: Optional[Iterable[int]],
+            event: str,
+            tweet_id: int,
+            data: Dict[str, Any],
+    ) -> None:
+        """Событие для подключений пользователей user_ids, None - для всех"""
+        self.published += 1
+        if user_ids is None:
+            user_ids = self.connected_user_ids()
+        for user_id in user_ids:
+            for subscription in self._subscriptions.get(user_id, ()):
+                outcome = subscription.push(event, tweet_id, data)
+                if outcome == "queued":
+                    self.delivered += 1
+                elif outcome == "coalesced":
+                    self.coalesced += 1
+                else:
+                    self.overflows += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(subs) for subs in self._subscriptions.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "overflows": self.overflows,
+        }
+
+
+event_broker = EventBroker(buffer_size=SSE_BUFFER_SIZE)
+
+
+def format_event(event: str, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+async def event_stream(
+        user_id: int, heartbeat: float = SSE_HEARTBEAT_INTERVAL
+) -> AsyncIterator[bytes]:
+    """
+    Поток SSE пользователя. Подписка создается при начале отправки
+    и удаляется при отключении клиента.
+    """
+    subscription = event_broker.subscribe(user_id)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            batch = await subscription.next_batch(heartbeat)
+            if not batch:
+                yield b": heartbeat\n\n"
+                continue
+            yield b"".join(format_event(event, data) for event, data in batch)
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+async def author_audiences(author_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """
+    Получатели событий о твитах каждого автора: подключенные к процессу
+    подписчики автора и сам автор. Остальные подключения этих событий
+    не получают - твитов автора нет в их лентах подписок.
+    """
+    author_ids = set(author_ids)
+    connected = event_broker.connected_user_ids()
+    audiences: Dict[int, List[int]] = {
+        author_id: [author_id] for author_id in author_ids
+    }
+    if not connected or not author_ids:
+        return audiences
+    if follow_graph.loaded:
+        for author_id in author_ids:
+            audiences[author_id].extend(
+                user_id
+                for user_id in connected
+                if follow_graph.is_following(user_id, author_id)
+            )
+        return audiences
+    async with background_session() as session:
+        result = await session.execute(
+            select(
+                SubscribedUser.subscribed_user_id, SubscribedUser.follower_user_id
+            ).where(
+                SubscribedUser.subscribed_user_id.in_(author_ids),
+                SubscribedUser.follower_user_id
+                == any_(bindparam("connected", connected, type_=ARRAY(Integer))),
+            )
+        )
+        for author_id, follower_id in result.all():
+            audiences[author_id].append(follower_id)
+    return audiences
+
+
+async def publish_tweet_events(
+        event: str, events: List[Tuple[int, int, Dict[str, Any]]]
+) -> None:
+    """
+    События event о твитах для аудиторий их авторов.
+    events - список (id твита, id автора, данные события).
+    """
+    if not events:
+        return
+    try:
+        audiences = await author_audiences(author_id for _, author_id, _ in events)
+        for tweet_id, author_id, data in events:
+            event_broker.publish(audiences[author_id], event, tweet_id, data)
+    except Exception as e:
+        logger.error(f"Error during publishing {event} events: {e}")
+
+
+async def publish_new_tweet(tweet_id: int, author_id: int) -> None:
+    """
+    Событие о новом твите для подключенных подписчиков автора и самого автора.
+    Выполняется после рассылки твита по лентам, чтобы клиент сразу получил
+    его при запросе ленты.
+    """
+    data = {"id": tweet_id, "author_id": author_id}
+    await publish_tweet_events("tweet_created", [(tweet_id, author_id, data)])
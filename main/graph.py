@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from os import getenv
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.database.db_init import background_session
+from main.models import SubscribedUser
+
+load_dotenv()
+
+# Индекс графа подписок в памяти включен по умолчанию, "0" - выключить
+FOLLOW_GRAPH_ENABLED = getenv("FOLLOW_GRAPH_ENABLED", "1") == "1"
+# Интервал (в секундах) полной перезагрузки графа из БД: подписки,
+# сделанные через другие воркеры, видны не позже чем через этот интервал
+FOLLOW_GRAPH_REFRESH_INTERVAL = float(getenv("FOLLOW_GRAPH_REFRESH_INTERVAL", "300"))
+# Размер пачки строк subscribed_users при загрузке графа
+FOLLOW_GRAPH_LOAD_BATCH_SIZE = int(getenv("FOLLOW_GRAPH_LOAD_BATCH_SIZE", "10000"))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+console_handler = logging.StreamHandler()
+console_handler.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - " "%(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+
+EMPTY = array("i")
+
+
+def _contains(ids: Sequence[int], item: int) -> bool:
+    index = bisect_left(ids, item)
+    return index < len(ids) and ids[index] == item
+
+
+def _insert(index: Dict[int, array], key: int, item: int) -> bool:
+    ids = index.get(key)
+    if ids is None:
+        index[key] = array("i", (item,))
+        return True
+    position = bisect_left(ids, item)
+    if position < len(ids) and ids[position] == item:
+        return False
+    ids.insert(position, item)
+    return True
+
+
+def _delete(index: Dict[int, array], key: int, item: int) -> bool:
+    ids = index.get(key)
+    if ids is None:
+        return False
+    position = bisect_left(ids, item)
+    if position == len(ids) or ids[position] != item:
+        return False
+    del ids[position]
+    if not ids:
+        del index[key]
+    return True
+
+
+async def load_adjacency(
+        session: AsyncSession, batch_size: int
+) -> Tuple[Dict[int, array], Dict[int, array], int]:
+    """
+    Чтение subscribed_users потоком в отсортированные массивы подписок
+    и подписчиков. Строки идут по порядку (follower_user_id,
+    subscribed_user_id), поэтому массивы подписок заполняются уже
+    отсортированными. Возвращает подписки, подписчиков и число ребер.
+    """
+    following: Dict[int, array] = {}
+    followers: Dict[int, array] = {}
+    edges = 0
+    result = await session.stream(
+        select(SubscribedUser.follower_user_id, SubscribedUser.subscribed_user_id)
+        .order_by(SubscribedUser.follower_user_id, SubscribedUser.subscribed_user_id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in result.partitions():
+        for follower_id, author_id in partition:
+            ids = following.get(follower_id)
+            if ids is None:
+                ids = following[follower_id] = array("i")
+            ids.append(author_id)
+            ids = followers.get(author_id)
+            if ids is None:
+                ids = followers[author_id] = array("i")
+            ids.append(follower_id)
+            edges += 1
+    for author_id, ids in followers.items():
+        followers[author_id] = array("i", sorted(ids))
+    return following, followers, edges
+
+
+class FollowGraph:
+    """
+    Граф подписок в памяти процесса: для каждого пользователя отсортированные
+    массивы int32 id подписок и подписчиков. Проверка подписки - бинарный
+    поиск, список соседей - готовый массив без запроса к БД.
+    Граф загружается при старте, обновляется подписками этого процесса
+    и периодически перезагружается целиком. Пока граф не загружен,
+    вызывающий код обращается к БД.
+    """
+
+    def __init__(self, enabled: bool, refresh_interval: float, batch_size: int) -> None:
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.loaded = False
+        self._following: Dict[int, array] = {}
+        self._followers: Dict[int, array] = {}
+        self._edges = 0
+        # Изменения, сделанные во время загрузки, применяются после нее
+        self._changes_during_load: Optional[List[Tuple[bool, int, int]]] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.failures = 0
+
+    def is_following(self, follower_id: int, author_id: int) -> bool:
+        return _contains(self._following.get(follower_id, EMPTY), author_id)
+
+    def following_ids(self, user_id: int) -> Sequence[int]:
+        """Отсортированные id подписок пользователя, только для чтения"""
+        return self._following.get(user_id, EMPTY)
+
+    def follower_ids(self, user_id: int) -> Sequence[int]:
+        """Отсортированные id подписчиков пользователя, только для чтения"""
+        return self._followers.get(user_id, EMPTY)
+
+    def add(self, follower_id: int, author_id: int) -> None:
+        """Подписка, сохраненная в БД этим процессом"""
+        if self._changes_during_load is not None:
+            self._changes_during_load.append((True, follower_id, author_id))
+        if _insert(self._following, follower_id, author_id):
+            _insert(self._followers, author_id, follower_id)
+            self._edges += 1
+
+    def remove(self, follower_id: int, author_id: int) -> None:
+        """Отписка, сохраненная в БД этим процессом"""
+        if self._changes_during_load is not None:
+            self._changes_during_load.append((False, follower_id, author_id))
+        if _delete(self._following, follower_id, author_id):
+            _delete(self._followers, author_id, follower_id)
+            self._edges -= 1
+
+    async def load(self) -> None:
+        """Полная загрузка графа из subscribed_users"""
+        started = time.perf_counter()
+        self._changes_during_load = []
+        try:
+            async with background_session() as session:
+                following, followers, edges = await load_adjacency(
+                    session, self.batch_size
+                )
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error during loading follow graph: {e}")
+            return
+        finally:
+            changes, self._changes_during_load = self._changes_during_load, None
+
+        self._following, self._followers, self._edges = following, followers, edges
+        for followed, follower_id, author_id in changes:
+            if followed:
+                self.add(follower_id, author_id)
+            else:
+                self.remove(follower_id, author_id)
+        self.loaded = True
+        self.loads += 1
+        self.load_seconds = time.perf_counter() - started
+        logger.info(
+            f"Follow graph loaded, edges: {self._edges}, "
+            f"time: {self.load_seconds:.2f}s"
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await self.load()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Загрузка графа и периодическая перезагрузка, если индекс включен"""
+        if self.enabled and self._refresher is None:
+            self._refresher = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    def clear(self) -> None:
+        self._following, self._followers, self._edges = {}, {}, 0
+        self.loaded = False
+
+    def memory_bytes(self) -> int:
+        """Память массивов и словарей графа без учета общих объектов int"""
+        total = sys.getsizeof(self._following) + sys.getsizeof(self._followers)
+        for index in (self._following, self._followers):
+            total += sum(sys.getsizeof(ids) for ids in index.values())
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory_bytes()
+        return {
+            "enabled": self.enabled,
+            "loaded": self.loaded,
+            "edges": self._edges,
+            "users": len(self._following.keys() | self._followers.keys()),
+            "memory_bytes": memory,
+            "memory_mb_per_million_edges": (
+                memory / self._edges * 1_000_000 / 2**20 if self._edges else 0.0
+            ),
+            "loads": self.loads,
+            "last_load_seconds": self.load_seconds,
+            "failures": self.failures,
+            "refresh_interval": self.refresh_interval,
+        }
+
+
+follow_graph = FollowGraph(
+    enabled=FOLLOW_GRAPH_ENABLED,
+    refresh_interval=FOLLOW_GRAPH_REFRESH_INTERVAL,
+    batch_size=FOLLOW_GRAPH_LOAD_BATCH_SIZE,
+)
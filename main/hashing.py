@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from os import getenv
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Тип пула ("thread" или "process") и количество воркеров для bcrypt
+HASHING_POOL = getenv("HASHING_POOL", "thread")
+HASHING_WORKERS = int(getenv("HASHING_WORKERS", "4"))
+
+logger = logging.getLogger(__name__)
+
+
+def hash_api_key(raw_key: str) -> str:
+    """bcrypt-хеш api-key"""
+    return bcrypt.hashpw(raw_key.encode(), bcrypt.gensalt()).decode()
+
+
+def check_api_key(raw_key: str, hashed: str) -> bool:
+    """Проверка api-key по bcrypt-хешу"""
+    if not hashed:
+        return False
+    try:
+        return bcrypt.checkpw(raw_key.encode(), hashed.encode())
+    except (ValueError, AttributeError):
+        return False
+
+
+class HashingService:
+    """
+    Выполнение bcrypt в пуле потоков или процессов, чтобы не блокировать
+    event loop. Ведет счетчики для метрик глубины очереди.
+    """
+
+    def __init__(self, pool: str, workers: int) -> None:
+        if pool not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing pool type: {pool}")
+        self.pool = pool
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self.submitted = 0
+        self.completed = 0
+        self.max_pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Задачи, отправленные в пул и еще не завершенные"""
+        return self.submitted - self.completed
+
+    @property
+    def queue_depth(self) -> int:
+        """Задачи, ожидающие свободного воркера"""
+        return max(0, self.pending - self.workers)
+
+    async def hash(self, raw_key: str) -> str:
+        return await self._run(hash_api_key, raw_key)
+
+    async def verify(self, raw_key: str, hashed: str) -> bool:
+        return await self._run(check_api_key, raw_key, hashed)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool": self.pool,
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+        }
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.pool == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="hashing"
+                )
+            logger.info(f"Hashing {self.pool} pool started with {self.workers} workers")
+        return self._executor
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.completed += 1
+
+
+hashing_service = HashingService(HASHING_POOL, HASHING_WORKERS)
@@ -1,9 +1,25 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    func,
+    text,
+)
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.asyncio import AsyncAttrs
+from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.orm import declarative_base, relationship
-import bcrypt
 
-Base = declarative_base()
+from main.hashing import check_api_key, hash_api_key, hashing_service
+from main.utils import api_key_digest
+
+# Связи загружаются только по требованию: await obj.awaitable_attrs.<связь>.
+# Пути чтения выбирают нужные колонки явно (main.database.read_models)
+Base = declarative_base(cls=AsyncAttrs)
 
 
 class SubscribedUser(Base):
@@ -16,19 +32,22 @@ class SubscribedUser(Base):
         UniqueConstraint(
             "follower_user_id", "subscribed_user_id", name="unique_user_subscribed"
         ),
+        # Постраничные списки подписчиков и подписок по убыванию id подписки
+        Index("ix_subscribed_users_subscribed_user_id_id", "subscribed_user_id", "id"),
+        Index("ix_subscribed_users_follower_user_id_id", "follower_user_id", "id"),
     )
 
     follower = relationship(
         "User",
         foreign_keys=[follower_user_id],
         back_populates="follower",
-        lazy="selectin",
+        lazy="select",
     )
     subscribed = relationship(
         "User",
         foreign_keys=[subscribed_user_id],
         back_populates="subscribed_to",
-        lazy="selectin",
+        lazy="select",
     )
 
 
@@ -38,54 +57,63 @@ class User(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     login = Column(String(50), nullable=False, unique=True)  # Изменено
     _api_key_hash = Column("api_key", String(255), index=True)
+    # HMAC-дайджест ключа для поиска пользователя одним индексным запросом
+    api_key_digest = Column(String(64), unique=True, index=True)
     name = Column(String(50), nullable=False)
     surname = Column(String(50), nullable=False)
+    # Денормализованное количество подписчиков, обновляется вместе с subscribed_users
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Денормализованное количество подписок пользователя
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     @property
     def api_key(self):
         raise AttributeError("Доступ к API-ключу запрещен")
 
     def set_api_key(self, raw_key: str):
-        self._api_key_hash = bcrypt.hashpw(
-            raw_key.encode(),
-            bcrypt.gensalt()
-        ).decode()
+        self._api_key_hash = hash_api_key(raw_key)
+        self.api_key_digest = api_key_digest(raw_key)
 
     def verify_api_key(self, raw_key: str) -> bool:
         if not hasattr(self, '_api_key_hash') or not self._api_key_hash:
             return False
-        try:
-            return bcrypt.checkpw(
-                raw_key.encode(),
-                self._api_key_hash.encode()
-            )
-        except (ValueError, AttributeError):
+        return check_api_key(raw_key, self._api_key_hash)
+
+    async def set_api_key_async(self, raw_key: str):
+        """set_api_key без блокировки event loop"""
+        self._api_key_hash = await hashing_service.hash(raw_key)
+        self.api_key_digest = api_key_digest(raw_key)
+
+    async def verify_api_key_async(self, raw_key: str) -> bool:
+        """verify_api_key без блокировки event loop"""
+        if not hasattr(self, '_api_key_hash') or not self._api_key_hash:
             return False
+        return await hashing_service.verify(raw_key, self._api_key_hash)
 
     __table_args__ = (
         UniqueConstraint("api_key", name="unique_api_key"),
     )
 
     tweet = relationship(
-        "Tweet", back_populates="user", cascade="all, delete-orphan", lazy="selectin"
+        "Tweet", back_populates="user", cascade="all, delete-orphan", lazy="select"
     )
     follower = relationship(
         "SubscribedUser",
         foreign_keys=[SubscribedUser.subscribed_user_id],
         back_populates="subscribed",
-        lazy="selectin",
+        lazy="select",
     )
     subscribed_to = relationship(
         "SubscribedUser",
         foreign_keys=[SubscribedUser.follower_user_id],
         back_populates="follower",
-        lazy="selectin",
+        lazy="select",
     )
     liked_tweets = relationship(
         "LikeTweet",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
     )
 
 
@@ -95,14 +123,49 @@ class Tweet(Base):
     id = Column(Integer(), primary_key=True, autoincrement=True)
     user_id = Column(Integer(), ForeignKey("users.id"), nullable=False)
     content = Column(String(500), nullable=False, default="")
-    attachments = Column(ARRAY(Integer))
+    # Денормализованное количество лайков, обновляется вместе с liking_tweets
+    likes_count = Column(Integer(), nullable=False, default=0, server_default="0")
+    # Версия представления твита, увеличивается при каждом изменении лайков
+    version = Column(Integer(), nullable=False, default=0, server_default="0")
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Время мягкого удаления: твит скрыт из чтения, пока фоновая
+    # дочистка (main.database.purge) удаляет его лайки и медиа
+    deleted_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_tweets_likes_count_id", "likes_count", "id"),
+        # Лучшие твиты автора: популярные авторы, подмешиваемые в ленту
+        Index("ix_tweets_user_id_likes_count_id", "user_id", "likes_count", "id"),
+        Index("ix_tweets_created_at", "created_at"),
+        # Твиты автора по id: дозаполнение лент, популярные авторы в ленте
+        Index("ix_tweets_user_id_id", "user_id", "id"),
+        # Мягко удаленные твиты, ожидающие дочистки
+        Index(
+            "ix_tweets_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
 
-    user = relationship("User", back_populates="tweet")
+    user = relationship("User", back_populates="tweet", lazy="select")
     liked_by = relationship(
         "LikeTweet",
         back_populates="tweet",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        lazy="select",
+    )
+    media = relationship(
+        "TweetMedia",
+        order_by="TweetMedia.position",
+        collection_class=ordering_list("position"),
+        cascade="all, delete-orphan",
+        lazy="select",
+    )
+    # Упорядоченный список id медиа твита: Tweet(attachments=[...])
+    attachments = association_proxy(
+        "media", "media_id", creator=lambda media_id: TweetMedia(media_id=media_id)
     )
 
 
@@ -114,10 +177,12 @@ class LikeTweet(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "tweet_id", name="unique_like_user_tweet"),
+        # Постраничный список лайкнувших твит по убыванию id лайка
+        Index("ix_liking_tweets_tweet_id_id", "tweet_id", "id"),
     )
 
-    user = relationship("User", back_populates="liked_tweets", lazy="selectin")
-    tweet = relationship("Tweet", back_populates="liked_by", lazy="selectin")
+    user = relationship("User", back_populates="liked_tweets", lazy="select")
+    tweet = relationship("Tweet", back_populates="liked_by", lazy="select")
 
 
 class Media(Base):
@@ -125,3 +190,52 @@ class Media(Base):
 
     id = Column(Integer(), primary_key=True, autoincrement=True)
     path = Column(String(500), nullable=False, default="")
+
+
+class TweetMedia(Base):
+    """Медиа твита, position - порядок вложения в твите"""
+
+    __tablename__ = "tweet_media"
+    tweet_id = Column(Integer, ForeignKey("tweets.id"), primary_key=True)
+    media_id = Column(Integer, ForeignKey("media.id"), primary_key=True)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Медиа страницы ленты по порядку вложения
+        Index("ix_tweet_media_tweet_id_position", "tweet_id", "position"),
+        # Твиты, к которым приложено медиа, и медиа без твитов
+        Index("ix_tweet_media_media_id", "media_id"),
+    )
+
+
+class HomeTimeline(Base):
+    """
+    Материализованная домашняя лента: твиты авторов, на которых подписан
+    пользователь. Заполняется фоновым fan-out после записи, поэтому
+    внешних ключей нет - записи удаленных твитов вычищаются асинхронно.
+    Лента читается по первичному ключу (user_id, tweet_id) вместе
+    с индексом твитов по лайкам, собственный порядок записей не хранится.
+    """
+
+    __tablename__ = "home_timeline"
+    user_id = Column(Integer, primary_key=True)
+    tweet_id = Column(Integer, primary_key=True)
+
+    __table_args__ = (Index("ix_home_timeline_tweet_id", "tweet_id"),)
+
+
+class FollowSuggestion(Base):
+    """
+    Рекомендации подписок: пользователи, на которых подписаны подписки
+    пользователя, с числом общих связей score. Пересчитываются целиком
+    пакетной задачей main.database.suggestions, поэтому внешних ключей нет.
+    """
+
+    __tablename__ = "follow_suggestions"
+    user_id = Column(Integer, primary_key=True)
+    suggested_user_id = Column(Integer, primary_key=True)
+    score = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_follow_suggestions_user_id_score", "user_id", "score"),
+    )
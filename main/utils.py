@@ -1,6 +1,105 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+from os import getenv
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
+# Секрет для ключевого дайджеста API-ключей (HMAC-SHA256), обязателен
+API_KEY_DIGEST_SECRET = getenv("API_KEY_DIGEST_SECRET", "")
+# Предыдущий секрет на время ротации: пользователи с дайджестом по нему
+# находятся при входе, и их дайджест пересчитывается по новому секрету
+API_KEY_DIGEST_PREVIOUS_SECRET = getenv("API_KEY_DIGEST_PREVIOUS_SECRET", "")
+# Сколько пользователей без дайджеста (созданных до его появления)
+# проверяется перебором при входе, 0 - перебор отключен
+API_KEY_LEGACY_SCAN_LIMIT = int(getenv("API_KEY_LEGACY_SCAN_LIMIT", "1000"))
+
+# Допустимый диапазон полей курсора пагинации - колонки integer в Postgres
+CURSOR_MIN = -(2**31)
+CURSOR_MAX = 2**31 - 1
+
 
 def allowed_file(filename: str) -> bool:
     """Проверяет, является ли расширение файла допустимым."""
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def check_api_key_digest_secret() -> None:
+    """
+    Проверка настройки секрета при запуске приложения: без него дайджест
+    ключа вычисляется без секрета и перебором подбирается по утечке БД
+    """
+    if not API_KEY_DIGEST_SECRET:
+        raise RuntimeError("API_KEY_DIGEST_SECRET is not set")
+
+
+def api_key_digest(raw_key: str, secret: Optional[str] = None) -> str:
+    """
+    Детерминированный дайджест API-ключа для поиска пользователя по индексу.
+    В отличие от bcrypt-хеша, одинаков для одного и того же ключа.
+    По умолчанию вычисляется с текущим секретом.
+    """
+    if secret is None:
+        secret = API_KEY_DIGEST_SECRET
+    return hmac.new(secret.encode(), raw_key.encode(), hashlib.sha256).hexdigest()
+
+
+def previous_api_key_digest(raw_key: str) -> Optional[str]:
+    """Дайджест ключа с предыдущим секретом или None, если ротации нет"""
+    if not API_KEY_DIGEST_PREVIOUS_SECRET:
+        return None
+    return api_key_digest(raw_key, API_KEY_DIGEST_PREVIOUS_SECRET)
+
+
+def encode_cursor(*values: int) -> str:
+    """Непрозрачный курсор пагинации из ключа сортировки последней записи"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[int, ...]:
+    """
+    Разбор курсора, созданного encode_cursor.
+    ValueError, если курсор поврежден, имеет другую длину
+    или его поля не помещаются в integer.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if (
+            not isinstance(values, list)
+            or len(values) != size
+            or not all(
+                type(value) is int and CURSOR_MIN <= value <= CURSOR_MAX
+                for value in values
+            )
+    ):
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+
+def make_etag(body: bytes) -> str:
+    """Слабый ETag по содержимому ответа, одинаковый во всех воркерах"""
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag со значением заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
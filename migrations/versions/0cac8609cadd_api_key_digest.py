@@ -0,0 +1,37 @@
+"""Api key digest
+
+Revision ID: 0cac8609cadd
+Revises: 6d796d48f8c9
+Create Date: 2026-10-18 10:12:40.118305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0cac8609cadd"
+down_revision: Union[str, None] = "6d796d48f8c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дайджест нельзя вычислить из bcrypt-хеша, поэтому колонка остается
+    # пустой у существующих пользователей и заполняется при их следующем
+    # успешном входе (см. check_api_key_user)
+    op.add_column(
+        "users", sa.Column("api_key_digest", sa.String(length=64), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_users_api_key_digest"), "users", ["api_key_digest"], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_users_api_key_digest"), table_name="users")
+    op.drop_column("users", "api_key_digest")
@@ -0,0 +1,46 @@
+"""Home timeline
+
+Revision ID: 15ccbbbe4b0a
+Revises: c0796c861f6a
+Create Date: 2026-10-18 11:48:05.270113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "15ccbbbe4b0a"
+down_revision: Union[str, None] = "c0796c861f6a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "home_timeline",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "tweet_id"),
+    )
+    # Заполняем ленты по существующим подпискам
+    op.execute(
+        """
+        INSERT INTO home_timeline (user_id, tweet_id)
+        SELECT subscribed_users.follower_user_id, tweets.id
+        FROM subscribed_users
+        JOIN tweets ON tweets.user_id = subscribed_users.subscribed_user_id
+        """
+    )
+    op.create_index(
+        "ix_home_timeline_tweet_id", "home_timeline", ["tweet_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_home_timeline_tweet_id", table_name="home_timeline")
+    op.drop_table("home_timeline")
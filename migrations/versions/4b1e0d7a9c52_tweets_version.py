@@ -0,0 +1,31 @@
+"""Tweets version
+
+Revision ID: 4b1e0d7a9c52
+Revises: 8325ce70e36b
+Create Date: 2026-10-18 13:05:17.218904
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "4b1e0d7a9c52"
+down_revision: Union[str, None] = "8325ce70e36b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tweets",
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tweets", "version")
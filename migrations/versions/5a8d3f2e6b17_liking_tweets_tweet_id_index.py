@@ -0,0 +1,32 @@
+"""Liking tweets tweet id index
+
+Revision ID: 5a8d3f2e6b17
+Revises: 9e2f4c1b7d36
+Create Date: 2026-10-18 15:07:44.218390
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5a8d3f2e6b17"
+down_revision: Union[str, None] = "9e2f4c1b7d36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_liking_tweets_tweet_id_id",
+        "liking_tweets",
+        ["tweet_id", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_liking_tweets_tweet_id_id", table_name="liking_tweets")
@@ -0,0 +1,43 @@
+"""Follow suggestions
+
+Revision ID: 7b4e9c2a1f05
+Revises: c3f7a1d9e284
+Create Date: 2026-10-18 16:31:05.774102
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7b4e9c2a1f05"
+down_revision: Union[str, None] = "c3f7a1d9e284"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "follow_suggestions",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("suggested_user_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "suggested_user_id"),
+    )
+    op.create_index(
+        "ix_follow_suggestions_user_id_score",
+        "follow_suggestions",
+        ["user_id", "score"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_follow_suggestions_user_id_score", table_name="follow_suggestions"
+    )
+    op.drop_table("follow_suggestions")
@@ -0,0 +1,52 @@
+"""Users followers count
+
+Revision ID: 8325ce70e36b
+Revises: 15ccbbbe4b0a
+Create Date: 2026-10-18 12:21:44.902361
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "8325ce70e36b"
+down_revision: Union[str, None] = "15ccbbbe4b0a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("followers_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Заполняем счетчики по существующим подпискам
+    op.execute(
+        """
+        UPDATE users
+        SET followers_count = counts.followers_count
+        FROM (
+            SELECT subscribed_user_id, count(*) AS followers_count
+            FROM subscribed_users
+            GROUP BY subscribed_user_id
+        ) AS counts
+        WHERE users.id = counts.subscribed_user_id
+        """
+    )
+    # Лучшие твиты автора для подмешивания популярных авторов в ленту
+    op.create_index(
+        "ix_tweets_user_id_likes_count_id",
+        "tweets",
+        ["user_id", "likes_count", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweets_user_id_likes_count_id", table_name="tweets")
+    op.drop_column("users", "followers_count")
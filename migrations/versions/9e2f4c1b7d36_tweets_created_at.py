@@ -0,0 +1,38 @@
+"""Tweets created at
+
+Revision ID: 9e2f4c1b7d36
+Revises: 4b1e0d7a9c52
+Create Date: 2026-10-18 13:42:08.531277
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9e2f4c1b7d36"
+down_revision: Union[str, None] = "4b1e0d7a9c52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tweets",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_tweets_created_at", "tweets", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweets_created_at", table_name="tweets")
+    op.drop_column("tweets", "created_at")
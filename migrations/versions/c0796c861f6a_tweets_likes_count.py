@@ -0,0 +1,48 @@
+"""Tweets likes count
+
+Revision ID: c0796c861f6a
+Revises: 0cac8609cadd
+Create Date: 2026-10-18 11:02:17.532904
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c0796c861f6a"
+down_revision: Union[str, None] = "0cac8609cadd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tweets",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Заполняем счетчики по существующим лайкам
+    op.execute(
+        """
+        UPDATE tweets
+        SET likes_count = counts.likes_count
+        FROM (
+            SELECT tweet_id, count(*) AS likes_count
+            FROM liking_tweets
+            GROUP BY tweet_id
+        ) AS counts
+        WHERE tweets.id = counts.tweet_id
+        """
+    )
+    op.create_index(
+        "ix_tweets_likes_count_id", "tweets", ["likes_count", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweets_likes_count_id", table_name="tweets")
+    op.drop_column("tweets", "likes_count")
@@ -0,0 +1,62 @@
+"""Users following count
+
+Revision ID: c3f7a1d9e284
+Revises: 5a8d3f2e6b17
+Create Date: 2026-10-18 15:48:12.640915
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f7a1d9e284"
+down_revision: Union[str, None] = "5a8d3f2e6b17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("following_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Заполняем счетчики по существующим подпискам
+    op.execute(
+        """
+        UPDATE users
+        SET following_count = counts.following_count
+        FROM (
+            SELECT follower_user_id, count(*) AS following_count
+            FROM subscribed_users
+            GROUP BY follower_user_id
+        ) AS counts
+        WHERE users.id = counts.follower_user_id
+        """
+    )
+    op.create_index(
+        "ix_subscribed_users_subscribed_user_id_id",
+        "subscribed_users",
+        ["subscribed_user_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_subscribed_users_follower_user_id_id",
+        "subscribed_users",
+        ["follower_user_id", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_subscribed_users_follower_user_id_id", table_name="subscribed_users"
+    )
+    op.drop_index(
+        "ix_subscribed_users_subscribed_user_id_id", table_name="subscribed_users"
+    )
+    op.drop_column("users", "following_count")
@@ -0,0 +1,32 @@
+"""Tweets user id index
+
+Revision ID: d8a2f6c4b913
+Revises: 7b4e9c2a1f05
+Create Date: 2026-10-18 17:12:36.508217
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d8a2f6c4b913"
+down_revision: Union[str, None] = "7b4e9c2a1f05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_tweets_user_id_id",
+        "tweets",
+        ["user_id", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweets_user_id_id", table_name="tweets")
@@ -0,0 +1,96 @@
+"""Tweet media
+
+Revision ID: e4c1b7a93d26
+Revises: d8a2f6c4b913
+Create Date: 2026-10-18 17:46:51.390624
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e4c1b7a93d26"
+down_revision: Union[str, None] = "d8a2f6c4b913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Количество твитов, массивы вложений которых переносятся одним запросом
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tweet_media",
+        sa.Column("tweet_id", sa.Integer(), nullable=False),
+        sa.Column("media_id", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["tweet_id"], ["tweets.id"]),
+        sa.ForeignKeyConstraint(["media_id"], ["media.id"]),
+        sa.PrimaryKeyConstraint("tweet_id", "media_id"),
+    )
+
+    # Перенос массивов вложений пачками по диапазонам id твитов.
+    # id медиа, которых нет в таблице media, пропускаются
+    connection = op.get_bind()
+    max_id = connection.execute(sa.text("SELECT max(id) FROM tweets")).scalar() or 0
+    for start in range(0, max_id, BATCH_SIZE):
+        connection.execute(
+            sa.text(
+                """
+                INSERT INTO tweet_media (tweet_id, media_id, position)
+                SELECT tweets.id, attachment.media_id, attachment.position - 1
+                FROM tweets
+                CROSS JOIN LATERAL unnest(tweets.attachments)
+                    WITH ORDINALITY AS attachment(media_id, position)
+                JOIN media ON media.id = attachment.media_id
+                WHERE tweets.id > :start AND tweets.id <= :end
+                ON CONFLICT DO NOTHING
+                """
+            ),
+            {"start": start, "end": start + BATCH_SIZE},
+        )
+
+    op.create_index(
+        "ix_tweet_media_tweet_id_position",
+        "tweet_media",
+        ["tweet_id", "position"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_tweet_media_media_id", "tweet_media", ["media_id"], unique=False
+    )
+    op.drop_column("tweets", "attachments")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column(
+        "tweets",
+        sa.Column(
+            "attachments",
+            postgresql.ARRAY(sa.Integer()),
+            autoincrement=False,
+            nullable=True,
+        ),
+    )
+    op.execute(
+        """
+        UPDATE tweets
+        SET attachments = media.attachments
+        FROM (
+            SELECT tweet_id, array_agg(media_id ORDER BY position) AS attachments
+            FROM tweet_media
+            GROUP BY tweet_id
+        ) AS media
+        WHERE tweets.id = media.tweet_id
+        """
+    )
+    op.execute("UPDATE tweets SET attachments = '{}' WHERE attachments IS NULL")
+    op.drop_index("ix_tweet_media_media_id", table_name="tweet_media")
+    op.drop_index("ix_tweet_media_tweet_id_position", table_name="tweet_media")
+    op.drop_table("tweet_media")
@@ -0,0 +1,39 @@
+"""Tweets deleted at
+
+Revision ID: f2b8d5e1c374
+Revises: e4c1b7a93d26
+Create Date: 2026-10-18 18:20:14.902731
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b8d5e1c374"
+down_revision: Union[str, None] = "e4c1b7a93d26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "tweets",
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_tweets_deleted_at",
+        "tweets",
+        ["deleted_at"],
+        unique=False,
+        postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tweets_deleted_at", table_name="tweets")
+    op.drop_column("tweets", "deleted_at")
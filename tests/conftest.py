@@ -5,12 +5,22 @@ import pytest_asyncio
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from main import app as main_app
 from main.app import app
 from main.models import Base
 from pytest_factoryboy import register
 from .factories import UserFactory, TweetFactory
 from httpx import AsyncClient, ASGITransport
+from main.database import db_init
 from main.database.db_init import get_db
+from main.database.replicas import get_read_db
+from main.cache import (
+    feed_cache,
+    principal_cache,
+    profile_cache,
+    tweet_fragment_cache,
+)
+from main.graph import follow_graph
 import sys
 
 sys.path.insert(0, ".")
@@ -35,6 +45,9 @@ TestAsyncSessionLocal = sessionmaker(
     test_engine, expire_on_commit=False, class_=AsyncSession
 )
 
+# Фоновые задачи (fan-out лент и т.п.) работают с тестовой БД
+db_init.AsyncSessionLocal = TestAsyncSessionLocal
+
 # Регистрация фабрик
 register(UserFactory)
 register(TweetFactory)
@@ -48,6 +61,11 @@ async def manage_test_database():
     yield
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)  # Удаляем таблицы после теста
+    principal_cache.clear()  # Id пользователей в новом тесте начнутся заново
+    feed_cache.clear()
+    profile_cache.clear()
+    tweet_fragment_cache.clear()
+    follow_graph.clear()
 
 
 # Фикстура для тестовой сессии
@@ -60,11 +78,20 @@ async def db_session():
             await session.rollback()
 
 
+# Заголовки для внутреннего эндпоинта /api/metrics
+@pytest.fixture
+def metrics_headers(monkeypatch):
+    monkeypatch.setattr(main_app, "METRICS_TOKEN", "test_metrics_token")
+    return {"metrics-token": "test_metrics_token"}
+
+
 # Фикстура для тестового клиента
 @pytest_asyncio.fixture
 async def async_client(db_session):
-    # Переопределяем зависимость get_db
+    # Переопределяем зависимости get_db и get_read_db: запись и чтение
+    # идут в одну тестовую сессию
     app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_read_db] = lambda: db_session
 
     async with AsyncClient(
             transport=ASGITransport(app=app), base_url="http://test"
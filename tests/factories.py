@@ -2,7 +2,6 @@ import factory
 from factory.alchemy import SQLAlchemyModelFactory
 from factory import Faker, SubFactory, post_generation
 from sqlalchemy.ext.asyncio import AsyncSession
-import random
 import secrets
 import string
 
@@ -52,9 +51,8 @@ class TweetFactory(AsyncSQLAlchemyModelFactory):
 
     user = SubFactory(UserFactory)
     content = Faker("text", max_nb_chars=500)  # Случайный текст
-    attachments = factory.List(
-        [factory.LazyFunction(lambda: random.randint(1, 100)) for _ in range(3)]
-    )
+    # id медиа ссылаются на таблицу media, по умолчанию твит без вложений
+    attachments = factory.List([])
 
 
 # class LikeTweetFactory(AsyncSQLAlchemyModelFactory):
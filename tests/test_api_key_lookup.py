@@ -0,0 +1,87 @@
+from sqlalchemy import select
+import pytest
+from main import utils
+from main.database import db_utils
+from main.models import User
+from main.utils import api_key_digest, check_api_key_digest_secret
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_api_key_digest_is_stored(async_client, db_session):
+    # Создаём пользователя, дайджест ключа сохраняется вместе с bcrypt-хешем
+    user = await UserFactory.create(session=db_session)
+
+    db_user = (
+        await db_session.execute(
+            select(User).where(User.api_key_digest == api_key_digest(user._raw_api_key))
+        )
+    ).scalar_one_or_none()
+    assert db_user is not None
+    assert db_user.id == user.id
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": user._raw_api_key}
+    )
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == user.id
+
+
+@pytest.mark.asyncio
+async def test_api_key_digest_backfilled_on_login(async_client, db_session):
+    # Создаём пользователя без дайджеста, как до миграции
+    user = await UserFactory.create(session=db_session)
+    user.api_key_digest = None
+    await db_session.commit()
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": user._raw_api_key}
+    )
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == user.id
+
+    # После успешного входа дайджест заполнен
+    await db_session.refresh(user)
+    assert user.api_key_digest == api_key_digest(user._raw_api_key)
+
+
+@pytest.mark.asyncio
+async def test_api_key_digest_restamped_after_rotation(
+        async_client, db_session, monkeypatch
+):
+    # Дайджест записан со старым секретом, затем секрет сменили
+    monkeypatch.setattr(utils, "API_KEY_DIGEST_SECRET", "old")
+    user = await UserFactory.create(session=db_session)
+    monkeypatch.setattr(utils, "API_KEY_DIGEST_SECRET", "new")
+    monkeypatch.setattr(utils, "API_KEY_DIGEST_PREVIOUS_SECRET", "old")
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": user._raw_api_key}
+    )
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == user.id
+
+    # После входа дайджест пересчитан по новому секрету
+    await db_session.refresh(user)
+    assert user.api_key_digest == api_key_digest(user._raw_api_key, "new")
+
+
+@pytest.mark.asyncio
+async def test_api_key_legacy_scan_can_be_disabled(
+        async_client, db_session, monkeypatch
+):
+    user = await UserFactory.create(session=db_session)
+    user.api_key_digest = None
+    await db_session.commit()
+    monkeypatch.setattr(db_utils, "API_KEY_LEGACY_SCAN_LIMIT", 0)
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": user._raw_api_key}
+    )
+    assert response.status_code == 404
+
+
+def test_api_key_digest_secret_required(monkeypatch):
+    monkeypatch.setattr(utils, "API_KEY_DIGEST_SECRET", "")
+    with pytest.raises(RuntimeError):
+        check_api_key_digest_secret()
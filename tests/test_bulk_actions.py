@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import select
+from main.models import LikeTweet, SubscribedUser, Tweet, User
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_bulk_likes(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    tweets = [
+        Tweet(user_id=user.id, content=f"text {index}", attachments=[])
+        for index in range(3)
+    ]
+    db_session.add_all(tweets)
+    await db_session.commit()
+    tweet_ids = [tweet.id for tweet in tweets]
+    headers = {"api-key": user._raw_api_key}
+
+    db_session.add(LikeTweet(user_id=user.id, tweet_id=tweet_ids[2]))
+    await db_session.commit()
+
+    response = await async_client.post(
+        "/api/tweets/likes",
+        headers=headers,
+        json={"like": [tweet_ids[0], tweet_ids[2], 10**6], "unlike": [tweet_ids[1]]},
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"id": tweet_ids[0], "status": "liked"},
+        {"id": tweet_ids[2], "status": "unchanged"},
+        {"id": 10**6, "status": "not_found"},
+        {"id": tweet_ids[1], "status": "unchanged"},
+    ]
+
+    response = await async_client.post(
+        "/api/tweets/likes", headers=headers, json={"unlike": tweet_ids}
+    )
+    assert [item["status"] for item in response.json()["results"]] == [
+        "unliked",
+        "unchanged",
+        "unliked",
+    ]
+
+    likes = await db_session.scalars(
+        select(LikeTweet).where(LikeTweet.user_id == user.id)
+    )
+    assert likes.all() == []
+    likes_counts = await db_session.scalars(
+        select(Tweet.likes_count).where(Tweet.id.in_(tweet_ids))
+    )
+    assert likes_counts.all() == [0, 0, 0]
+
+    # Один и тот же твит в обоих списках
+    response = await async_client.post(
+        "/api/tweets/likes",
+        headers=headers,
+        json={"like": [tweet_ids[0]], "unlike": [tweet_ids[0]]},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_following(async_client, db_session):
+    follower = await UserFactory.create(session=db_session)
+    users = [await UserFactory.create(session=db_session) for _ in range(3)]
+    user_ids = [user.id for user in users]
+    headers = {"api-key": follower._raw_api_key}
+
+    response = await async_client.post(
+        "/api/users/follow", headers=headers, json={"follow": user_ids + [10**6]}
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["results"]] == [
+        "followed",
+        "followed",
+        "followed",
+        "not_found",
+    ]
+
+    response = await async_client.post(
+        "/api/users/follow",
+        headers=headers,
+        json={"follow": [user_ids[0]], "unfollow": user_ids[1:]},
+    )
+    assert [item["status"] for item in response.json()["results"]] == [
+        "unchanged",
+        "unfollowed",
+        "unfollowed",
+    ]
+
+    subscriptions = await db_session.scalars(
+        select(SubscribedUser.subscribed_user_id).where(
+            SubscribedUser.follower_user_id == follower.id
+        )
+    )
+    assert subscriptions.all() == [user_ids[0]]
+    followers_counts = await db_session.scalars(
+        select(User.followers_count).where(User.id.in_(user_ids)).order_by(User.id)
+    )
+    assert followers_counts.all() == [1, 0, 0]
+
+    response = await async_client.post(
+        "/api/users/follow", headers={"api-key": "invalid"}, json={"follow": user_ids}
+    )
+    assert response.status_code == 404
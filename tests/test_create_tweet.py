@@ -1,7 +1,7 @@
 from sqlalchemy import select
 
 import pytest
-from main.models import User, Tweet, Media
+from main.models import User, Tweet, Media, TweetMedia
 from .factories import UserFactory
 
 
@@ -96,7 +96,45 @@ async def test_create_tweet_with_media(async_client, db_session):
     ).scalar()
     assert tweet is not None
     assert tweet.content == "test text for tweet"
-    assert media_id in tweet.attachments
+    assert await tweet.awaitable_attrs.attachments == [media_id]
+
+
+@pytest.mark.asyncio
+async def test_create_tweet_media_order_and_missing_media(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    media = [Media(path=f"file_{index}.jpeg") for index in range(3)]
+    db_session.add_all(media)
+    await db_session.commit()
+    media_ids = [media[2].id, media[0].id, media[1].id]
+    headers = {"api-key": user._raw_api_key}
+
+    # Вложения сохраняются в порядке запроса, повторы отбрасываются
+    response = await async_client.post(
+        "/api/tweets",
+        headers=headers,
+        json={"tweet_data": "text", "tweet_media_ids": [*media_ids, media_ids[0]]},
+    )
+    assert response.status_code == 201
+    rows = await db_session.execute(
+        select(TweetMedia.media_id)
+        .where(TweetMedia.tweet_id == response.json()["tweet_id"])
+        .order_by(TweetMedia.position)
+    )
+    assert rows.scalars().all() == media_ids
+
+    response = await async_client.get("/api/tweets", headers=headers)
+    assert response.json()["tweets"][0]["attachments"] == media_ids
+
+    # Несуществующее медиа - ошибка, твит не создается
+    response = await async_client.post(
+        "/api/tweets",
+        headers=headers,
+        json={"tweet_data": "text", "tweet_media_ids": [media_ids[0], 10**6]},
+    )
+    assert response.status_code == 400
+    assert response.json()["error_type"] == "ValueError"
+    tweets = await db_session.execute(select(Tweet.id).where(Tweet.user_id == user.id))
+    assert len(tweets.all()) == 1
 
 
 @pytest.mark.asyncio
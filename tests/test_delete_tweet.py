@@ -1,7 +1,10 @@
+from datetime import datetime, timezone
+
 from sqlalchemy import select
 
 import pytest
-from main.models import User, Tweet, Media
+from main.database.purge import tweet_purger
+from main.models import LikeTweet, User, Tweet, Media, TweetMedia
 from .factories import UserFactory
 
 
@@ -88,3 +91,65 @@ async def test_delete_tweet_other_user(async_client, db_session):
 
     assert data["result"] == "false"
     assert data["error_type"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_delete_tweet_purges_likes_and_media(
+        async_client, db_session, monkeypatch
+):
+    monkeypatch.setattr(tweet_purger, "batch_size", 2)
+    author = await UserFactory.create(session=db_session)
+    likers = [await UserFactory.create(session=db_session) for _ in range(5)]
+    media = Media(path="file.jpeg")
+    db_session.add(media)
+    await db_session.flush()
+    tweet = Tweet(
+        user_id=author.id, content="text", attachments=[media.id], likes_count=5
+    )
+    db_session.add(tweet)
+    await db_session.flush()
+    db_session.add_all(
+        LikeTweet(user_id=liker.id, tweet_id=tweet.id) for liker in likers
+    )
+    await db_session.commit()
+    headers = {"api-key": author._raw_api_key}
+
+    # Твит скрыт сразу, лайки и связи с медиа удалены фоновой дочисткой
+    response = await async_client.delete(f"/api/tweets/{tweet.id}", headers=headers)
+    assert response.status_code == 200
+    for model in (LikeTweet, TweetMedia):
+        rows = await db_session.execute(
+            select(model).where(model.tweet_id == tweet.id)
+        )
+        assert rows.first() is None
+    assert await db_session.scalar(select(Tweet.id).where(Tweet.id == tweet.id)) is None
+    assert await db_session.scalar(select(Media.id).where(Media.id == media.id))
+
+    response = await async_client.delete(f"/api/tweets/{tweet.id}", headers=headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_soft_deleted_tweet_is_hidden_until_purged(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    liker = await UserFactory.create(session=db_session)
+    tweet = Tweet(user_id=author.id, content="text", attachments=[], likes_count=1)
+    db_session.add(tweet)
+    await db_session.flush()
+    db_session.add(LikeTweet(user_id=liker.id, tweet_id=tweet.id))
+    # Твит удален мягко, но не дочищен (например, процесс перезапустился)
+    tweet.deleted_at = datetime.now(timezone.utc)
+    await db_session.commit()
+    headers = {"api-key": liker._raw_api_key}
+
+    response = await async_client.get("/api/tweets", headers=headers)
+    assert response.json()["tweets"] == []
+    response = await async_client.get(f"/api/tweets/{tweet.id}/likes", headers=headers)
+    assert response.status_code == 404
+    response = await async_client.post(f"/api/tweets/{tweet.id}/likes", headers=headers)
+    assert response.status_code == 404
+
+    # Периодическая дочистка находит твит по deleted_at
+    assert await tweet_purger.purge_deleted() == 1
+    assert await db_session.scalar(select(Tweet.id).where(Tweet.id == tweet.id)) is None
+    assert await tweet_purger.purge_deleted() == 0
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from main.events import EventBroker, Subscription, event_broker, event_stream
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_subscription_coalesces_and_overflows():
+    subscription = Subscription(user_id=1, maxsize=2)
+    assert subscription.push("likes_count", 1, {"likes_count": 1}) == "queued"
+    assert subscription.push("likes_count", 1, {"likes_count": 2}) == "coalesced"
+    assert subscription.push("tweet_created", 2, {"id": 2}) == "queued"
+
+    batch = await subscription.next_batch(timeout=1, window=0)
+    assert batch == [("likes_count", {"likes_count": 2}), ("tweet_created", {"id": 2})]
+
+    # Переполнение буфера заменяет события одним resync
+    for tweet_id in range(3):
+        subscription.push("tweet_created", tweet_id, {"id": tweet_id})
+    assert await subscription.next_batch(timeout=1, window=0) == [("resync", {})]
+
+    # Без событий - пустая пачка для heartbeat
+    assert await subscription.next_batch(timeout=0.01, window=0) == []
+
+
+@pytest.mark.asyncio
+async def test_broker_publish_to_users():
+    broker = EventBroker(buffer_size=10)
+    first = broker.subscribe(1)
+    second = broker.subscribe(2)
+
+    broker.publish([1], "tweet_created", 5, {"id": 5})
+    broker.publish(None, "tweet_deleted", 6, {"id": 6})
+    assert broker.stats()["connections"] == 2
+
+    assert len(await first.next_batch(timeout=1, window=0)) == 2
+    assert await second.next_batch(timeout=1, window=0) == [
+        ("tweet_deleted", {"id": 6})
+    ]
+
+    broker.unsubscribe(first)
+    broker.unsubscribe(second)
+    assert broker.stats()["users"] == 0
+
+
+@pytest.mark.asyncio
+async def test_event_stream_heartbeat_and_unsubscribe():
+    stream = event_stream(user_id=1, heartbeat=0.01)
+    assert await stream.__anext__() == b"retry: 5000\n\n"
+    assert event_broker.stats()["users"] == 1
+    assert await stream.__anext__() == b": heartbeat\n\n"
+
+    await stream.aclose()
+    assert event_broker.stats()["users"] == 0
+
+
+@pytest.mark.asyncio
+async def test_events_published_on_commit(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    follower = await UserFactory.create(session=db_session)
+    await async_client.post(
+        f"/api/users/{author.id}/follow", headers={"api-key": follower._raw_api_key}
+    )
+    stranger = await UserFactory.create(session=db_session)
+    subscription = event_broker.subscribe(follower.id)
+    stranger_subscription = event_broker.subscribe(stranger.id)
+    try:
+        response = await async_client.post(
+            "/api/tweets",
+            headers={"api-key": author._raw_api_key},
+            json={"tweet_data": "text"},
+        )
+        tweet_id = response.json()["tweet_id"]
+        for _ in range(2):
+            await async_client.post(
+                f"/api/tweets/{tweet_id}/likes",
+                headers={"api-key": author._raw_api_key},
+            )
+
+        batch = await asyncio.wait_for(subscription.next_batch(1, window=0), 1)
+        assert batch == [
+            ("tweet_created", {"id": tweet_id, "author_id": author.id}),
+            ("likes_count", {"id": tweet_id, "likes_count": 0}),
+        ]
+
+        await async_client.delete(
+            f"/api/tweets/{tweet_id}", headers={"api-key": author._raw_api_key}
+        )
+        batch = await asyncio.wait_for(subscription.next_batch(1, window=0), 1)
+        assert batch == [("tweet_deleted", {"id": tweet_id})]
+
+        # События о твитах получают только подписчики автора
+        assert await stranger_subscription.next_batch(0.1, window=0) == []
+    finally:
+        event_broker.unsubscribe(subscription)
+        event_broker.unsubscribe(stranger_subscription)
@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import event
+from main.cache import FeedCache, FeedPage, feed_cache
+from main.utils import make_etag
+from .factories import UserFactory
+
+
+def _page(followed_ids=(), tweet_ids=()):
+    return FeedPage(
+        body=b"{}",
+        etag=make_etag(b"{}"),
+        followed_ids=frozenset(followed_ids),
+        tweet_ids=frozenset(tweet_ids),
+    )
+
+
+def test_feed_cache_invalidation_indexes():
+    cache = FeedCache(maxsize=10, ttl=60)
+    cache.set((1, 50, None), _page(followed_ids=[10], tweet_ids=[100]))
+    cache.set((2, 50, None), _page(followed_ids=[20], tweet_ids=[100, 200]))
+    cache.set((3, 50, None), _page(followed_ids=[10], tweet_ids=[300]))
+
+    # Твит автора сбрасывает ленты только его подписчиков
+    cache.invalidate_author(10)
+    assert cache.get((1, 50, None)) is None
+    assert cache.get((3, 50, None)) is None
+    assert cache.get((2, 50, None)) is not None
+
+    # Лайк сбрасывает ленты, в которых показан твит
+    cache.set((1, 50, None), _page(followed_ids=[10], tweet_ids=[100]))
+    cache.invalidate_tweet(200)
+    assert cache.get((2, 50, None)) is None
+    assert cache.get((1, 50, None)) is not None
+
+    # Подписка сбрасывает все страницы пользователя
+    cache.set((1, 5, "cursor"), _page(tweet_ids=[100]))
+    cache.invalidate_viewer(1)
+    assert len(cache) == 0
+    assert cache.stats()["invalidation_events"] == 3
+
+
+def test_feed_cache_cleans_indexes_on_eviction():
+    cache = FeedCache(maxsize=1, ttl=60)
+    cache.set((1, 50, None), _page(followed_ids=[10], tweet_ids=[100]))
+    cache.set((2, 50, None), _page(followed_ids=[20], tweet_ids=[200]))
+
+    assert cache.stats()["evictions"] == 1
+    assert 10 not in cache._viewers_by_author
+    assert 100 not in cache._viewers_by_tweet
+
+
+def test_feed_cache_cleans_indexes_per_page():
+    cache = FeedCache(maxsize=10, ttl=60)
+    cache.set((1, 50, None), _page(followed_ids=[10], tweet_ids=[100, 200]))
+    cache.set((1, 50, "cursor"), _page(followed_ids=[10], tweet_ids=[300]))
+
+    # У читателя осталась другая страница, но твиты 100 и 200 были
+    # только на удаленной, автор 10 - на обеих
+    cache.invalidate((1, 50, None))
+    assert 100 not in cache._viewers_by_tweet
+    assert 200 not in cache._viewers_by_tweet
+    assert cache._viewers_by_tweet[300] == {1: 1}
+    assert cache._viewers_by_author[10] == {1: 1}
+
+    cache.invalidate((1, 50, "cursor"))
+    assert cache._viewers_by_author == {}
+    assert cache._viewers_by_tweet == {}
+
+
+@pytest.mark.asyncio
+async def test_feed_cache_hit_and_invalidation(
+        async_client, db_session, metrics_headers
+):
+    author = await UserFactory.create(session=db_session)
+    reader = await UserFactory.create(session=db_session)
+    reader_headers = {"api-key": reader._raw_api_key}
+    author_headers = {"api-key": author._raw_api_key}
+
+    response = await async_client.post(
+        f"/api/users/{author.id}/follow", headers=reader_headers
+    )
+    assert response.status_code == 201
+
+    response = await async_client.get("/api/tweets", headers=reader_headers)
+    assert response.status_code == 200
+    assert response.json()["tweets"] == []
+
+    # Повторный запрос отдается из кеша без обращения к БД
+    statements = []
+    engine = db_session.bind.sync_engine
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        hits = feed_cache.hits
+        response = await async_client.get("/api/tweets", headers=reader_headers)
+        assert response.status_code == 200
+        assert response.json()["tweets"] == []
+        assert feed_cache.hits - hits == 1
+        assert statements == []
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    # Новый твит автора сбрасывает ленту подписчика
+    response = await async_client.post(
+        "/api/tweets", headers=author_headers, json={"tweet_data": "new"}
+    )
+    tweet_id = response.json()["tweet_id"]
+    response = await async_client.get("/api/tweets", headers=reader_headers)
+    tweets = response.json()["tweets"]
+    assert [t["id"] for t in tweets] == [tweet_id]
+    assert tweets[0]["likes_count"] == 0
+
+    # Лайк сбрасывает ленты, в которых показан твит
+    response = await async_client.post(
+        f"/api/tweets/{tweet_id}/likes", headers=author_headers
+    )
+    assert response.status_code == 200
+    response = await async_client.get("/api/tweets", headers=reader_headers)
+    assert response.json()["tweets"][0]["likes_count"] == 1
+
+    response = await async_client.get("/api/metrics", headers=metrics_headers)
+    metrics = response.json()["metrics"]["feed_cache"]
+    assert metrics["hits"] >= 1
+    assert metrics["invalidations"] >= 2
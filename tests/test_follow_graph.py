@@ -0,0 +1,65 @@
+import pytest
+from main.graph import FollowGraph, follow_graph
+from .factories import UserFactory
+
+
+def test_follow_graph_adjacency():
+    graph = FollowGraph(enabled=False, refresh_interval=60, batch_size=100)
+    for follower_id, author_id in [(1, 5), (1, 3), (2, 3), (1, 4), (1, 3)]:
+        graph.add(follower_id, author_id)
+
+    # Массивы соседей отсортированы, повторная подписка не дублирует ребро
+    assert list(graph.following_ids(1)) == [3, 4, 5]
+    assert list(graph.follower_ids(3)) == [1, 2]
+    assert graph.is_following(1, 4)
+    assert not graph.is_following(4, 1)
+    assert graph.stats()["edges"] == 4
+
+    graph.remove(1, 4)
+    graph.remove(1, 4)
+    graph.remove(2, 3)
+    assert list(graph.following_ids(1)) == [3, 5]
+    assert list(graph.follower_ids(3)) == [1]
+    assert list(graph.following_ids(2)) == []
+    stats = graph.stats()
+    assert stats["edges"] == 2
+    assert stats["users"] == 3
+    assert stats["memory_bytes"] > 0
+
+
+@pytest.mark.asyncio
+async def test_follow_graph_load_and_incremental_update(
+        async_client, db_session, metrics_headers
+):
+    users = [await UserFactory.create(session=db_session) for _ in range(3)]
+    for follower, author in [(users[0], users[1]), (users[0], users[2])]:
+        response = await async_client.post(
+            f"/api/users/{author.id}/follow", headers={"api-key": follower._raw_api_key}
+        )
+        assert response.status_code == 201
+
+    await follow_graph.load()
+    assert follow_graph.loaded
+    assert list(follow_graph.following_ids(users[0].id)) == [users[1].id, users[2].id]
+    assert list(follow_graph.follower_ids(users[2].id)) == [users[0].id]
+
+    # Подписки и отписки процесса применяются к графу без перезагрузки
+    response = await async_client.post(
+        f"/api/users/{users[0].id}/follow", headers={"api-key": users[1]._raw_api_key}
+    )
+    assert response.status_code == 201
+    response = await async_client.delete(
+        f"/api/users/{users[1].id}/follow", headers={"api-key": users[0]._raw_api_key}
+    )
+    assert response.status_code == 200
+    assert follow_graph.is_following(users[1].id, users[0].id)
+    assert not follow_graph.is_following(users[0].id, users[1].id)
+
+    # Лента берет подписки для кеша из графа
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": users[0]._raw_api_key}
+    )
+    assert response.status_code == 200
+
+    response = await async_client.get("/api/metrics", headers=metrics_headers)
+    assert response.json()["metrics"]["follow_graph"]["edges"] == 2
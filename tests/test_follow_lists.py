@@ -0,0 +1,95 @@
+import pytest
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_profile_counts(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    others = [await UserFactory.create(session=db_session) for _ in range(3)]
+    headers = {"api-key": user._raw_api_key}
+
+    for other in others[:2]:
+        response = await async_client.post(
+            f"/api/users/{other.id}/follow", headers=headers
+        )
+        assert response.status_code == 201
+    response = await async_client.post(
+        f"/api/users/{user.id}/follow", headers={"api-key": others[2]._raw_api_key}
+    )
+    assert response.status_code == 201
+
+    response = await async_client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["user"] == {
+        "id": user.id,
+        "name": f"{user.name} {user.surname}",
+        "followers_count": 1,
+        "following_count": 2,
+    }
+
+    # Отписка и пакетная подписка меняют счетчик подписок
+    response = await async_client.delete(
+        f"/api/users/{others[0].id}/follow", headers=headers
+    )
+    assert response.status_code == 200
+    response = await async_client.post(
+        "/api/users/follow",
+        headers=headers,
+        json={"follow": [others[2].id], "unfollow": [others[1].id]},
+    )
+    assert response.status_code == 200
+    response = await async_client.get(f"/api/users/{user.id}")
+    assert response.json()["user"]["following_count"] == 1
+    assert response.json()["user"]["followers_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_follow_lists_pagination(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    followers = [await UserFactory.create(session=db_session) for _ in range(5)]
+    for follower in followers:
+        response = await async_client.post(
+            f"/api/users/{user.id}/follow", headers={"api-key": follower._raw_api_key}
+        )
+        assert response.status_code == 201
+
+    # Страницы идут от новых подписок к старым без пропусков и повторов
+    user_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get(
+            f"/api/users/{user.id}/followers", params=params
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["users"]) <= 2
+        user_ids.extend(item["id"] for item in data["users"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert user_ids == [follower.id for follower in reversed(followers)]
+
+    response = await async_client.get(f"/api/users/{followers[0].id}/following")
+    assert response.json() == {
+        "result": "true",
+        "users": [{"id": user.id, "name": f"{user.name} {user.surname}"}],
+        "next_cursor": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_follow_lists_errors(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+
+    response = await async_client.get(f"/api/users/{user.id}/followers")
+    assert response.status_code == 200
+    assert response.json()["users"] == []
+    response = await async_client.get(f"/api/users/{user.id * 10}/following")
+    assert response.status_code == 404
+    response = await async_client.get(
+        f"/api/users/{user.id}/followers", params={"cursor": "bad"}
+    )
+    assert response.status_code == 400
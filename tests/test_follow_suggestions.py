@@ -0,0 +1,66 @@
+from array import array
+import pytest
+from main.database.suggestions import rank_candidates, refresh_follow_suggestions
+from main.models import SubscribedUser
+from .factories import UserFactory
+
+
+def test_rank_candidates():
+    following = {
+        1: array("i", [2, 3]),
+        2: array("i", [1, 3, 4, 5]),
+        3: array("i", [4, 6]),
+    }
+    # 4 - общий у двух друзей, 3 уже в подписках, сам пользователь исключен
+    assert rank_candidates(1, following, top_n=10) == [(4, 2), (5, 1), (6, 1)]
+    assert rank_candidates(1, following, top_n=1) == [(4, 2)]
+    limited = rank_candidates(1, following, top_n=10, hop_limit=1)
+    assert sum(score for _, score in limited) <= 2
+    assert {candidate for candidate, _ in limited} <= {4, 5, 6}
+    assert rank_candidates(7, following, top_n=10) == []
+
+
+def test_rank_candidates_samples_long_hops():
+    following = {1: array("i", [2]), 2: array("i", range(3, 1003))}
+    ranked = rank_candidates(1, following, top_n=100, hop_limit=10)
+    assert len(ranked) == 10
+    # Выборка, а не первые hop_limit id друга
+    assert max(candidate for candidate, _ in ranked) > 12
+    assert ranked == rank_candidates(1, following, top_n=100, hop_limit=10)
+
+
+@pytest.mark.asyncio
+async def test_follow_suggestions_endpoint(async_client, db_session):
+    users = [await UserFactory.create(session=db_session) for _ in range(5)]
+    me = users[0]
+    edges = [(0, 1), (0, 2), (1, 3), (2, 3), (2, 4), (3, 0)]
+    for follower, author in edges:
+        db_session.add(
+            SubscribedUser(
+                follower_user_id=users[follower].id, subscribed_user_id=users[author].id
+            )
+        )
+    await db_session.commit()
+
+    assert await refresh_follow_suggestions(db_session, top_n=5) == 4
+    headers = {"api-key": me._raw_api_key}
+    response = await async_client.get("/api/users/me/suggestions", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["users"] == [
+        {
+            "id": user.id,
+            "name": f"{user.name} {user.surname}",
+            "shared_count": shared_count,
+        }
+        for user, shared_count in [(users[3], 2), (users[4], 1)]
+    ]
+
+    # Подписка после пересчета сразу убирает пользователя из рекомендаций
+    response = await async_client.post(
+        f"/api/users/{users[3].id}/follow", headers=headers
+    )
+    assert response.status_code == 201
+    response = await async_client.get(
+        "/api/users/me/suggestions", headers=headers, params={"limit": 1}
+    )
+    assert [user["id"] for user in response.json()["users"]] == [users[4].id]
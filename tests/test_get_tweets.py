@@ -2,6 +2,7 @@ from sqlalchemy import select
 import random
 import pytest
 from main.models import Tweet, SubscribedUser, LikeTweet, User
+from main.utils import encode_cursor
 from .factories import UserFactory
 
 
@@ -70,3 +71,156 @@ async def test_get_tweets(async_client, db_session):
         )
         for tweet in user_tweets:
             assert any(t["id"] == tweet.id for t in tweets_data["tweets"])
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_pagination(async_client, db_session):
+    # Создаем 4 пользователей
+    users = [await UserFactory.create(session=db_session) for _ in range(4)]
+
+    # У каждого пользователя по 3 твита со случайным количеством лайков
+    for user in users:
+        for index in range(3):
+            tweet = Tweet(user_id=user.id, content=f"text {index}", attachments=[])
+            db_session.add(tweet)
+            await db_session.flush()
+            likers = random.sample(users, random.randint(0, len(users)))
+            for liker in likers:
+                db_session.add(LikeTweet(user_id=liker.id, tweet_id=tweet.id))
+            tweet.likes_count = len(likers)
+    await db_session.flush()
+
+    # Первый пользователь подписывается на второго, его твиты попадают в ленту
+    headers = {"api-key": users[0]._raw_api_key}
+    response = await async_client.post(
+        f"/api/users/{users[1].id}/follow", headers=headers
+    )
+    assert response.status_code == 201
+
+    # Собираем ленту постранично
+    pages_tweets = []
+    cursor = None
+    while True:
+        params = {"limit": 5}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get("/api/tweets", headers=headers, params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["tweets"]) <= 5
+        pages_tweets.extend(data["tweets"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    # Постраничная выдача совпадает с выдачей одной страницей
+    response = await async_client.get("/api/tweets", headers=headers)
+    all_tweets = response.json()["tweets"]
+    assert [t["id"] for t in pages_tweets] == [t["id"] for t in all_tweets]
+    assert len(all_tweets) == 12
+
+    # Сначала твиты подписок, затем по убыванию лайков
+    keys = [(t["is_subscribed"], t["likes_count"], t["id"]) for t in all_tweets]
+    assert keys == sorted(keys, reverse=True)
+    assert all(t["author"]["id"] == users[1].id for t in all_tweets[:3])
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_invalid_cursor(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+
+    response = await async_client.get(
+        "/api/tweets",
+        headers={"api-key": user._raw_api_key},
+        params={"cursor": "invalid"},
+    )
+    assert response.status_code == 400
+    data = response.json()
+    assert data["result"] == "false"
+    assert data["error_type"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_cursor_out_of_range(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+
+    response = await async_client.get(
+        "/api/tweets",
+        headers={"api-key": user._raw_api_key},
+        params={"cursor": encode_cursor(0, 0, 2**31)},
+    )
+    assert response.status_code == 400
+    data = response.json()
+    assert data["result"] == "false"
+    assert data["error_type"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_since_id_and_max_id(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    reader = await UserFactory.create(session=db_session)
+    headers = {"api-key": reader._raw_api_key}
+
+    tweet_ids = []
+    for index in range(3):
+        response = await async_client.post(
+            "/api/tweets",
+            headers={"api-key": author._raw_api_key},
+            json={"tweet_data": f"text {index}"},
+        )
+        tweet_ids.append(response.json()["tweet_id"])
+
+    # Только твиты новее since_id, от новых к старым
+    response = await async_client.get(
+        "/api/tweets", headers=headers, params={"since_id": tweet_ids[0]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [t["id"] for t in data["tweets"]] == tweet_ids[:0:-1]
+    assert data["next_cursor"] is None
+    assert all("created_at" in t for t in data["tweets"])
+
+    # Нет новых твитов - пустой список
+    response = await async_client.get(
+        "/api/tweets", headers=headers, params={"since_id": tweet_ids[-1]}
+    )
+    assert response.json()["tweets"] == []
+
+    response = await async_client.get(
+        "/api/tweets", headers=headers, params={"max_id": tweet_ids[1], "limit": 1}
+    )
+    assert [t["id"] for t in response.json()["tweets"]] == [tweet_ids[1]]
+
+    response = await async_client.get(
+        "/api/tweets", headers=headers, params={"since_id": 0, "cursor": "abc"}
+    )
+    assert response.status_code == 400
+
+    # id больше integer отклоняются до запроса к БД
+    for param in ("since_id", "max_id"):
+        response = await async_client.get(
+            "/api/tweets", headers=headers, params={param: 2**31}
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_tweets_etag(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    headers = {"api-key": user._raw_api_key}
+
+    response = await async_client.get("/api/tweets", headers=headers)
+    etag = response.headers["etag"]
+
+    response = await async_client.get(
+        "/api/tweets", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Новый твит меняет ленту и ее ETag
+    await async_client.post("/api/tweets", headers=headers, json={"tweet_data": "text"})
+    response = await async_client.get(
+        "/api/tweets", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["tweets"]) == 1
@@ -51,8 +51,8 @@ async def test__get_user_info(async_client, db_session):
     user_info = {
         "id": user.id,
         "name": f"{user.name} {user.surname}",
-        "followers": followers_ids,
-        "following": following_ids,
+        "followers_count": len(followers_ids),
+        "following_count": len(following_ids),
     }
 
     # Делаем запрос на эндпоинт и сверяем полученную информацию
@@ -64,5 +64,61 @@ async def test__get_user_info(async_client, db_session):
 
     assert user_info_data["user"]["id"] == user_info["id"]
     assert user_info_data["user"]["name"] == user_info["name"]
-    assert user_info_data["user"]["followers"] == user_info["followers"]
-    assert user_info_data["user"]["following"] == user_info["following"]
+    assert user_info_data["user"]["followers_count"] == user_info["followers_count"]
+    assert user_info_data["user"]["following_count"] == user_info["following_count"]
+    assert "followers" not in user_info_data["user"]
+    assert "is_following" not in user_info_data["user"]
+
+
+@pytest.mark.asyncio
+async def test_get_user_info_etag(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    follower = await UserFactory.create(session=db_session)
+
+    response = await async_client.get(f"/api/users/{user.id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    # Профиль не изменился - 304 без тела
+    response = await async_client.get(
+        f"/api/users/{user.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Подписка меняет профиль и его ETag
+    response = await async_client.post(
+        f"/api/users/{user.id}/follow", headers={"api-key": follower._raw_api_key}
+    )
+    assert response.status_code == 201
+    response = await async_client.get(
+        f"/api/users/{user.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["user"]["followers_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_user_info_is_following(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    reader = await UserFactory.create(session=db_session)
+    headers = {"api-key": reader._raw_api_key}
+
+    response = await async_client.get(f"/api/users/{user.id}", headers=headers)
+    assert response.json()["user"]["is_following"] is False
+    etag = response.headers["etag"]
+
+    # Подписка читателя меняет его версию профиля
+    await async_client.post(f"/api/users/{user.id}/follow", headers=headers)
+    response = await async_client.get(
+        f"/api/users/{user.id}", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["user"]["is_following"] is True
+    assert response.json()["user"]["followers_count"] == 1
+
+    # Без api-key профиль общий, без полей читателя
+    response = await async_client.get(f"/api/users/{user.id}")
+    assert "is_following" not in response.json()["user"]
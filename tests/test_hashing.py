@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from main.hashing import HashingService, check_api_key
+
+
+@pytest.mark.asyncio
+async def test_hashing_service_hash_and_verify():
+    service = HashingService("thread", 2)
+    try:
+        hashed_keys = await asyncio.gather(
+            *(service.hash(f"api_key_{index}") for index in range(4))
+        )
+        assert all(check_api_key(f"api_key_{i}", h) for i, h in enumerate(hashed_keys))
+
+        assert await service.verify("api_key_0", hashed_keys[0])
+        assert not await service.verify("api_key_0", hashed_keys[1])
+        assert not await service.verify("api_key_0", "not a bcrypt hash")
+
+        stats = service.stats()
+        assert stats["submitted"] == stats["completed"] == 7
+        assert stats["pending"] == 0
+        assert stats["max_pending"] >= 2
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_metrics_require_token(async_client, metrics_headers):
+    response = await async_client.get("/api/metrics")
+    assert response.status_code == 404
+    response = await async_client.get(
+        "/api/metrics", headers={"metrics-token": "wrong"}
+    )
+    assert response.status_code == 404
+
+    response = await async_client.get("/api/metrics", headers=metrics_headers)
+    assert response.status_code == 200
+    assert "hashing" in response.json()["metrics"]
@@ -0,0 +1,75 @@
+from sqlalchemy import select
+import pytest
+from main.models import HomeTimeline
+from .factories import UserFactory
+
+
+async def get_timeline_tweet_ids(db_session, user_id):
+    result = await db_session.execute(
+        select(HomeTimeline.tweet_id)
+        .where(HomeTimeline.user_id == user_id)
+        .order_by(HomeTimeline.tweet_id)
+    )
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_home_timeline_fanout(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    followers = [await UserFactory.create(session=db_session) for _ in range(3)]
+    stranger = await UserFactory.create(session=db_session)
+    author_headers = {"api-key": author._raw_api_key}
+
+    # Твит, написанный до подписки, попадает в ленту при подписке
+    response = await async_client.post(
+        "/api/tweets", headers=author_headers, json={"tweet_data": "first"}
+    )
+    first_tweet_id = response.json()["tweet_id"]
+
+    for follower in followers:
+        response = await async_client.post(
+            f"/api/users/{author.id}/follow",
+            headers={"api-key": follower._raw_api_key},
+        )
+        assert response.status_code == 201
+        assert await get_timeline_tweet_ids(db_session, follower.id) == [first_tweet_id]
+
+    # Новый твит рассылается всем подписчикам
+    response = await async_client.post(
+        "/api/tweets", headers=author_headers, json={"tweet_data": "second"}
+    )
+    second_tweet_id = response.json()["tweet_id"]
+    for follower in followers:
+        assert await get_timeline_tweet_ids(db_session, follower.id) == [
+            first_tweet_id,
+            second_tweet_id,
+        ]
+    assert await get_timeline_tweet_ids(db_session, stranger.id) == []
+
+    # В ленте подписчика твиты автора отмечены как твиты подписок
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": followers[0]._raw_api_key}
+    )
+    subscribed_ids = {t["id"] for t in response.json()["tweets"] if t["is_subscribed"]}
+    assert subscribed_ids == {first_tweet_id, second_tweet_id}
+
+    # Удаленный твит пропадает из лент
+    response = await async_client.delete(
+        f"/api/tweets/{first_tweet_id}", headers=author_headers
+    )
+    assert response.status_code == 200
+    for follower in followers:
+        assert await get_timeline_tweet_ids(db_session, follower.id) == [
+            second_tweet_id
+        ]
+
+    # После отписки твиты автора удаляются из ленты
+    response = await async_client.delete(
+        f"/api/users/{author.id}/follow",
+        headers={"api-key": followers[0]._raw_api_key},
+    )
+    assert response.status_code == 200
+    assert await get_timeline_tweet_ids(db_session, followers[0].id) == []
+    assert await get_timeline_tweet_ids(db_session, followers[1].id) == [
+        second_tweet_id
+    ]
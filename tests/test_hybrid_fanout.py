@@ -0,0 +1,90 @@
+from sqlalchemy import select
+import pytest
+from main.database import db_utils, timeline
+from main.models import HomeTimeline, User
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_hybrid_fanout(async_client, db_session, monkeypatch):
+    # Авторы с двумя и более подписчиками считаются популярными
+    monkeypatch.setattr(timeline, "FANOUT_FOLLOWER_THRESHOLD", 2)
+    monkeypatch.setattr(db_utils, "FANOUT_FOLLOWER_THRESHOLD", 2)
+
+    celebrity = await UserFactory.create(session=db_session)
+    author = await UserFactory.create(session=db_session)
+    followers = [await UserFactory.create(session=db_session) for _ in range(2)]
+
+    for follower in followers:
+        response = await async_client.post(
+            f"/api/users/{celebrity.id}/follow",
+            headers={"api-key": follower._raw_api_key},
+        )
+        assert response.status_code == 201
+    response = await async_client.post(
+        f"/api/users/{author.id}/follow",
+        headers={"api-key": followers[0]._raw_api_key},
+    )
+    assert response.status_code == 201
+
+    followers_count = (
+        await db_session.execute(
+            select(User.followers_count).where(User.id == celebrity.id)
+        )
+    ).scalar_one()
+    assert followers_count == 2
+
+    response = await async_client.post(
+        "/api/tweets",
+        headers={"api-key": celebrity._raw_api_key},
+        json={"tweet_data": "celebrity tweet"},
+    )
+    celebrity_tweet_id = response.json()["tweet_id"]
+    response = await async_client.post(
+        "/api/tweets",
+        headers={"api-key": author._raw_api_key},
+        json={"tweet_data": "author tweet"},
+    )
+    author_tweet_id = response.json()["tweet_id"]
+
+    # Твит популярного автора не рассылается по лентам
+    timeline_tweet_ids = (
+        await db_session.execute(select(HomeTimeline.tweet_id))
+    ).scalars().all()
+    assert timeline_tweet_ids == [author_tweet_id]
+
+    # Но подмешивается в ленты подписчиков при чтении
+    for follower in followers:
+        response = await async_client.get(
+            "/api/tweets", headers={"api-key": follower._raw_api_key}
+        )
+        tweets = {t["id"]: t["is_subscribed"] for t in response.json()["tweets"]}
+        assert tweets[celebrity_tweet_id] is True
+        assert tweets[author_tweet_id] is (follower.id == followers[0].id)
+
+    # Твиты популярного автора постранично: каждая страница берет
+    # не больше limit его твитов после курсора, без повторов и пропусков
+    celebrity_tweet_ids = [celebrity_tweet_id]
+    for text in ("second", "third"):
+        response = await async_client.post(
+            "/api/tweets",
+            headers={"api-key": celebrity._raw_api_key},
+            json={"tweet_data": text},
+        )
+        celebrity_tweet_ids.append(response.json()["tweet_id"])
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get(
+            "/api/tweets",
+            headers={"api-key": followers[1]._raw_api_key},
+            params=params,
+        )
+        data = response.json()
+        seen += [t["id"] for t in data["tweets"] if t["is_subscribed"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(celebrity_tweet_ids, reverse=True)
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import select
+from main.database.like_buffer import like_buffer
+from main.events import event_broker
+from main.models import LikeTweet, Tweet
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_like_write_behind(async_client, db_session, monkeypatch):
+    monkeypatch.setattr(like_buffer, "enabled", True)
+    author = await UserFactory.create(session=db_session)
+    liker = await UserFactory.create(session=db_session)
+    tweet = Tweet(user_id=author.id, content="text", attachments=[])
+    db_session.add(tweet)
+    await db_session.commit()
+    headers = {"api-key": liker._raw_api_key}
+    subscription = event_broker.subscribe(author.id)
+
+    # Три переключения схлопываются в один лайк
+    for expected in (True, False, True):
+        response = await async_client.post(
+            f"/api/tweets/{tweet.id}/likes", headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["liked"] is expected
+    assert response.json()["likes_count"] == 1
+
+    # До сброса буфера в БД ничего не записано
+    likes = await db_session.scalars(
+        select(LikeTweet).where(LikeTweet.tweet_id == tweet.id)
+    )
+    assert likes.all() == []
+    assert await subscription.next_batch(0.1, window=0) == []
+
+    # Автор переключения сразу видит свой лайк в ленте
+    response = await async_client.get("/api/tweets", headers=headers)
+    feed_tweet = response.json()["tweets"][0]
+    assert feed_tweet["liked_by_me"] is True
+    assert feed_tweet["likes_count"] == 1
+    response = await async_client.get(
+        "/api/tweets", headers=headers, params={"include_likes": "true"}
+    )
+    assert response.json()["tweets"][0]["likes"] == [liker.id]
+
+    # Другие читатели видят лайк после сброса
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": author._raw_api_key}
+    )
+    assert response.json()["tweets"][0]["likes_count"] == 0
+
+    assert await like_buffer.flush() == 1
+    await db_session.commit()  # новая транзакция видит записанные строки
+    likes_count = await db_session.scalar(
+        select(Tweet.likes_count).where(Tweet.id == tweet.id)
+    )
+    assert likes_count == 1
+    # Событие о счетчике отправляется после сброса с записанным значением
+    batch = await subscription.next_batch(0.1, window=0)
+    event_broker.unsubscribe(subscription)
+    assert batch == [("likes_count", {"id": tweet.id, "likes_count": 1})]
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": author._raw_api_key}
+    )
+    feed_tweet = response.json()["tweets"][0]
+    assert feed_tweet["likes_count"] == 1
+    assert feed_tweet["liked_by_me"] is False
+
+    # Отсутствующий твит - 404 без записи в буфер
+    response = await async_client.post(
+        f"/api/tweets/{tweet.id * 10}/likes", headers=headers
+    )
+    assert response.status_code == 404
+    assert like_buffer.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_like_buffer_writes_directly(async_client, db_session, monkeypatch):
+    monkeypatch.setattr(like_buffer, "enabled", True)
+    monkeypatch.setattr(like_buffer, "max_pending", 0)
+    author = await UserFactory.create(session=db_session)
+    liker = await UserFactory.create(session=db_session)
+    tweet = Tweet(user_id=author.id, content="text", attachments=[])
+    db_session.add(tweet)
+    await db_session.commit()
+
+    response = await async_client.post(
+        f"/api/tweets/{tweet.id}/likes", headers={"api-key": liker._raw_api_key}
+    )
+    assert response.json()["liked"] is True
+    assert like_buffer.stats()["pending"] == 0
+    likes = await db_session.scalars(
+        select(LikeTweet.user_id).where(LikeTweet.tweet_id == tweet.id)
+    )
+    assert likes.all() == [liker.id]
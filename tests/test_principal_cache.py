@@ -0,0 +1,91 @@
+import pytest
+from main.cache import REJECTED_API_KEY, Principal, PrincipalCache, principal_cache
+from main.utils import api_key_digest
+from .factories import UserFactory
+
+
+def test_principal_cache_lru_eviction():
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    cache.set("a", Principal(id=1, name="A"))
+    cache.set("b", Principal(id=2, name="B"))
+    assert cache.get("a") == Principal(id=1, name="A")
+
+    # "b" давно не использовался и вытесняется первым
+    cache.set("c", Principal(id=3, name="C"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_principal_cache_ttl_expiration():
+    cache = PrincipalCache(maxsize=10, ttl=0)
+    cache.set("a", Principal(id=1, name="A"))
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_principal_cache_invalidate_user():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set(api_key_digest("key_1"), Principal(id=1, name="A"))
+    cache.set(api_key_digest("key_2"), Principal(id=1, name="A"))
+    cache.set(api_key_digest("key_3"), Principal(id=2, name="B"))
+
+    cache.invalidate_user(1)
+    assert cache.get(api_key_digest("key_1")) is None
+    assert cache.get(api_key_digest("key_2")) is None
+    assert cache.get(api_key_digest("key_3")) is not None
+
+    cache.invalidate_api_key("key_3")
+    assert cache.get(api_key_digest("key_3")) is None
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_used_by_endpoints(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    hits, misses = principal_cache.hits, principal_cache.misses
+
+    for _ in range(3):
+        response = await async_client.get(
+            "/api/users/me", headers={"api-key": user._raw_api_key}
+        )
+        assert response.status_code == 200
+
+    assert principal_cache.misses - misses == 1
+    assert principal_cache.hits - hits == 2
+
+    # Смена ключа инвалидирует закешированного пользователя
+    user.set_api_key("new_api_key")
+    await db_session.commit()
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": user._raw_api_key}
+    )
+    assert response.status_code == 404
+
+    response = await async_client.get(
+        "/api/users/me", headers={"api-key": "new_api_key"}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_rejects_unknown_key(async_client, db_session):
+    await UserFactory.create(session=db_session)
+    headers = {"api-key": "unknown_api_key"}
+
+    response = await async_client.get("/api/users/me", headers=headers)
+    assert response.status_code == 404
+    assert principal_cache.get(api_key_digest("unknown_api_key")) is REJECTED_API_KEY
+
+    # Повтор отклоняется из кеша, пока ключ не появится у пользователя
+    hits = principal_cache.hits
+    response = await async_client.get("/api/users/me", headers=headers)
+    assert response.status_code == 404
+    assert principal_cache.hits - hits == 1
+
+    user = await UserFactory.create(session=db_session)
+    user.set_api_key("unknown_api_key")
+    await db_session.commit()
+    response = await async_client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
@@ -1,7 +1,11 @@
 from sqlalchemy import select
+import asyncio
+import json
 import random
 import pytest
+from main.database.db_utils import put_or_delete_like_on_tweet
 from main.models import Tweet, SubscribedUser, LikeTweet, User
+from .conftest import TestAsyncSessionLocal
 from .factories import UserFactory
 from sqlalchemy.sql.expression import or_
 
@@ -40,6 +44,7 @@ async def test_put_and_delete_likes(async_client, db_session):
             data = response.json()
             assert "result" in data
             assert data["result"] == "true"
+            assert data["liked"] is True
 
             db_like_tweet = (
                 await db_session.execute(
@@ -51,6 +56,14 @@ async def test_put_and_delete_likes(async_client, db_session):
 
             assert db_like_tweet is not None
 
+    # Счетчик лайков каждого твита равен количеству пользователей
+    likes_counts = (
+        await db_session.execute(
+            select(Tweet.likes_count).where(Tweet.id.in_(list_tweets_ids))
+        )
+    ).scalars().all()
+    assert likes_counts == [len(list_users)] * len(list_tweets_ids)
+
     # Удалим все лайки для каждого пользователя
     for user_id, api_key_user in list_users:
         for tweet_id in list_tweets_ids:
@@ -73,6 +86,13 @@ async def test_put_and_delete_likes(async_client, db_session):
 
             assert db_like_tweet is None
 
+    likes_counts = (
+        await db_session.execute(
+            select(Tweet.likes_count).where(Tweet.id.in_(list_tweets_ids))
+        )
+    ).scalars().all()
+    assert likes_counts == [0] * len(list_tweets_ids)
+
 
 @pytest.mark.asyncio
 async def test_put_likes_invalid_api_key(async_client, db_session):
@@ -194,3 +214,39 @@ async def test_put_likes_invalid_tweet_id(async_client, db_session):
     ).all()
 
     assert db_like_tweet == []
+
+
+@pytest.mark.asyncio
+async def test_like_toggle_concurrent(db_session):
+    # Каждое переключение выполняется в своей сессии, как параллельные запросы
+    users = [await UserFactory.create(session=db_session) for _ in range(5)]
+    tweet = Tweet(user_id=users[0].id, content="text", attachments=[])
+    db_session.add(tweet)
+    await db_session.commit()
+
+    toggles_per_user = 9
+
+    async def toggle(user):
+        async with TestAsyncSessionLocal() as session:
+            response = await put_or_delete_like_on_tweet(
+                session, user._raw_api_key, tweet.id
+            )
+            return json.loads(response.body)
+
+    results = await asyncio.gather(
+        *(toggle(user) for user in users for _ in range(toggles_per_user))
+    )
+    # Ни одна гонка не дошла до клиента ошибкой уникальности
+    assert all(result["result"] == "true" for result in results)
+
+    # Счетчик совпадает с количеством строк лайков
+    likes = (
+        await db_session.execute(
+            select(LikeTweet.user_id).where(LikeTweet.tweet_id == tweet.id)
+        )
+    ).scalars().all()
+    likes_count = await db_session.scalar(
+        select(Tweet.likes_count).where(Tweet.id == tweet.id)
+    )
+    assert likes_count == len(likes)
+    assert len(set(likes)) == len(likes)
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, select
+from main.cache import feed_cache, profile_cache
+from main.models import LikeTweet, SubscribedUser, Tweet
+from .factories import UserFactory
+
+# Запросы к БД на один вызов эндпоинта с прогретым кешем api-key
+MAX_QUERIES = 3
+
+
+@contextmanager
+def count_queries(db_session):
+    statements = []
+    engine = db_session.bind.sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def seed(db_session, author, readers: int, tweets: int) -> None:
+    """Подписчики автора, его твиты и лайки каждого подписчика"""
+    users = [await UserFactory.create(session=db_session) for _ in range(readers)]
+    for user in users:
+        db_session.add(
+            SubscribedUser(follower_user_id=user.id, subscribed_user_id=author.id)
+        )
+    author.followers_count += readers
+    for _ in range(tweets):
+        tweet = Tweet(
+            user_id=author.id, content="text", attachments=[], likes_count=readers
+        )
+        db_session.add(tweet)
+        await db_session.flush()
+        for user in users:
+            db_session.add(LikeTweet(user_id=user.id, tweet_id=tweet.id))
+    await db_session.commit()
+
+
+async def endpoint_query_counts(async_client, db_session, author, viewer):
+    headers = {"api-key": viewer._raw_api_key}
+    tweet_id = await db_session.scalar(select(Tweet.id).limit(1))
+    urls = {
+        "me": "/api/users/me",
+        "profile": f"/api/users/{author.id}",
+        "feed": "/api/tweets",
+        "likes": f"/api/tweets/{tweet_id}/likes",
+        "followers": f"/api/users/{author.id}/followers",
+        "following": f"/api/users/{viewer.id}/following",
+    }
+    # Прогрев кеша api-key, ответы профилей и ленты берутся из БД
+    await async_client.get("/api/users/me", headers=headers)
+    counts = {}
+    for name, url in urls.items():
+        feed_cache.clear()
+        profile_cache.clear()
+        with count_queries(db_session) as statements:
+            response = await async_client.get(url, headers=headers)
+        assert response.status_code == 200, url
+        counts[name] = len(statements)
+    return counts
+
+
+@pytest.mark.asyncio
+async def test_read_endpoints_query_count_is_constant(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    viewer = await UserFactory.create(session=db_session)
+    db_session.add(
+        SubscribedUser(follower_user_id=viewer.id, subscribed_user_id=author.id)
+    )
+    viewer.following_count = 1
+    await seed(db_session, author, readers=2, tweets=2)
+    small = await endpoint_query_counts(async_client, db_session, author, viewer)
+
+    # Число запросов не растет с числом подписчиков, твитов и лайков
+    await seed(db_session, author, readers=10, tweets=10)
+    large = await endpoint_query_counts(async_client, db_session, author, viewer)
+
+    assert small == large
+    assert all(count <= MAX_QUERIES for count in small.values()), small
@@ -0,0 +1,196 @@
+"""
+Регрессия планов горячих запросов: на синтетических данных каждый запрос
+выполняется с записью SQL, затем для него строится EXPLAIN. Тест падает,
+если план читает большую таблицу последовательным сканированием или его
+стоимость превышает бюджет.
+"""
+
+import json
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, select, text
+from main.database.db_utils import (
+    build_feed_query,
+    build_feed_since_query,
+    build_like_toggle_statement,
+)
+from main.database.read_models import (
+    fetch_credentials_by_digest,
+    fetch_follow_list,
+    fetch_follow_suggestions,
+    fetch_follower_ids,
+    fetch_following_ids,
+    fetch_tweet_likers,
+    fetch_user_profile,
+    tweet_exists,
+    user_exists,
+)
+from main.database.timeline import FANOUT_FOLLOWER_THRESHOLD
+from main.models import Tweet
+
+USERS = 20_000
+TWEETS = 200_000
+LIKES = 400_000
+FOLLOWS = 400_000
+# Каждый MEDIA_EVERY-й твит с вложением
+MEDIA_EVERY = 4
+CELEBRITIES = 10
+
+# Таблицы, которые в проде растут без ограничений
+HOT_TABLES = {
+    "users",
+    "tweets",
+    "liking_tweets",
+    "subscribed_users",
+    "home_timeline",
+    "follow_suggestions",
+    "tweet_media",
+}
+# Бюджет стоимости плана в единицах планировщика Postgres
+MAX_PLAN_COST = 5_000
+# Запросы ленты сначала выбирают id страницы и не группируют таблицы целиком
+NO_GROUPING_QUERIES = {"feed", "feed_next_page", "feed_since"}
+
+# Пары строк без повторов: для g из generate_series первый элемент
+# g % USERS, второй зависит от g / USERS, поэтому уникальные
+# ограничения и отсутствие подписок на себя выполняются
+SEED_STATEMENTS = [
+    f"""
+    INSERT INTO users (login, name, surname, api_key_digest, followers_count)
+    SELECT 'plan_' || g, 'Plan', 'User ' || g, md5(g::text),
+           CASE WHEN g <= {CELEBRITIES} THEN {FANOUT_FOLLOWER_THRESHOLD} ELSE 0 END
+    FROM generate_series(1, {USERS}) AS g
+    """,
+    f"""
+    INSERT INTO tweets (user_id, content, likes_count)
+    SELECT g % {USERS} + 1, 'tweet ' || g, (g * 7919) % 1000
+    FROM generate_series(1, {TWEETS}) AS g
+    """,
+    f"""
+    INSERT INTO media (path)
+    SELECT 'media_' || g FROM generate_series(1, {TWEETS // MEDIA_EVERY}) AS g
+    """,
+    f"""
+    INSERT INTO tweet_media (tweet_id, media_id, position)
+    SELECT g * {MEDIA_EVERY}, g, 0
+    FROM generate_series(1, {TWEETS // MEDIA_EVERY}) AS g
+    """,
+    f"""
+    INSERT INTO liking_tweets (user_id, tweet_id)
+    SELECT g % {USERS} + 1, g / {USERS} + 1
+    FROM generate_series(0, {LIKES - 1}) AS g
+    """,
+    f"""
+    INSERT INTO subscribed_users (follower_user_id, subscribed_user_id)
+    SELECT g % {USERS} + 1, (g % {USERS} + g / {USERS} + 1) % {USERS} + 1
+    FROM generate_series(0, {FOLLOWS - 1}) AS g
+    """,
+    f"""
+    INSERT INTO home_timeline (user_id, tweet_id)
+    SELECT g % {USERS} + 1, g
+    FROM generate_series(1, {TWEETS}) AS g
+    """,
+    f"""
+    INSERT INTO follow_suggestions (user_id, suggested_user_id, score)
+    SELECT g % {USERS} + 1, (g % {USERS} + g / {USERS} + 1) % {USERS} + 1, g % 50
+    FROM generate_series(0, {FOLLOWS - 1}) AS g
+    """,
+]
+
+
+@contextmanager
+def capture_statements(db_session):
+    statements = []
+    engine = db_session.bind.sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_violations(name, plan):
+    violations = []
+    for node in plan_nodes(plan):
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] in HOT_TABLES:
+            violations.append(f"{name}: seq scan on {node['Relation Name']}")
+        grouped = node["Node Type"] == "Group" or (
+            node["Node Type"] == "Aggregate" and node.get("Strategy") != "Plain"
+        )
+        if grouped and name in NO_GROUPING_QUERIES:
+            violations.append(f"{name}: {node['Node Type']} with GROUP BY")
+    if plan["Total Cost"] > MAX_PLAN_COST:
+        violations.append(f"{name}: cost {plan['Total Cost']} > {MAX_PLAN_COST}")
+    return violations
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(db_session):
+    for statement in SEED_STATEMENTS:
+        await db_session.execute(text(statement))
+    await db_session.commit()
+    await db_session.execute(text("ANALYZE"))
+
+    # Пользователь, подписанный в том числе на популярных авторов 1 и 2
+    user_id = USERS - 1
+    tweet_id = TWEETS // 2
+    hot_queries = {
+        "credentials": lambda: fetch_credentials_by_digest(db_session, "0" * 32),
+        "profile": lambda: fetch_user_profile(db_session, user_id),
+        "user_exists": lambda: user_exists(db_session, user_id),
+        "tweet_exists": lambda: tweet_exists(db_session, tweet_id),
+        "following_ids": lambda: fetch_following_ids(db_session, user_id),
+        "follower_ids": lambda: fetch_follower_ids(db_session, user_id),
+        "tweet_likers": lambda: fetch_tweet_likers(db_session, 1, 50, LIKES),
+        "followers": lambda: fetch_follow_list(
+            db_session, user_id, "followers", 50, FOLLOWS
+        ),
+        "following": lambda: fetch_follow_list(
+            db_session, user_id, "following", 50, None
+        ),
+        "suggestions": lambda: fetch_follow_suggestions(db_session, user_id, 10),
+        "feed": lambda: db_session.execute(build_feed_query(user_id, 10)),
+        "feed_next_page": lambda: db_session.execute(
+            build_feed_query(user_id, 10, after=(0, 500, tweet_id))
+        ),
+        "feed_since": lambda: db_session.execute(
+            build_feed_since_query(user_id, 10, TWEETS - 5, None, include_likes=True)
+        ),
+        "like_toggle": lambda: db_session.execute(
+            build_like_toggle_statement(user_id, tweet_id)
+        ),
+        "author_tweets": lambda: db_session.execute(
+            select(Tweet.id)
+            .where(Tweet.user_id == user_id, Tweet.id > 0)
+            .order_by(Tweet.id)
+            .limit(1000)
+        ),
+    }
+
+    violations = []
+    for name, run in hot_queries.items():
+        with capture_statements(db_session) as statements:
+            await run()
+        assert statements, name
+        for statement, parameters in statements:
+            connection = await db_session.connection()
+            result = await connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            )
+            explained = result.scalar()
+            if isinstance(explained, str):
+                explained = json.loads(explained)
+            violations.extend(plan_violations(name, explained[0]["Plan"]))
+
+    assert not violations, "\n".join(violations)
@@ -0,0 +1,33 @@
+from sqlalchemy import select
+import pytest
+from main.database.reconcile import reconcile_likes_count
+from main.models import LikeTweet, Tweet
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_reconcile_likes_count(db_session):
+    users = [await UserFactory.create(session=db_session) for _ in range(3)]
+
+    # Лайки добавляются напрямую, минуя счетчик
+    tweet_ids = []
+    for index in range(5):
+        tweet = Tweet(user_id=users[0].id, content=f"text {index}", attachments=[])
+        db_session.add(tweet)
+        await db_session.flush()
+        for user in users[:index % 4]:
+            db_session.add(LikeTweet(user_id=user.id, tweet_id=tweet.id))
+        tweet_ids.append(tweet.id)
+    await db_session.commit()
+
+    # Сначала только обнаруживаем расхождения
+    assert await reconcile_likes_count(db_session, batch_size=2, dry_run=True) == 3
+    assert await reconcile_likes_count(db_session, batch_size=2) == 3
+    assert await reconcile_likes_count(db_session, batch_size=2) == 0
+
+    likes_counts = (
+        await db_session.execute(
+            select(Tweet.likes_count).where(Tweet.id.in_(tweet_ids)).order_by(Tweet.id)
+        )
+    ).scalars().all()
+    assert likes_counts == [0, 1, 2, 3, 0]
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import select
+from main.database.db_utils import tweet_fragment, viewer_fields
+from main.models import Tweet
+from .factories import UserFactory
+
+
+def _row(**fields):
+    defaults = dict(
+        id=1,
+        version=0,
+        content="Привет",
+        attachments=[],
+        author_id=2,
+        author_name="Name",
+        author_surname="Surname",
+        likes=[3],
+        liked_by_me=False,
+        likes_count=1,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    return SimpleNamespace(**{**defaults, **fields})
+
+
+def test_tweet_fragment_is_cached_by_version():
+    fragment = tweet_fragment(_row())
+    assert json.loads(fragment + viewer_fields(True, True)) == {
+        "id": 1,
+        "content": "Привет",
+        "attachments": [],
+        "author": {"id": 2, "name": "Name Surname"},
+        "likes_count": 1,
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "liked_by_me": True,
+        "is_subscribed": True,
+    }
+
+    # Та же версия берется из кеша, даже если данные строки другие
+    assert tweet_fragment(_row(likes=[], likes_count=0)) is fragment
+    # Новая версия сериализуется заново
+    fresh = tweet_fragment(_row(version=1, likes=[], likes_count=0))
+    assert json.loads(fresh + viewer_fields(False, False))["likes_count"] == 0
+
+
+def test_tweet_fragment_with_likes_is_cached_separately():
+    fragment = tweet_fragment(_row(), include_likes=True)
+    assert fragment is not tweet_fragment(_row())
+    assert json.loads(fragment + viewer_fields(False, True))["likes"] == [3]
+
+
+@pytest.mark.asyncio
+async def test_like_bumps_tweet_version(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    headers = {"api-key": user._raw_api_key}
+    response = await async_client.post(
+        "/api/tweets", headers=headers, json={"tweet_data": "text"}
+    )
+    tweet_id = response.json()["tweet_id"]
+
+    for expected_liked in (True, False):
+        response = await async_client.post(
+            f"/api/tweets/{tweet_id}/likes", headers=headers
+        )
+        assert response.status_code == 200
+        response = await async_client.get("/api/tweets", headers=headers)
+        feed_tweet = response.json()["tweets"][0]
+        assert feed_tweet["liked_by_me"] is expected_liked
+        assert feed_tweet["likes_count"] == int(expected_liked)
+
+    version = await db_session.scalar(select(Tweet.version).where(Tweet.id == tweet_id))
+    assert version == 2
@@ -0,0 +1,102 @@
+import pytest
+from main.models import LikeTweet, Tweet
+from .factories import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_get_tweet_likes_pagination(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    likers = [await UserFactory.create(session=db_session) for _ in range(5)]
+    tweet = Tweet(
+        user_id=author.id, content="text", attachments=[], likes_count=len(likers)
+    )
+    db_session.add(tweet)
+    await db_session.flush()
+    for liker in likers:
+        db_session.add(LikeTweet(user_id=liker.id, tweet_id=tweet.id))
+        await db_session.flush()
+    headers = {"api-key": author._raw_api_key}
+
+    # Страницы идут от новых лайков к старым без пропусков и повторов
+    user_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get(
+            f"/api/tweets/{tweet.id}/likes", headers=headers, params=params
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["likes"]) <= 2
+        user_ids.extend(like["user_id"] for like in data["likes"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert user_ids == [liker.id for liker in reversed(likers)]
+
+    response = await async_client.get(
+        f"/api/tweets/{tweet.id}/likes", headers=headers, params={"limit": 1}
+    )
+    assert response.json()["likes"] == [
+        {"user_id": likers[-1].id, "name": f"{likers[-1].name} {likers[-1].surname}"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_tweet_likes_errors(async_client, db_session):
+    user = await UserFactory.create(session=db_session)
+    tweet = Tweet(user_id=user.id, content="text", attachments=[])
+    db_session.add(tweet)
+    await db_session.flush()
+    headers = {"api-key": user._raw_api_key}
+
+    # Твит без лайков - пустая страница, отсутствующий твит - 404
+    response = await async_client.get(f"/api/tweets/{tweet.id}/likes", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"result": "true", "likes": [], "next_cursor": None}
+    response = await async_client.get(
+        f"/api/tweets/{tweet.id * 10}/likes", headers=headers
+    )
+    assert response.status_code == 404
+
+    response = await async_client.get(
+        f"/api/tweets/{tweet.id}/likes", headers=headers, params={"cursor": "bad"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_feed_liked_by_me_and_include_likes(async_client, db_session):
+    author = await UserFactory.create(session=db_session)
+    liker = await UserFactory.create(session=db_session)
+    tweet = Tweet(user_id=author.id, content="text", attachments=[], likes_count=1)
+    db_session.add(tweet)
+    await db_session.flush()
+    db_session.add(LikeTweet(user_id=liker.id, tweet_id=tweet.id))
+    await db_session.flush()
+
+    # По умолчанию в ленте нет списков лайкнувших
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": liker._raw_api_key}
+    )
+    feed_tweet = response.json()["tweets"][0]
+    assert "likes" not in feed_tweet
+    assert feed_tweet["likes_count"] == 1
+    assert feed_tweet["liked_by_me"] is True
+
+    response = await async_client.get(
+        "/api/tweets", headers={"api-key": author._raw_api_key}
+    )
+    assert response.json()["tweets"][0]["liked_by_me"] is False
+
+    # Прежний формат со списками - по явному флагу
+    response = await async_client.get(
+        "/api/tweets",
+        headers={"api-key": author._raw_api_key},
+        params={"include_likes": "true"},
+    )
+    feed_tweet = response.json()["tweets"][0]
+    assert feed_tweet["likes"] == [liker.id]
+    assert feed_tweet["liked_by_me"] is False